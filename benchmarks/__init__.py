@@ -0,0 +1,10 @@
+'''Micro benchmarks for funcyou and friends.
+
+Each module exposes `run()`, returning a list of `(name, seconds)` pairs
+where seconds is the best time of a single call (or `(name, value, unit)`
+triples for other measures), and can be executed as
+a script to print its table, e.g. `python -m benchmarks.bench_lambda`.
+
+`python -m benchmarks` runs them all, writes JSON results and compares
+them to a saved baseline, see `benchmarks/__main__.py`.
+'''
@@ -0,0 +1,106 @@
+'''Run the benchmark suite.
+
+    python -m benchmarks [-k PATTERN] [--json OUT] [--baseline BASE] [--threshold 0.1]
+
+Runs every benchmark module (or those whose name contains PATTERN),
+prints their tables and optionally writes the results as JSON. With
+--baseline the results are compared to a JSON file written by a previous
+run: measures more than `threshold` (relative) worse than the baseline
+are flagged and the exit status is 1. Throughputs, in the units of
+HIGHER_IS_BETTER, are worse when lower, every other measure when higher.
+'''
+
+import argparse
+import importlib
+import json
+import platform
+import sys
+
+from benchmarks._timing import report
+
+MODULES = (
+    'bench_lambda',
+    'bench_compose',
+    'bench_curry',
+    'bench_pipe',
+    'bench_async',
+    'bench_indexers',
+    'bench_interpreters',
+    'bench_parsers',
+    'bench_typing',
+    'bench_optimize',
+    'bench_streaming',
+    'bench_profiler',
+    'bench_recursion',
+    'bench_startup',
+    'bench_fy',
+    'bench_ski',
+    'bench_lambdac',
+)
+
+# Units of the measures for which a bigger value is an improvement
+HIGHER_IS_BETTER = {'lines/s'}
+
+
+def collect(modules):
+    'Run modules, return {module: {name: {"value": v, "unit": u}}}'
+    results = {}
+    for name in modules:
+        module = importlib.import_module('benchmarks.' + name)
+        rows = module.run()
+        report(module.__doc__, rows)
+        results[name] = {row[0]: {'value': row[1], 'unit': row[2] if len(row) == 3 else 's'}
+                         for row in rows}
+    return results
+
+
+def compare(results, baseline, threshold):
+    'Return the (module, name, old, new, unit) measures that regressed'
+    regressions = []
+    for module, rows in results.items():
+        for name, new in rows.items():
+            old = baseline.get(module, {}).get(name)
+            if old is None or old['unit'] != new['unit'] or old['value'] <= 0:
+                continue
+            if new['unit'] in HIGHER_IS_BETTER:
+                worse = new['value'] < old['value'] * (1 - threshold)
+            else:
+                worse = new['value'] > old['value'] * (1 + threshold)
+            if worse:
+                regressions.append((module, name, old['value'], new['value'], new['unit']))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks', description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('-k', dest='pattern', default='',
+                        help='only run modules whose name contains PATTERN')
+    parser.add_argument('--json', help='write the results to this file')
+    parser.add_argument('--baseline', help='compare to the results in this file')
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help='relative slowdown flagged as a regression (default 0.1)')
+    args = parser.parse_args(argv)
+
+    results = collect([m for m in MODULES if args.pattern in m])
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'python': platform.python_version(),
+                       'machine': platform.machine(),
+                       'results': results}, f, indent=2, sort_keys=True)
+
+    if not args.baseline:
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)['results']
+    regressions = compare(results, baseline, args.threshold)
+    for module, name, old, new, unit in regressions:
+        print('REGRESSION {}: {}: {:.6g} -> {:.6g} {} ({:+.0%})'.format(
+            module, name, old, new, unit, new / old - 1))
+    if not regressions:
+        print('No regressions above {:.0%}'.format(args.threshold))
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
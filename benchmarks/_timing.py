@@ -0,0 +1,23 @@
+'''Timing helpers shared by the benchmark modules'''
+
+import timeit
+
+
+def best(func, number=1000, repeat=5):
+    'Return the best time of a single func() call, in seconds'
+    return min(timeit.repeat(func, number=number, repeat=repeat)) / number
+
+
+def report(title, rows):
+    '''Print rows as a table.
+
+    Rows are (name, seconds) pairs or (name, value, unit) triples for
+    measures other than time.
+    '''
+    print(title)
+    width = max(len(row[0]) for row in rows)
+    for row in rows:
+        name, value, unit = row if len(row) == 3 else row + ('s',)
+        if unit == 's':
+            value, unit = value * 1e6, 'us'
+        print('  {:<{}}  {:>12.3f} {}'.format(name, width, value, unit))
@@ -0,0 +1,36 @@
+'''AsyncPipe: concurrent amap vs one asyncio.run per call, fake 10ms service'''
+
+import asyncio
+
+from funcyou import Pipe
+from funcyou.aio import AsyncPipe, amap
+from benchmarks._timing import best, report
+
+CALLS = 50
+
+
+async def service(x):
+    await asyncio.sleep(0.01)
+    return x + 1
+
+
+def serialized():
+    'What wrapping every call in asyncio.run amounts to'
+    return (Pipe(range(CALLS)) | (lambda xs: [asyncio.run(service(x)) for x in xs]) | sum)()
+
+
+def concurrent(limit):
+    return lambda: asyncio.run((AsyncPipe(range(CALLS)) | amap(service, limit=limit) | sum)())
+
+
+def run():
+    return [
+        ('{} calls, asyncio.run each'.format(CALLS), best(serialized, 1, 3)),
+        ('{} calls, amap limit=1'.format(CALLS), best(concurrent(1), 1, 3)),
+        ('{} calls, amap limit=10'.format(CALLS), best(concurrent(10), 1, 3)),
+        ('{} calls, amap limit={}'.format(CALLS, CALLS), best(concurrent(CALLS), 1, 3)),
+    ]
+
+
+if __name__ == '__main__':
+    report(__doc__, run())
@@ -0,0 +1,53 @@
+'''compose and Composition: flattened plans vs nested reduce closures'''
+
+from functools import reduce
+
+from funcyou import Composition, compose
+from benchmarks._timing import best, report
+
+
+def legacy_compose(*funcs):
+    'The pre flattening implementation, kept here for comparison'
+    def compose2(f, g):
+        return lambda *args, **kwargs: f(g(*args, **kwargs))
+    return reduce(compose2, funcs)
+
+
+class LegacyComposition:
+    'The pre flattening implementation, kept here for comparison'
+    def __init__(self):
+        self.funcs = []
+
+    def __call__(self, *args, **kwargs):
+        return reduce(lambda f, g: lambda *a, **k: f(g(*a, *k)),
+                      reversed(self.funcs))(*args, **kwargs)
+
+    def __or__(self, other):
+        self.funcs.append(other)
+        return self
+
+
+def inc(x):
+    return x + 1
+
+
+def run():
+    rows = []
+    for n in (2, 10, 100):
+        stages = [inc] * n
+        old, new = legacy_compose(*stages), compose(*stages)
+        old_c, new_c = LegacyComposition(), Composition()
+        for f in stages:
+            old_c | f
+            new_c | f
+        rows += [
+            ('compose {} stages, nested'.format(n), best(lambda: old(0), 10000)),
+            ('compose {} stages, flat'.format(n), best(lambda: new(0), 10000)),
+            ('Composition {} stages, reduce'.format(n), best(lambda: old_c(0), 10000)),
+            ('Composition {} stages, plan'.format(n), best(lambda: new_c(0), 10000)),
+        ]
+    return rows
+
+
+if __name__ == '__main__':
+    report(__doc__, run())
@@ -0,0 +1,39 @@
+'''curry: signature based vs exception driven dispatch'''
+
+from functools import partial
+
+from funcyou import curry
+from benchmarks._timing import best, report
+
+
+def legacy_curry(f):
+    'The pre signature implementation, kept here for comparison'
+    def _(arg):
+        try:
+            return f(arg)
+        except TypeError:
+            return legacy_curry(partial(f, arg))
+    return _
+
+
+def add3(a, b, c):
+    return a + b + c
+
+
+def add5(a, b, c, d, e):
+    return a + b + c + d + e
+
+
+def run():
+    old3, new3 = legacy_curry(add3), curry(add3)
+    old5, new5 = legacy_curry(add5), curry(add5)
+    return [
+        ('3 args, exception driven', best(lambda: old3(1)(2)(3), 10000)),
+        ('3 args, signature', best(lambda: new3(1)(2)(3), 10000)),
+        ('5 args, exception driven', best(lambda: old5(1)(2)(3)(4)(5), 10000)),
+        ('5 args, signature', best(lambda: new5(1)(2)(3)(4)(5), 10000)),
+    ]
+
+
+if __name__ == '__main__':
+    report(__doc__, run())
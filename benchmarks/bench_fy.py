@@ -0,0 +1,49 @@
+'''fy startup and batch throughput: building the parser from the
+prebuilt tables or generating them, and fresh processes running scripts'''
+
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks._timing import best, report
+from benchmarks.bench_interpreters import fy_source, quiet
+from benchmarks.bench_startup import ROOT, spawn
+
+SIZES = (1000, 10000)
+
+
+def run():
+    with quiet():
+        from funcyou import fy
+        import ply.yacc as yacc
+    module = sys.modules[fy.__name__]
+
+    def generate():
+        # A missing table module, as without prebuilt tables
+        yacc.yacc(module=module, tabmodule='funcyou._no_parsetab', debug=False,
+                  write_tables=False, errorlog=yacc.NullLogger())
+    rows = [('parser from prebuilt tables', best(fy._build, 1, 5)),
+            ('parser generating the tables', best(generate, 1, 5)),
+            ('python startup', min(spawn('-c', 'pass') for _ in range(3))),
+            ('import funcyou.fy', min(spawn('-c', 'import funcyou.fy') for _ in range(3)))]
+    with tempfile.TemporaryDirectory() as tmp, open(os.devnull, 'w') as devnull:
+        for n in SIZES:
+            lines = fy_source(n)
+            seconds = best(lambda: fy.batch(lines, out=devnull), 1, 3)
+            rows.append(('batch {} lines'.format(n), n / seconds, 'lines/s'))
+            path = os.path.join(tmp, 'script{}.fy'.format(n))
+            with open(path, 'w') as f:
+                f.write('\n'.join(lines) + '\n')
+            start = time.perf_counter()
+            subprocess.run((sys.executable, '-m', 'funcyou.fy', path), cwd=ROOT,
+                           check=True, stdout=subprocess.DEVNULL)
+            seconds = time.perf_counter() - start
+            rows.append(('python -m funcyou.fy {} lines'.format(n), seconds))
+            rows.append(('python -m funcyou.fy {} lines'.format(n), n / seconds, 'lines/s'))
+    return rows
+
+
+if __name__ == '__main__':
+    report(__doc__, run())
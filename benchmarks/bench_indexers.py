@@ -0,0 +1,84 @@
+'''indexers: generators over nested tuples vs NumPy views, whole matrix
+reductions, lines of a 50k x 50k memory mapped matrix'''
+
+from operator import add
+
+import os
+import subprocess
+import sys
+import tempfile
+
+from funcyou.indexers import column, diag, adiag, diag_reduce, np
+from benchmarks._timing import best, report
+
+SIZES = (10, 100, 1000)
+
+
+def run():
+    rows = []
+    for n in SIZES:
+        nested = tuple(tuple(range(i * n, (i + 1) * n)) for i in range(n))
+        number = max(1, 10000 // n)
+        for indexer in (column, diag, adiag):
+            rows.append(('{} {}x{}, nested'.format(indexer.__name__, n, n),
+                         best(lambda: sum(indexer(nested)[1]), number)))
+            if np is not None:
+                a = np.array(nested)
+                rows.append(('{} {}x{}, ndarray'.format(indexer.__name__, n, n),
+                             best(lambda: indexer(a)[1].sum(), number)))
+    return rows + run_reduce() + run_files()
+
+
+def run_reduce(n=2000):
+    'Sum of every diagonal of an n x n grid'
+    nested = tuple(tuple(range(i * n, (i + 1) * n)) for i in range(n))
+    rows = [
+        ('all diags {0}x{0}, n generators'.format(n),
+         best(lambda: [sum(diag(nested)[k]) for k in range(n)], 1, 1)),
+        ('all diags {0}x{0}, diag_reduce nested'.format(n),
+         best(lambda: diag_reduce(nested, add), 1, 3)),
+    ]
+    if np is not None:
+        a = np.array(nested)
+        rows.append(('all diags {0}x{0}, diag_reduce ndarray'.format(n),
+                     best(lambda: diag_reduce(a, add), 5, 3)))
+    return rows
+
+
+# Run in a fresh process so ru_maxrss only sees the line extraction
+_PEAK_RSS = '''
+import resource, sys, time
+import numpy as np
+from funcyou.indexers import {indexer}
+src = np.load(sys.argv[1], mmap_mode='r')
+before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+start = time.perf_counter()
+{indexer}(src)[7].sum()
+elapsed = time.perf_counter() - start
+print(elapsed, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - before)
+'''
+
+
+def run_files(n=50000):
+    'One line of an n x n float64 .npy, sparse on disk'
+    if np is None:
+        return []
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'big.npy')
+        # Only writes the header, the data is a hole in the file
+        m = np.lib.format.open_memmap(path, 'w+', 'f8', (n, n))
+        del m
+        for indexer in ('column', 'diag', 'adiag'):
+            out = subprocess.run(
+                [sys.executable, '-c', _PEAK_RSS.format(indexer=indexer), path],
+                check=True, capture_output=True, text=True).stdout.split()
+            name = '{} {}x{} memmap'.format(indexer, n, n)
+            rows.append((name, float(out[0])))
+            # ru_maxrss is in kilobytes on Linux
+            rows.append((name + ' peak RSS growth', int(out[1]) / 1024, 'MB'))
+    return rows
+
+
+if __name__ == '__main__':
+    report(__doc__, run())
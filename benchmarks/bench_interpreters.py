@@ -0,0 +1,161 @@
+'''Interpreters: parse and evaluation throughput of pyml, fy and lampy on
+generated programs of increasing size'''
+
+from contextlib import contextmanager, redirect_stderr, redirect_stdout
+import logging
+import os
+import warnings
+
+from benchmarks._timing import best, report
+
+SIZES = (10, 100, 1000)
+
+
+def repeat(n):
+    'Fewer repetitions for the big programs'
+    return 3 if n < 1000 else 1
+
+
+@contextmanager
+def quiet():
+    'Silence the prints, debug logging and warnings of the interpreters'
+    with open(os.devnull, 'w') as devnull, \
+            redirect_stdout(devnull), redirect_stderr(devnull), warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        logging.disable(logging.DEBUG)
+        try:
+            yield
+        finally:
+            logging.disable(logging.NOTSET)
+
+
+def name(prefix, i):
+    'Identifier number i, pyml and lampy identifiers are letters only'
+    letters = ''
+    while True:
+        i, r = divmod(i, 26)
+        letters = chr(ord('a') + r) + letters
+        if not i:
+            return prefix + letters
+
+
+def pyml_source(n):
+    'n statements of vals, arithmetic, aliases and funs'
+    v = lambda i: name('v', i)
+    lines = ['val {} = 1;'.format(v(0))]
+    for i in range(1, n):
+        kind = i % 4
+        if kind == 0:
+            lines.append('val {} = {} + {} * 2;'.format(v(i), v(i - 3), i))
+        elif kind == 1:
+            lines.append('val {} = {};'.format(v(i), v(i - 1)))
+        elif kind == 2:
+            lines.append('val {} = "s{}";'.format(v(i), i))
+        else:
+            lines.append('fun {} a b = a + b * {};'.format(name('f', i), i))
+    return '\n'.join(lines)
+
+
+def fy_source(n):
+    'n lines of imports and applications, of plain and dotted names'
+    lines = []
+    for i in range(n):
+        if i % 4 == 0:
+            lines.append('from os import path')
+        elif i % 4 == 1:
+            lines.append('(add {} (mul 2 {}))'.format(i, i))
+        elif i % 4 == 2:
+            lines.append('max {} {} (sub {} 1)'.format(i, i + 1, i))
+        else:
+            lines.append('math.floor (math.sqrt {})'.format(i))
+    return lines
+
+
+def lampy_source(n):
+    'n function definitions and n calls'
+    defs = ' '.join('(def {} x (sum x {}))'.format(name('f', i), i) for i in range(n))
+    calls = ' '.join('({} {})'.format(name('f', i), i) for i in range(n))
+    return defs + ' ' + calls
+
+
+PYML_FUN = 'fun f a b = if a > b then a * 2 + b else b * 2 + a end;'
+PYML_LOOKUPS = 'val k = 3; fun f a b c d = a + b + c + d + a + b + c + d + k;'
+
+
+def run_pyml():
+    with quiet():
+        from pyml import compiler, lang
+    rows = []
+    for n in SIZES:
+        src = pyml_source(n)
+        with quiet():
+            rows.append(('pyml parse {} statements'.format(n),
+                         best(lambda: lang.parse(src), 1, repeat(n))))
+            statements = lang.parse(src)
+            rows.append(('pyml interpreter eval {} statements'.format(n),
+                         best(lambda: lang.interpret(statements), 1, repeat(n))))
+            rows.append(('pyml compiler compile {} statements'.format(n),
+                         best(lambda: compiler.compile_module(statements), 1, repeat(n))))
+            code = compiler.compile_module(statements)
+            rows.append(('pyml compiler eval {} statements'.format(n),
+                         best(lambda: compiler.run(code), 1, repeat(n))))
+    calls = [(i, 500 - i) for i in range(1000)]
+    with quiet():
+        for engine in lang.ENGINES:
+            f = lang.run(PYML_FUN, engine)['f']
+            rows.append(('pyml {} 1000 fun calls'.format(engine),
+                         best(lambda: [f(a, b) for a, b in calls], 1, 5)))
+        # Variable lookups dominate, one global and eight local reads per call
+        f = lang.run(PYML_LOOKUPS)['f']
+        rows.append(('pyml interpreter 1000 lookup heavy calls',
+                     best(lambda: [f(a, b, a, b) for a, b in calls], 1, 5)))
+    return rows
+
+
+def run_fy():
+    with quiet():
+        from funcyou import fy
+    rows = []
+    for n in SIZES:
+        lines = fy_source(n)
+
+        def parse():
+            for line in lines:
+                fy.parse(line)
+        with quiet():
+            rows.append(('fy parse {} lines'.format(n), best(parse, 1, repeat(n))))
+            trees = [fy.parse(line) for line in lines]
+
+            def evaluate():
+                session = fy.Session()
+                for tree in trees:
+                    session.eval(tree)
+            seconds = best(evaluate, 1, repeat(n))
+            rows.append(('fy eval {} lines'.format(n), seconds))
+            rows.append(('fy eval {} lines'.format(n), n / seconds, 'lines/s'))
+            seconds = best(lambda: list(fy.Session().run(lines)), 1, repeat(n))
+            rows.append(('fy parse+eval {} lines'.format(n), n / seconds, 'lines/s'))
+    return rows
+
+
+def run_lampy():
+    with quiet():
+        import lampy
+    rows = []
+    for n in SIZES:
+        src = lampy_source(n)
+        with quiet():
+            rows.append(('lampy parse {} defs+calls'.format(n),
+                         best(lambda: lampy.exprs.parseString(src), 1, repeat(n))))
+            exprs = lampy.exprs.parseString(src)
+            rows.append(('lampy eval {} defs+calls'.format(n),
+                         best(lambda: [e.eval() for e in exprs], 1, repeat(n))))
+    return rows
+
+
+def run():
+    return run_pyml() + run_fy() + run_lampy()
+
+
+if __name__ == '__main__':
+    report(__doc__, run())
@@ -0,0 +1,57 @@
+'''LAMBDA expressions: compiled trees and batches vs the old operator_fcty partials'''
+
+from functools import partial
+import operator as o
+
+from funcyou import LAMBDA as _, fswap
+from funcyou.indexers import np
+from benchmarks._timing import best, report
+
+DATA = list(range(1000))
+
+
+def operator_fcty(op, other, swap=False):
+    'The pre expression tree implementation, kept here for comparison'
+    op = fswap(op) if swap else op
+    return partial(op, other)
+
+
+def run():
+    legacy = operator_fcty(o.mul, 2, True)
+    compiled = _ * 2
+    fused = (_ * 2 + 1) % 7
+    # The old objects couldn't be chained, nesting them by hand is the
+    # closest equivalent of `(_ * 2 + 1) % 7`
+    m, a, r = (operator_fcty(o.mul, 2, True), operator_fcty(o.add, 1, True),
+               operator_fcty(o.mod, 7, True))
+    handwritten = lambda x: (x * 2 + 1) % 7
+    return [
+        ('map _ * 2, operator_fcty', best(lambda: list(map(legacy, DATA)))),
+        ('map _ * 2, compiled', best(lambda: list(map(compiled, DATA)))),
+        ('map (_ * 2 + 1) % 7, nested operator_fcty',
+         best(lambda: list(map(lambda x: r(a(m(x))), DATA)))),
+        ('map (_ * 2 + 1) % 7, compiled', best(lambda: list(map(fused, DATA)))),
+        ('map (_ * 2 + 1) % 7, .func', best(lambda: list(map(fused.func, DATA)))),
+        ('map (_ * 2 + 1) % 7, hand-written lambda',
+         best(lambda: list(map(handwritten, DATA)))),
+    ] + run_batch()
+
+
+def run_batch():
+    'Whole column evaluation, needs NumPy'
+    if np is None:
+        return []
+    column = np.arange(1000000)
+    values = column.tolist()
+    fused = (_ * 2 + 1) % 7
+    pred = _ < 500000
+    return [
+        ('1M rows (_ * 2 + 1) % 7, map', best(lambda: list(map(fused, values)), 1, 3)),
+        ('1M rows (_ * 2 + 1) % 7, map_batch', best(lambda: fused.map_batch(column), 5, 3)),
+        ('1M rows _ < 500000, filter', best(lambda: list(filter(pred, values)), 1, 3)),
+        ('1M rows _ < 500000, filter_batch', best(lambda: pred.filter_batch(column), 5, 3)),
+    ]
+
+
+if __name__ == '__main__':
+    report(__doc__, run())
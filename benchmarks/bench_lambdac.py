@@ -0,0 +1,42 @@
+'''lambdac: call by name, need and value on Church numerals, fixed point
+combinators and list encodings, normalized and read back as ints'''
+
+from benchmarks._timing import best, report
+
+FACT = r'(\u. 1) (\u. times n (fact (pred n)))'
+RANGE = r'(\r n. iszero n (\u. nil) (\u. cons n (r (pred n))) id)'
+
+# name, program, expected, strategies it terminates with
+CASES = (
+    ('church 2^16', 'pow 2 16', 65536, ('name', 'need', 'value')),
+    ('church 300 * 300', 'times 300 300', 90000, ('name', 'need', 'value')),
+    ('shared argument', r'(\x. plus x x) (pow 3 7)', 4374, ('name', 'need', 'value')),
+    ('factorial 6, Z', r'Z (\fact n. iszero n ' + FACT + ' id) 6', 720,
+     ('name', 'need', 'value')),
+    ('factorial 6, Y', r'Y (\fact n. iszero n ' + FACT + ' id) 6', 720, ('name', 'need')),
+    ('sum of the list 1..60', 'sum (Z ' + RANGE + ' 60)', 1830, ('name', 'need', 'value')),
+    ('length of a mapped list', 'length (map succ (Z ' + RANGE + ' 100))', 100,
+     ('name', 'need', 'value')),
+)
+
+
+def run():
+    import lambdac
+
+    rows = []
+    for name, source, expected, strategies in CASES:
+        term = lambdac.program(lambdac.PRELUDE + source)
+        for strategy in strategies:
+            def evaluate():
+                machine = lambdac.Machine(strategy)
+                assert lambdac.to_int(machine.normalize(term)) == expected
+                return machine
+            rows.append(('{}, by {}'.format(name, strategy), best(evaluate, 1, 3)))
+            machine = evaluate()
+            rows.append(('{}, by {}, betas'.format(name, strategy), machine.betas, 'betas'))
+            rows.append(('{}, by {}, steps'.format(name, strategy), machine.steps, 'steps'))
+    return rows
+
+
+if __name__ == '__main__':
+    report(__doc__, run())
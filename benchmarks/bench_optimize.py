@@ -0,0 +1,46 @@
+'''pyml optimizer: tree size and evaluation time of generated programs
+with and without constant folding, propagation and inlining'''
+
+from benchmarks._timing import best, report
+from benchmarks.bench_interpreters import name, pyml_source, quiet
+
+SIZES = (100, 1000)
+
+
+def calls_source(n):
+    'pyml_source(n) followed by n calls of small funs on its constants'
+    f = lambda i: name('f', 4 * i + 3)
+    v = lambda i: name('v', 4 * i)
+    lines = [pyml_source(4 * n)]
+    for i in range(n):
+        lines.append('val {} = {} {} (if {} > 0 then 1 else 2 end);'.format(
+            name('c', i), f(i), v(i), v(i)))
+    return '\n'.join(lines)
+
+
+def run():
+    from pyml import compiler, lang, optimize
+
+    rows = []
+    with quiet():
+        for n in SIZES:
+            source = calls_source(n)
+            statements = lang.parse(source)
+            optimized = optimize.optimize(statements)
+            rows.append(('{} statements, nodes'.format(len(statements)),
+                         sum(map(optimize.size, statements)), 'nodes'))
+            rows.append(('{} statements, nodes optimized'.format(len(statements)),
+                         sum(map(optimize.size, optimized)), 'nodes'))
+            rows.append(('{} statements, optimize'.format(len(statements)),
+                         best(lambda: optimize.optimize(statements), 1, 3)))
+            for label, tree in (('', statements), (' optimized', optimized)):
+                rows.append(('{} statements, interpreter eval{}'.format(len(statements), label),
+                             best(lambda: lang.interpret(tree), 1, 3)))
+                code = compiler.compile_module(tree)
+                rows.append(('{} statements, compiler eval{}'.format(len(statements), label),
+                             best(lambda: compiler.run(code), 1, 3)))
+    return rows
+
+
+if __name__ == '__main__':
+    report(__doc__, run())
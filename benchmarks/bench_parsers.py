@@ -0,0 +1,32 @@
+'''pyml parsers: hand written Pratt parser vs the pyparsing grammar on
+generated sources'''
+
+from benchmarks._timing import best, report
+from benchmarks.bench_interpreters import pyml_source, quiet
+
+PRATT_SIZES = (10000, 100000)
+# pyparsing needs about a millisecond per statement
+PYPARSING_SIZES = (1000, 10000)
+
+
+def throughput(parser, n):
+    from pyml import lang
+
+    src = pyml_source(n)
+    with quiet():
+        seconds = best(lambda: lang.parse(src, parser), 1, 1)
+    return [('{} parse {} lines'.format(parser, n), seconds),
+            ('{} {} lines'.format(parser, n), n / seconds, 'lines/s')]
+
+
+def run():
+    rows = []
+    for n in PRATT_SIZES:
+        rows += throughput('pratt', n)
+    for n in PYPARSING_SIZES:
+        rows += throughput('pyparsing', n)
+    return rows
+
+
+if __name__ == '__main__':
+    report(__doc__, run())
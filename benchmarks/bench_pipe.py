@@ -0,0 +1,69 @@
+'''Pipe vs LazyPipe: time and peak traced memory over a large line stream,
+serial vs pooled map stages'''
+
+import tracemalloc
+
+from funcyou import Pipe
+from funcyou.streams import LazyPipe, map_, filter_, first, pmap
+from benchmarks._timing import best, report
+
+N = 200000
+
+
+def lines():
+    return ('line {}\n'.format(i) for i in range(N))
+
+
+def eager():
+    return (Pipe(lines()) | (lambda it: [l.strip() for l in it])
+            | (lambda ls: [l for l in ls if l.endswith('7')]) | len)()
+
+
+def lazy():
+    return (LazyPipe(lines()) | map_(str.strip)
+            | filter_(lambda l: l.endswith('7')) | (lambda it: sum(1 for _ in it)))()
+
+
+def lazy_first():
+    return (LazyPipe(lines()) | map_(str.strip) | filter_(lambda l: l.endswith('7'))
+            | first)()
+
+
+def peak(func):
+    'Return the peak traced memory while func() runs, in bytes'
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def burn(n):
+    'Some CPU bound work'
+    return sum(i * i for i in range(n % 100 + 2000))
+
+
+def run_parallel():
+    work = range(4000)
+    return [
+        ('CPU bound map_, serial', best(lambda: list(LazyPipe(work) | map_(burn)), 1, 3)),
+        ('CPU bound pmap, threads',
+         best(lambda: list(LazyPipe(work) | pmap(burn, chunksize=100)), 1, 3)),
+        ('CPU bound pmap, processes',
+         best(lambda: list(LazyPipe(work) | pmap(burn, chunksize=100, executor='process')),
+              1, 3)),
+    ]
+
+
+def run():
+    rows = []
+    for name, func in (('eager Pipe', eager), ('LazyPipe', lazy),
+                       ('LazyPipe | first', lazy_first)):
+        rows.append(('{}, {} lines'.format(name, N), best(func, 1, 3)))
+        rows.append(('{} peak memory'.format(name), peak(func) / 2 ** 20, 'MB'))
+    return rows + run_parallel()
+
+
+if __name__ == '__main__':
+    report(__doc__, run())
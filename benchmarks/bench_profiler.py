@@ -0,0 +1,29 @@
+'''pyml profiling: interpreter run time of a call heavy program with the
+default logging configuration, and under pyml.profiler.Profiler'''
+
+from benchmarks._timing import best, report
+
+SOURCE = ('fun f a b = if a > b then a * 2 + b else b * 2 + a end;'
+          'fun loop n acc = if n == 0 then acc else loop (n - 1) (acc + f n 3) end;'
+          'val x = loop 10000 0;')
+
+
+def run():
+    from pyml import lang
+    from pyml.profiler import Profiler
+
+    def profiled():
+        with Profiler():
+            lang.run(SOURCE, optimize=False)
+
+    plain = best(lambda: lang.run(SOURCE, optimize=False), 1, 3)
+    slow = best(profiled, 1, 3)
+    return [
+        ('10000 iterations', plain),
+        ('10000 iterations, profiled', slow),
+        ('profiling overhead', slow / plain, 'x'),
+    ]
+
+
+if __name__ == '__main__':
+    report(__doc__, run())
@@ -0,0 +1,34 @@
+'''pyml recursion: a tail recursive loop, which runs in constant stack,
+and recursion deeper than the Python stack, per engine'''
+
+from benchmarks._timing import best, report
+from benchmarks.bench_interpreters import quiet
+
+LOOP = ('fun loop n acc = if n == 0 then acc else loop (n - 1) (acc + n) end;'
+        'val x = loop {} 0;')
+SUM = 'fun sum n = if n == 0 then 0 else n + sum (n - 1) end; val x = sum {};'
+
+CASES = (
+    ('tail loop', LOOP, {'interpreter': 1000000, 'compiler': 1000000}),
+    ('non tail recursion', SUM, {'interpreter': 100000, 'compiler': 100000}),
+)
+
+
+def run():
+    from pyml import lang
+
+    rows = []
+    with quiet():
+        for name, template, sizes in CASES:
+            for engine in lang.ENGINES:
+                n = sizes[engine]
+                source = template.format(n)
+                seconds = best(lambda: lang.run(source, engine), 1, 3)
+                rows.append(('{} {} iterations, {}'.format(name, n, engine), seconds))
+                rows.append(('{} {}, per iteration'.format(name, engine),
+                             seconds / n * 1e9, 'ns'))
+    return rows
+
+
+if __name__ == '__main__':
+    report(__doc__, run())
@@ -0,0 +1,38 @@
+'''SKI graph reduction: Church numeral arithmetic compiled from lambda
+terms, reduced and read back as ints'''
+
+import tracemalloc
+
+from benchmarks._timing import best, report
+
+CASES = (
+    ('2^16', r'(\m n. n m) 2 16', 65536),
+    ('256 * 256', r'(\m n f. m (n f)) 256 256', 65536),
+    ('3^10', r'(\m n. n m) 3 10', 59049),
+    ('30000 + 30000', r'(\m n f x. m f (n f x)) 30000 30000', 60000),
+)
+
+
+def run():
+    import ski
+
+    rows = []
+    for name, text, expected in CASES:
+        def evaluate():
+            reducer = ski.Reducer()
+            assert reducer.church(ski.term(text, numerals=True)) == expected
+            return reducer
+        rows.append((name, best(evaluate, 1, 3)))
+        reducer = evaluate()
+        rows.append(('{} steps'.format(name), reducer.steps, 'steps'))
+        rows.append(('{} allocations'.format(name), reducer.allocations, 'nodes'))
+        tracemalloc.start()
+        evaluate()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        rows.append(('{} peak memory'.format(name), peak / 1024, 'KiB'))
+    return rows
+
+
+if __name__ == '__main__':
+    report(__doc__, run())
@@ -0,0 +1,52 @@
+'''pyml startup: fresh processes running a generated program, with a
+cold and a warm parse/compile cache'''
+
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks._timing import report
+from benchmarks.bench_interpreters import pyml_source
+
+SIZES = (1000, 10000)
+
+SCRIPT = '''
+import logging, sys
+logging.disable(logging.DEBUG)
+from pyml import lang
+from pyml.cache import ModuleCache
+with open(sys.argv[1]) as f:
+    lang.run(f.read(), sys.argv[2], cache=ModuleCache(sys.argv[3]))
+'''
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def spawn(*args):
+    'Return the wall time of a python process running args'
+    start = time.perf_counter()
+    subprocess.run((sys.executable,) + args, cwd=ROOT, check=True)
+    return time.perf_counter() - start
+
+
+def run():
+    rows = [('python startup', min(spawn('-c', 'pass') for _ in range(3))),
+            ('import pyml.lang', min(spawn('-c', 'import pyml.lang') for _ in range(3)))]
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in SIZES:
+            path = os.path.join(tmp, 'program{}.pyml'.format(n))
+            with open(path, 'w') as f:
+                f.write(pyml_source(n))
+            for engine in ('interpreter', 'compiler'):
+                cache = os.path.join(tmp, 'cache-{}-{}'.format(engine, n))
+                rows.append(('{} {} statements, cold'.format(engine, n),
+                             spawn('-c', SCRIPT, path, engine, cache)))
+                rows.append(('{} {} statements, warm'.format(engine, n),
+                             min(spawn('-c', SCRIPT, path, engine, cache) for _ in range(3))))
+    return rows
+
+
+if __name__ == '__main__':
+    report(__doc__, run())
@@ -0,0 +1,61 @@
+'''pyml streaming: running a generated module whole with run() vs one
+statement at a time with stream(), time and peak traced memory'''
+
+import time
+import tracemalloc
+
+from benchmarks._timing import report
+from benchmarks.bench_interpreters import name, quiet
+
+SIZES = (1000, 10000)
+
+# Generated configs bind the same few names over and over
+NAMES = 100
+
+
+def config_lines(n):
+    'n lines binding NAMES names in turn, each to an expression of the previous one'
+    v = lambda i: name('v', i % NAMES)
+    yield 'val {} = 1;\n'.format(v(0))
+    for i in range(1, n):
+        yield 'val {} = {} * 3 % 1000 + {};\n'.format(v(i), v(i - 1), i % 7)
+
+
+def measure(func):
+    'Return (seconds, peak traced bytes) of func()'
+    start = time.perf_counter()
+    func()
+    seconds = time.perf_counter() - start
+    tracemalloc.start()
+    try:
+        func()
+        return seconds, tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def run():
+    from pyml import lang
+
+    rows = []
+    with quiet():
+        for n in SIZES:
+            for engine in lang.ENGINES:
+                cases = (
+                    ('run', lambda: lang.run(''.join(config_lines(n)), engine)),
+                    ('stream', lambda: all(lang.stream(config_lines(n), engine))),
+                )
+                for label, func in cases:
+                    seconds, peak = measure(func)
+                    rows.append(('{} {} lines, {}'.format(label, n, engine), seconds))
+                    rows.append(('{} {} lines, {}, peak memory'.format(label, n, engine),
+                                 peak / 2 ** 20, 'MB'))
+            start = time.perf_counter()
+            next(lang.stream(config_lines(n)))
+            rows.append(('stream {} lines, first binding'.format(n),
+                         time.perf_counter() - start))
+    return rows
+
+
+if __name__ == '__main__':
+    report(__doc__, run())
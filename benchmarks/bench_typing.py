@@ -0,0 +1,30 @@
+'''pyml type inference: checking time on generated programs, and fun
+calls with and without the runtime operand checks it makes unnecessary'''
+
+from benchmarks._timing import best, report
+from benchmarks.bench_interpreters import PYML_FUN, pyml_source, quiet
+
+SIZES = (1000, 10000, 100000)
+
+
+def run():
+    from pyml import infer, lang
+
+    rows = []
+    for n in SIZES:
+        statements = lang.parse(pyml_source(n))
+        rows.append(('infer {} statements'.format(n),
+                     best(lambda: infer.check(statements), 1, 3)))
+    calls = [(i, 500 - i) for i in range(1000)]
+    with quiet():
+        for engine in lang.ENGINES:
+            for typecheck in (False, True):
+                f = lang.run(PYML_FUN, engine, typecheck=typecheck)['f']
+                rows.append(('{} 1000 fun calls, {}'.format(
+                    engine, 'typed' if typecheck else 'checked at runtime'),
+                    best(lambda: [f(a, b) for a, b in calls], 1, 5)))
+    return rows
+
+
+if __name__ == '__main__':
+    report(__doc__, run())
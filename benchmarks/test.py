@@ -0,0 +1,32 @@
+import unittest
+
+from .__main__ import compare
+
+
+def results(value, unit):
+    return {'bench': {'measure': {'value': value, 'unit': unit}}}
+
+
+class Test(unittest.TestCase):
+    def test_compare(self):
+        ae = self.assertEqual
+
+        # Times are worse when they grow
+        ae(compare(results(1.5, 's'), results(1.0, 's'), 0.1),
+           [('bench', 'measure', 1.0, 1.5, 's')])
+        ae(compare(results(0.5, 's'), results(1.0, 's'), 0.1), [])
+        ae(compare(results(1.05, 's'), results(1.0, 's'), 0.1), [])
+
+        # Throughputs are worse when they drop
+        ae(compare(results(50, 'lines/s'), results(100, 'lines/s'), 0.1),
+           [('bench', 'measure', 100, 50, 'lines/s')])
+        ae(compare(results(200, 'lines/s'), results(100, 'lines/s'), 0.1), [])
+        ae(compare(results(95, 'lines/s'), results(100, 'lines/s'), 0.1), [])
+
+        # Measures missing from the baseline or in another unit are skipped
+        ae(compare(results(2, 's'), results(1, 'ms'), 0.1), [])
+        ae(compare(results(2, 's'), {}, 0.1), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -17,24 +17,99 @@
 Function cheats that I keep below the sleeve.
 '''
 
-from functools import partial, reduce
-import operator as o 
+from functools import partial
+from inspect import signature
+from operator import attrgetter
+import sys
+
+from .memo import memoize
+
+def _generate(params, expr, args):
+    'Build `lambda ...: expr` inside a factory taking params, call it with args'
+    code = 'def _make({}):\n    return {}\n'.format(', '.join(params), expr)
+    namespace = {}
+    exec(code, namespace)
+    return namespace['_make'](*args)
+
+# Longer chains run in a loop instead of as one generated expression,
+# deeper call nesting would trip the parser limits
+_MAX_FUSED = 32
+
+def _chain(stages):
+    'Return a function calling stages in order, each on the previous result'
+    first, rest = stages[0], stages[1:]
+    if not rest:
+        return first
+    if len(stages) <= _MAX_FUSED:
+        names = ['f{}'.format(i) for i in range(len(stages))]
+        body = 'f0(*args, **kwargs)'
+        for name in names[1:]:
+            body = '{}({})'.format(name, body)
+        return _generate(names, 'lambda *args, **kwargs: ' + body, stages)
+
+    def chained(*args, **kwargs):
+        value = first(*args, **kwargs)
+        for f in rest:
+            value = f(value)
+        return value
+    return chained
 
 def compose(*funcs):
     'Return compositon of funcs'
-    def compose2(f, g):
-        return lambda *args, **kwargs: f(g(*args, **kwargs))
-    return reduce(compose2, funcs)
-
-def curry(f):
-    'Return curried version of f'
-    def _(arg):
-        try:
-            return f(arg)
-        except TypeError:
-            return curry(partial(f, arg))
+    if not funcs:
+        raise TypeError('compose() needs at least one function')
+    return _chain(funcs[::-1])
+
+def _required(f):
+    """Return the names of the required positional parameters of f, None
+    for positional only ones, None if unknown"""
+    try:
+        params = signature(f).parameters.values()
+    except (TypeError, ValueError):
+        return None
+    return tuple(p.name if p.kind == p.POSITIONAL_OR_KEYWORD else None
+                 for p in params
+                 if p.kind in (p.POSITIONAL_ONLY, p.POSITIONAL_OR_KEYWORD)
+                 and p.default is p.empty)
+
+def _curried(f, arity, names, args, kwargs):
+    def _(*more, **kwmore):
+        have = args + more
+        kw = {**kwargs, **kwmore} if kwmore else kwargs
+        # The parameters left may all have been given by keyword
+        if len(have) >= arity or (names and kw and
+                                  all(n in kw for n in names[len(have):])):
+            return f(*have, **kw)
+        return _curried(f, arity, names, have, kw)
     return _
 
+def curry(f, arity=None):
+    '''Return curried version of f
+
+    f is called once `arity` positional arguments were given, one or more
+    at a time, by default as many as f requires. Parameters with defaults
+    and keyword only ones are left alone, keywords can be passed at any
+    step and by default count for the required parameters they name. The arity is read once from the signature; callables without
+    one (some builtins) are called on every step until they stop raising
+    TypeError.
+
+    >>> add3 = curry(lambda a, b, c=0: a + b + c)
+    >>> add3(1)(2), add3(1, 2), add3(1)(2, 3), add3(1)(2, c=3), add3(1)(b=2)
+    (3, 3, 6, 6, 3)
+    '''
+    names = ()
+    if arity is None:
+        names = _required(f)
+        arity = None if names is None else len(names)
+    if arity is None:
+        def _(arg):
+            try:
+                return f(arg)
+            except TypeError:
+                return curry(partial(f, arg))
+        return _
+    return _curried(f, arity, names, (), {})
+
 def fswap(f):
     'Given f(a,b) returns f(b,a)'
     return lambda a,b: f(b,a)
@@ -47,160 +122,271 @@ class Let:
         raise AttributeError("Can't assing values to Let")
 
 
-class Pipe:
-    def __init__(self, val):
-        self.val = val
-
-    def __call__(self):
-        return self.val
-
-    def __or__(self, other):
-        return Pipe(other(self.val))
+class Composition:
+    '''Functions composed in pipe order, the first one added runs first.
 
-#a = Pipe([1,2,3,4]) | sum | (lambda x:x*x) | (lambda x:range(x)) | list
-#print(a())
+    The stages are flattened into a single function (`.plan`) on the first
+    call and reused until `|` appends another stage.
+    '''
 
-from functools import partial, reduce
-class Composition:
     def __init__(self):
         self.funcs = []
 
-    def __call__(self, *args, **kwargs):
-        # Refactor this
-        return reduce(lambda f, g: lambda *a, **k: f(g(*a,*k)), reversed(self.funcs))(*args, **kwargs)
+    def __getattr__(self, attr):
+        if attr == 'plan':
+            if not self.funcs:
+                raise TypeError("Can't call an empty Composition")
+            self.plan = _chain(tuple(self.funcs))
+            return self.plan
+        raise AttributeError(attr)
+
+    # See _Lambda.__call__
+    __call__ = property(attrgetter('plan'))
 
     def __or__(self, other):
         self.funcs.append(other)
+        self.__dict__.pop('plan', None)
         return self
 
 #f = Composition() | sum | (lambda x:x*x) | (lambda x:range(x)) | list
 #print(f([1,2,3,4]))
 
 
-class _Lambda(object):
+# Expression tree nodes used by _Lambda. A tree is a plain tuple whose
+# first item tells its kind:
+#
+#   (_ARG,)                      the placeholder itself
+#   (_CONST, value)              a bound constant
+#   (_UNOP, symb, operand)       unary operator
+#   (_BINOP, symb, left, right)  binary operator
+_ARG, _CONST, _UNOP, _BINOP = range(4)
 
-    def __init__(self, partial_, swap, symb):
-        self.partial = partial_
-        self.swap = swap
-        self.symb = symb
+_ARG_TREE = (_ARG,)
 
-    def __call__(self, *args, **kwargs):
-        return self.partial(*args, **kwargs)
+# Types whose repr() can be pasted into generated source as a literal
+_LITERALS = (bool, str, bytes, type(None))
 
-    def __repr__(self):
-        repr_ = '({} {} {})'.format(
-                        repr(self.partial.args[0]) if not self.swap else '_',
-                        self.symb,
-                        repr(self.partial.args[0]) if self.swap else '_')
-        return repr_ 
-
-def operator_fcty(op, other, swap=False, symb='?'):
-    'Operator factory'
-    op = fswap(op) if swap else op
-    return _Lambda(partial(op, other), swap, symb)
-
-class Lambda(object):
-    'Lambda expressions'
 
-    def __le__(self, other):
-        return operator_fcty(o.le, other, True, '<=')
+def _is_literal(value):
+    if type(value) is float:
+        return value == value and value not in (float('inf'), float('-inf'))
+    if type(value) is int:
+        # repr() of huge ints fails past sys.int_info.default_max_str_digits,
+        # they are bound as closure variables like any other object
+        return value.bit_length() <= 64
+    return type(value) in _LITERALS
 
-    def __lt__(self, other):
-        return operator_fcty(o.lt, other, True, '<')
 
-    def __gt__(self, other):
-        return operator_fcty(o.gt, other, True)
+def _tree(value):
+    'Return the expression tree of value, wrapping non lambdas as constants'
+    if isinstance(value, _Lambda):
+        return value.tree
+    return (_CONST, value)
 
-    def __ge__(self, other):
-        return operator_fcty(o.ge, other, True)
 
-    def __rle__(self, other):
-        return operator_fcty(o.le, other)
+def _source(tree, arg, const):
+    'Render tree as python source, `const` renders constant nodes'
+    kind = tree[0]
+    if kind == _ARG:
+        return arg
+    if kind == _CONST:
+        return const(tree[1])
+    if kind == _UNOP:
+        return '({}{})'.format(tree[1], _source(tree[2], arg, const))
+    return '({} {} {})'.format(_source(tree[2], arg, const), tree[1],
+                               _source(tree[3], arg, const))
 
-    def __rlt__(self, other):
-        return operator_fcty(o.lt, other)
 
-    def __rgt__(self, other):
-        return operator_fcty(o.gt, other)
+def _compile(tree):
+    '''Compile tree into a single python function of one argument.
 
-    def __rge__(self, other):
-        return operator_fcty(o.ge, other)
+    Literal constants are inlined into the generated source, anything else
+    is bound as a closure variable, so the resulting function costs the same
+    as the equivalent hand-written lambda.
+    '''
+    consts = []
 
-    def __eq__(self, other):
-        return operator_fcty(o.eq, other)
-    __req__ = __eq__
+    def const(value):
+        if _is_literal(value):
+            return '({!r})'.format(value)
+        consts.append(value)
+        return '_c{}'.format(len(consts) - 1)
 
-    def __ne__(self, other):
-        return operator_fcty(o.ne, other)
-    __rne__ = __ne__
+    body = _source(tree, 'x', const)
+    names = ['_c{}'.format(i) for i in range(len(consts))]
+    return _generate(names, 'lambda x: ' + body, consts)
 
-    def __mul__(self, other):
-        return operator_fcty(o.mul, other)
-    __rmul__ = __mul__
 
-    def __add__(self, other):
-        return operator_fcty(o.add, other)
-    __radd__ = __add__
+# Rows evaluated at once by _Lambda batch methods, small enough for the
+# temporaries of each operator to stay in cache
+BATCH_CHUNKSIZE = 1 << 14
 
-    def __sub__(self, other):
-        return operator_fcty(o.sub, other, True)
-    
-    def __rsub__(self, other):
-        return operator_fcty(o.sub, other)
 
-    def __rfloordiv__(self, other):
-        return operator_fcty(o.floordiv, other)
+def _is_array(values):
+    # NumPy is optional and not imported here, an array can only exist
+    # once something else imported it
+    np = sys.modules.get('numpy')
+    return np is not None and isinstance(values, np.ndarray)
 
-    def __floordiv__(self, other):
-        return operator_fcty(o.floordiv, other, True)
 
-    def __rtruediv__(self, other):
-        return operator_fcty(o.truediv, other)
+def _map_array(func, array, chunksize):
+    'Evaluate func over array one chunk of rows at a time'
+    np = sys.modules['numpy']
+    if array.ndim == 0 or len(array) <= chunksize:
+        return np.asarray(func(array))
+    first = np.asarray(func(array[:chunksize]))
+    out = np.empty((len(array),) + first.shape[1:], dtype=first.dtype)
+    out[:chunksize] = first
+    for start in range(chunksize, len(array), chunksize):
+        out[start:start + chunksize] = func(array[start:start + chunksize])
+    return out
 
-    def __truediv__(self, other):
-        return operator_fcty(o.truediv, other, True)
 
-    def __mod__(self, other):
-        return operator_fcty(o.mod, other, True)
+def _binop(symb):
+    def method(self, other):
+        return _Lambda((_BINOP, symb, self.tree, _tree(other)))
+    return method
 
-    def __rmod__(self, other):
-        return operator_fcty(o.mod, other)
 
-    def __pow__(self, other):
-        return operator_fcty(o.pow, other, True)
+def _rbinop(symb):
+    def method(self, other):
+        return _Lambda((_BINOP, symb, _tree(other), self.tree))
+    return method
 
-    def __rpow__(self, other):
-        return operator_fcty(o.pow, other)
 
-    def __and__(self, other):
-        return operator_fcty(o.pow, other, True)
+def _unop(symb):
+    def method(self):
+        return _Lambda((_UNOP, symb, self.tree))
+    return method
 
-    def __rand__(self, other):
-        return operator_fcty(o.pow, other)
 
-    def __or__(self, other):
-        return operator_fcty(o.or_, other, True)
+class _Lambda(object):
+    '''A placeholder expression.
+
+    Operators on a `_Lambda` return a new `_Lambda` holding a bigger
+    expression tree, so expressions can be chained and nested freely:
+
+    >>> from funcyou import LAMBDA as _
+    >>> f = (_ * 2 + 1) % 7
+    >>> f
+    (((_ * 2) + 1) % 7)
+    >>> f(4)
+    2
 
-    def __ror__(self, other):
-        return operator_fcty(o.or_, other)
+    Every `_` in the expression stands for the same (single) argument.
+    The whole tree is compiled once, on the first call, into one python
+    function available as `.func`.
+    '''
 
-    def __xor__(self, other):
-        return operator_fcty(o.or_, other, True)
+    __slots__ = ('tree', 'func')
 
-    def __rxor__(self, other):
-        return operator_fcty(o.or_, other)
+    def __init__(self, tree):
+        self.tree = tree
 
-    def __rshift__(self, other):
-        return operator_fcty(o.rshift, other, True)
+    def __getattr__(self, attr):
+        if attr == 'func':
+            self.func = _compile(self.tree)
+            return self.func
+        raise AttributeError(attr)
 
-    def __rrshift__(self, other):
-        return operator_fcty(o.rshift, other)
+    # Calling the instance looks up `__call__` on the type and calls what
+    # the descriptor returns, so this hands the arguments straight to the
+    # compiled function without a python level trampoline.
+    __call__ = property(attrgetter('func'))
 
-    def __lshift__(self, other):
-        return operator_fcty(o.lshift, other, True)
+    def __bool__(self):
+        raise TypeError("Lambda expressions can't be used as booleans, "
+                        "chained comparisons are not supported")
 
-    def __rlshift__(self, other):
-        return operator_fcty(o.lshift, other)
+    def __repr__(self):
+        return _source(self.tree, '_', repr)
+
+    def map_batch(self, values, chunksize=BATCH_CHUNKSIZE):
+        '''Apply the expression to all values at once.
+
+        NumPy arrays are evaluated whole, `chunksize` rows at a time, by the
+        ufuncs matching each operator and an array is returned. Anything
+        else is mapped item by item and a list is returned.
+
+        >>> from funcyou import LAMBDA as _
+        >>> (_ * 2).map_batch([1, 2, 3])
+        [2, 4, 6]
+        '''
+        if _is_array(values):
+            return _map_array(self.func, values, chunksize)
+        return list(map(self.func, values))
+
+    def mask(self, values, chunksize=BATCH_CHUNKSIZE):
+        '''Return the truth value of the expression for all values.
+
+        A boolean array for NumPy arrays, a list of bools otherwise.
+
+        >>> from funcyou import LAMBDA as _
+        >>> (_ < 2).mask([1, 2, 3])
+        [True, False, False]
+        '''
+        if _is_array(values):
+            return _map_array(self.func, values, chunksize).astype(bool, copy=False)
+        return list(map(bool, map(self.func, values)))
+
+    def filter_batch(self, values, chunksize=BATCH_CHUNKSIZE):
+        '''Return the values for which the expression is true.
+
+        >>> from funcyou import LAMBDA as _
+        >>> (_ % 2 == 0).filter_batch(range(6))
+        [0, 2, 4]
+        '''
+        if _is_array(values):
+            return values[self.mask(values, chunksize)]
+        return list(filter(self.func, values))
+
+    __lt__ = _binop('<')
+    __le__ = _binop('<=')
+    __gt__ = _binop('>')
+    __ge__ = _binop('>=')
+    __eq__ = _binop('==')
+    __ne__ = _binop('!=')
+    __hash__ = None
+
+    __add__ = _binop('+')
+    __radd__ = _rbinop('+')
+    __sub__ = _binop('-')
+    __rsub__ = _rbinop('-')
+    __mul__ = _binop('*')
+    __rmul__ = _rbinop('*')
+    __matmul__ = _binop('@')
+    __rmatmul__ = _rbinop('@')
+    __truediv__ = _binop('/')
+    __rtruediv__ = _rbinop('/')
+    __floordiv__ = _binop('//')
+    __rfloordiv__ = _rbinop('//')
+    __mod__ = _binop('%')
+    __rmod__ = _rbinop('%')
+    __pow__ = _binop('**')
+    __rpow__ = _rbinop('**')
+    __lshift__ = _binop('<<')
+    __rlshift__ = _rbinop('<<')
+    __rshift__ = _binop('>>')
+    __rrshift__ = _rbinop('>>')
+    __and__ = _binop('&')
+    __rand__ = _rbinop('&')
+    __xor__ = _binop('^')
+    __rxor__ = _rbinop('^')
+    __or__ = _binop('|')
+    __ror__ = _rbinop('|')
+
+    __neg__ = _unop('-')
+    __pos__ = _unop('+')
+    __invert__ = _unop('~')
+
+
+class Lambda(_Lambda):
+    'Lambda expressions'
+
+    __slots__ = ()
+
+    def __init__(self):
+        super().__init__(_ARG_TREE)
 
 LAMBDA = Lambda()
 
@@ -233,6 +419,9 @@ class Pipe(object):
         
         With this behavior is expected that any amount of expressions can be
         chained and the result can be retrived by calling the return callable.
+
+        Every stage is evaluated as soon as it is piped, see
+        `funcyou.streams.LazyPipe` for a lazy, streaming variant.
     ''' 
 
     def __init__(self, value=None):
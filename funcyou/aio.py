@@ -0,0 +1,177 @@
+'''Asyncio aware pipes.
+
+`AsyncPipe` works like `funcyou.streams.LazyPipe` but its stages may be
+coroutine functions. `amap` and `afilter` stages stream items from sync
+or async iterables, running up to `limit` calls concurrently:
+
+>>> import asyncio
+>>> from funcyou.aio import AsyncPipe, amap
+>>> async def fetch(x):
+...     await asyncio.sleep(0.01)
+...     return x * 2
+>>> asyncio.run((AsyncPipe(range(100)) | amap(fetch, limit=100) | sum)())
+9900
+
+The hundred calls above overlap, so the pipe takes about as long as the
+slowest one instead of their sum.
+'''
+
+import asyncio
+from collections import deque
+import inspect
+
+LIMIT = 16
+
+
+async def _resolve(value):
+    if inspect.isawaitable(value):
+        return await value
+    return value
+
+
+async def _aiter(iterable):
+    'Async iterator over a sync or async iterable'
+    if hasattr(iterable, '__aiter__'):
+        async for item in iterable:
+            yield item
+    else:
+        for item in iterable:
+            yield item
+
+
+async def _collect(stream):
+    return [item async for item in stream]
+
+
+class AsyncStage(object):
+    '''A streaming async pipe stage.
+
+    `transform` takes an async iterator of items and returns another one.
+    Calling a stage on a sync or async iterable returns a coroutine
+    resolving to the list of its items.
+    '''
+
+    def __init__(self, transform, name='stage'):
+        self.transform = transform
+        self.name = name
+
+    async def __call__(self, items):
+        return await _collect(self.transform(_aiter(items)))
+
+    def __repr__(self):
+        return self.name
+
+
+async def _map_item(func, item):
+    return True, await _resolve(func(item))
+
+
+async def _filter_item(pred, item):
+    return bool(await _resolve(pred(item))), item
+
+
+def _concurrent(apply, func, limit, ordered):
+    '''Return a transform running apply(func, item) as a task for every
+    item, with at most limit tasks in flight'''
+    if limit < 1:
+        raise ValueError('limit must be at least 1, not {!r}'.format(limit))
+
+    async def transform(items):
+        items = items.__aiter__()
+        pending, exhausted = deque(), False
+        try:
+            while True:
+                while not exhausted and len(pending) < limit:
+                    try:
+                        item = await items.__anext__()
+                    except StopAsyncIteration:
+                        exhausted = True
+                    else:
+                        pending.append(asyncio.ensure_future(apply(func, item)))
+                if not pending:
+                    return
+                if ordered:
+                    await asyncio.wait((pending[0],))
+                    done = (pending.popleft(),)
+                else:
+                    done, rest = await asyncio.wait(
+                        pending, return_when=asyncio.FIRST_COMPLETED)
+                    pending = deque(rest)
+                for task in done:
+                    keep, value = task.result()
+                    if keep:
+                        yield value
+        finally:
+            for task in pending:
+                task.cancel()
+    return transform
+
+
+def amap(func, limit=LIMIT, ordered=True):
+    '''Stage applying func, a sync or coroutine function, to every item.
+
+    At most `limit` calls, at least 1, are in flight at once. Results are yielded in
+    input order, or as they complete with `ordered=False`. An exception
+    raised by func is re-raised by the pipe and the pending calls are
+    cancelled.
+    '''
+    return AsyncStage(_concurrent(_map_item, func, limit, ordered),
+                      'amap({!r})'.format(func))
+
+
+def afilter(pred, limit=LIMIT, ordered=True):
+    'Stage keeping the items for which pred is true, see amap'
+    return AsyncStage(_concurrent(_filter_item, pred, limit, ordered),
+                      'afilter({!r})'.format(pred))
+
+
+class AsyncPipe(object):
+    '''A pipe whose stages may be coroutine functions.
+
+    `AsyncStage`s stream items; any other callable gets the current value,
+    with a pending stream collected into a list first, and its result is
+    awaited when it is awaitable. As in `funcyou.Pipe` a non callable
+    replaces the value.
+
+    Awaiting the called pipe, `await pipe()`, returns the final value (a
+    list if it ends with streaming stages), `async for` iterates it
+    without collecting.
+    '''
+
+    def __init__(self, source=None, stages=()):
+        self.source = source
+        self.stages = stages
+
+    def __or__(self, other):
+        if not callable(other):
+            return AsyncPipe(other)
+        return AsyncPipe(self.source, self.stages + (other,))
+
+    async def _run(self):
+        'Return (value, stream), stream is None unless it ends with stages'
+        value, stream = self.source, None
+        for stage in self.stages:
+            if isinstance(stage, AsyncStage):
+                if stream is None:
+                    stream = _aiter(value)
+                stream = stage.transform(stream)
+            else:
+                if stream is not None:
+                    value, stream = await _collect(stream), None
+                value = await _resolve(stage(value))
+        return value, stream
+
+    async def __call__(self):
+        value, stream = await self._run()
+        if stream is not None:
+            return await _collect(stream)
+        return value
+
+    async def __aiter__(self):
+        value, stream = await self._run()
+        async for item in (stream if stream is not None else _aiter(value)):
+            yield item
+
+    def __repr__(self):
+        return ' | '.join(['AsyncPipe({!r})'.format(self.source)] +
+                          [getattr(s, '__name__', repr(s)) for s in self.stages])
@@ -1,7 +1,27 @@
+'''A tiny language of python function applications.
+
+    >>> session = Session()
+    >>> session.eval(parse('from math import sqrt'))
+    <built-in function sqrt>
+    >>> session.eval(parse('max 1 (add 2 (sqrt 16))'))
+    6.0
+
+Lines parse to tuples: `('import', alias, module, name)` for imports,
+`('resolve', name)` for a name, floats for numbers and `(f, arg)` for
+applications, nested to the left for every extra argument, so `f a b` is
+`(('f', a), b)`.
+
+`python -m funcyou.fy FILE...` runs scripts, `-` or no file with stdin
+not a terminal reads the script from stdin, else it starts a REPL. The
+parser is built on the first parse from the tables prebuilt in
+`fy_parsetab.py`, nothing is written to disk. Run
+`python -m funcyou.fy --write-tables` after changing the grammar.
+'''
+
+import builtins
 import importlib
-import ast
 import os
-import readline as rl
+import sys
 from operator import (add, sub, mul, truediv, lt, le, gt, ge, eq, ne)
 import ply.lex as lex
 import ply.yacc as yacc
@@ -25,41 +45,35 @@ def t_NUMBER(t):
     return t
 
 def t_ID(t):
-    r'[a-zA-Z_][a-zA-Z0-9_]*\.?\w*'
+    r'[a-zA-Z_][a-zA-Z0-9_]*(\.[a-zA-Z_][a-zA-Z0-9_]*)*'
     t.type = reserved.get(t.value, 'ID')
     return t
 
 def t_error(t):
-    print("Illegal character '%s'" % t.value[0])
-    t.lexer.skip(1)
+    raise SyntaxError("Illegal character '%s'" % t.value[0])
 
 t_ignore = " \t\n"
 
-lex.lex()
-
 precedence = (
     )
 
 
 def p_statement_expr(p):
     'statement : expression'
-    print(p[1])
+    p[0] = p[1]
 
 def p_import_stmt(p):
     'statement : import_stmt'
-    print(p[1])
+    p[0] = p[1]
 
+# Imports are done by Session, parsing has no side effects
 def p_import_stmt_from(p):
     'import_stmt : FROM ID IMPORT ID'
-    mod = importlib.import_module(p[2])
-    obj = getattr(mod, p[4])
-    p[0] = ('import', p[4], obj, mod)
+    p[0] = ('import', p[4], p[2], p[4])
 
 def p_import_stmt_from_as(p):
     'import_stmt : FROM ID IMPORT ID AS ID'
-    mod = importlib.import_module(p[2])
-    obj = getattr(mod, p[4])
-    p[0] = ('import', p[6], obj, mod)
+    p[0] = ('import', p[6], p[2], p[4])
 
 def p_expr_paren(p):
     'par_expression : LPAREN expression RPAREN'
@@ -95,17 +109,174 @@ def p_arg(p):
     p[0] = p[1]
 
 def p_error(p):
-    try:
-        print("Syntax error at '%s'" % p.value)
-    except:
-        print("Syntax error")
+    if p is None:
+        raise SyntaxError("Syntax error at end of line")
+    raise SyntaxError("Syntax error at '%s'" % p.value)
 
-yacc.yacc()
+TABMODULE = 'funcyou.fy_parsetab'
 
-if __name__ == '__main__':
+_lexer = _parser = None
+
+
+def _build(write_tables=False):
+    # Tables are only regenerated when the grammar changed since they
+    # were written, and then kept in memory
+    module = sys.modules[__name__]
+    lexer = lex.lex(module=module)
+    parser = yacc.yacc(module=module, tabmodule=TABMODULE, debug=False,
+                       write_tables=write_tables, errorlog=yacc.NullLogger())
+    return lexer, parser
+
+
+def write_tables():
+    'Regenerate fy_parsetab.py next to this file'
+    module = sys.modules[__name__]
+    yacc.yacc(module=module, tabmodule='fy_parsetab', debug=False,
+              outputdir=os.path.dirname(os.path.abspath(__file__)))
+
+
+def parse(line):
+    'Return the tree of line'
+    global _lexer, _parser
+    if _parser is None:
+        _lexer, _parser = _build()
+    return _parser.parse(line + '\n', lexer=_lexer)
+
+
+# Names every session starts with
+BUILTINS = dict(vars(builtins), add=add, sub=sub, mul=mul, truediv=truediv,
+                lt=lt, le=le, gt=gt, ge=ge, eq=eq, ne=ne)
+
+
+class Session(object):
+    '''Evaluate trees, remembering the names imported so far.
+
+    Names are resolved once: `names` caches the value of every name and
+    dotted name (`os.path`) looked up, and `modules` the modules imported,
+    so resolving a name again costs a dict lookup. Names missing from the
+    session and the builtins are taken for modules. An application
+    `f a b c`, nested partial tuples in the tree, is a single call
+    `f(a, b, c)`.
+    '''
+
+    def __init__(self):
+        self.names = dict(BUILTINS)
+        self.modules = {}
+
+    def module(self, name):
+        try:
+            return self.modules[name]
+        except KeyError:
+            module = self.modules[name] = importlib.import_module(name)
+            return module
+
+    def resolve(self, name):
+        try:
+            return self.names[name]
+        except KeyError:
+            pass
+        head, dot, attr = name.rpartition('.')
+        try:
+            if not dot:
+                value = self.module(name)
+            else:
+                try:
+                    value = getattr(self.resolve(head), attr)
+                except AttributeError:
+                    value = self.module(name)
+        except ImportError:
+            raise NameError("name '%s' is not defined" % name) from None
+        self.names[name] = value
+        return value
+
+    def bind(self, name, value):
+        'Bind name to value, forgetting the dotted names under it'
+        prefix = name + '.'
+        for key in [key for key in self.names if key.startswith(prefix)]:
+            del self.names[key]
+        self.names[name] = value
+
+    def eval(self, tree):
+        'Evaluate a tree, return its value'
+        kind = type(tree)
+        if kind is float:
+            return tree
+        if kind is str:
+            return self.resolve(tree)
+        if tree[0] == 'resolve':
+            return self.resolve(tree[1])
+        if tree[0] == 'import':
+            _, alias, module, name = tree
+            module = self.module(module)
+            try:
+                value = getattr(module, name)
+            except AttributeError:
+                value = self.module(module.__name__ + '.' + name)
+            self.bind(alias, value)
+            return value
+        args = []
+        while type(tree) is tuple:
+            tree, arg = tree
+            args.append(arg)
+        eval = self.eval
+        return self.resolve(tree)(*[eval(arg) for arg in reversed(args)])
+
+    def run(self, lines):
+        'Evaluate lines, yield the value of every non blank one'
+        for line in lines:
+            if line.strip():
+                yield self.eval(parse(line))
+
+
+def batch(lines, session=None, name='<stdin>', out=sys.stdout):
+    '''Run the lines of a script, printing the value of every one.
+    Return False at the first error, reported on stderr'''
+    session = session or Session()
+    for number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            value = session.eval(parse(line))
+        except Exception as e:
+            print('%s:%d: %s: %s' % (name, number, type(e).__name__, e),
+                  file=sys.stderr)
+            return False
+        print(value, file=out)
+    return True
+
+
+def repl():
+    import readline  # noqa: F401, line editing for input()
+    session = Session()
     while True:
         try:
             s = input('>')
         except EOFError:
             break
-        yacc.parse(s + '\n')
+        try:
+            print(session.eval(parse(s)))
+        except Exception as e:
+            print('%s: %s' % (type(e).__name__, e))
+
+
+def main(argv):
+    if argv == ['--write-tables']:
+        write_tables()
+        return 0
+    if not argv and sys.stdin.isatty():
+        repl()
+        return 0
+    session = Session()
+    for path in argv or ['-']:
+        if path == '-':
+            ok = batch(sys.stdin, session)
+        else:
+            with open(path) as f:
+                ok = batch(f, session, path)
+        if not ok:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
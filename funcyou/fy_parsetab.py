@@ -0,0 +1,44 @@
+
+# fy_parsetab.py
+# This file is automatically generated. Do not edit.
+# pylint: disable=W,C,R
+_tabversion = '3.10'
+
+_lr_method = 'LALR'
+
+_lr_signature = 'AS FROM ID IMPORT LPAREN NUMBER RPARENstatement : expressionstatement : import_stmtimport_stmt : FROM ID IMPORT IDimport_stmt : FROM ID IMPORT ID AS IDpar_expression : LPAREN expression RPARENexpression : par_expressionexpression : partialpartial : ID arg\n               | partial argexpression : ID\n    expression : NUMBERarg : ID\n           | NUMBER\n           | par_expression'
+    
+_lr_action_items = {'ID':([0,5,6,8,9,10,11,12,13,14,17,18,20,],[6,11,11,15,6,-9,-12,-13,-14,-8,19,-5,21,]),'NUMBER':([0,5,6,9,10,11,12,13,14,18,],[7,12,12,7,-9,-12,-13,-14,-8,-5,]),'FROM':([0,],[8,]),'LPAREN':([0,5,6,9,10,11,12,13,14,18,],[9,9,9,9,-9,-12,-13,-14,-8,-5,]),'$end':([1,2,3,4,5,6,7,10,11,12,13,14,18,19,21,],[0,-1,-2,-6,-7,-10,-11,-9,-12,-13,-14,-8,-5,-3,-4,]),'RPAREN':([4,5,6,7,10,11,12,13,14,16,18,],[-6,-7,-10,-11,-9,-12,-13,-14,-8,18,-5,]),'IMPORT':([15,],[17,]),'AS':([19,],[20,]),}
+
+_lr_action = {}
+for _k, _v in _lr_action_items.items():
+   for _x,_y in zip(_v[0],_v[1]):
+      if not _x in _lr_action:  _lr_action[_x] = {}
+      _lr_action[_x][_k] = _y
+del _lr_action_items
+
+_lr_goto_items = {'statement':([0,],[1,]),'expression':([0,9,],[2,16,]),'import_stmt':([0,],[3,]),'par_expression':([0,5,6,9,],[4,13,13,4,]),'partial':([0,9,],[5,5,]),'arg':([5,6,],[10,14,]),}
+
+_lr_goto = {}
+for _k, _v in _lr_goto_items.items():
+   for _x, _y in zip(_v[0], _v[1]):
+       if not _x in _lr_goto: _lr_goto[_x] = {}
+       _lr_goto[_x][_k] = _y
+del _lr_goto_items
+_lr_productions = [
+  ("S' -> statement","S'",1,None,None,None),
+  ('statement -> expression','statement',1,'p_statement_expr','fy.py',62),
+  ('statement -> import_stmt','statement',1,'p_import_stmt','fy.py',66),
+  ('import_stmt -> FROM ID IMPORT ID','import_stmt',4,'p_import_stmt_from','fy.py',71),
+  ('import_stmt -> FROM ID IMPORT ID AS ID','import_stmt',6,'p_import_stmt_from_as','fy.py',75),
+  ('par_expression -> LPAREN expression RPAREN','par_expression',3,'p_expr_paren','fy.py',79),
+  ('expression -> par_expression','expression',1,'p_expr_paren_expr','fy.py',83),
+  ('expression -> partial','expression',1,'p_expr_application','fy.py',87),
+  ('partial -> ID arg','partial',2,'p_partial','fy.py',91),
+  ('partial -> partial arg','partial',2,'p_partial','fy.py',92),
+  ('expression -> ID','expression',1,'p_expr_variable','fy.py',96),
+  ('expression -> NUMBER','expression',1,'p_expr_contant','fy.py',101),
+  ('arg -> ID','arg',1,'p_arg','fy.py',106),
+  ('arg -> NUMBER','arg',1,'p_arg','fy.py',107),
+  ('arg -> par_expression','arg',1,'p_arg','fy.py',108),
+]
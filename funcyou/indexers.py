@@ -1,9 +1,202 @@
-'''Utility functions for indexing matrixes'''
+'''Utility functions for indexing matrixes
+
+NumPy arrays, and 2-D buffer protocol objects when NumPy is installed,
+are indexed with NumPy: columns and unwrapped diagonals are returned as
+strided views over the matrix, without copying. Any other sequence of
+sequences gets generators.
+
+Matrixes too big for memory can be given as a `MatrixFile` (a raw
+row-major file plus shape and dtype), the path of a .npy file or an
+`np.memmap`. Lines are then read from the file with a few positional
+reads, see `MatrixFile.line`, and returned as arrays; the rest of the
+file is never mapped or read.
+
+Besides an int, the indexers take a slice or a list of indexes and then
+return several lines at once: a 2-D array (one line per row) for arrays,
+a tuple of generators otherwise.
+
+Diagonals wrap around: for a matrix with R rows and C columns, diagonal k
+holds the elements (i, (i + k) % C) and antidiagonal k the elements
+(i, (k - i) % C), one per row, for i in range(R). There are C of each,
+for square matrixes these are the usual wrapped (anti)diagonals.
+
+`column_reduce`, `diag_reduce` and `adiag_reduce` aggregate every
+column, diagonal or antidiagonal at once in a single pass over the rows.
+'''
+
+from numbers import Integral
+import mmap
+import os
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional, only nested sequences are handled
+    np = None
+
+
+def _as_array(mtx):
+    'Return mtx as a 2-D ndarray without copying, None if it is not one'
+    if np is None:
+        return None
+    if isinstance(mtx, np.ndarray):
+        return mtx
+    try:
+        view = memoryview(mtx)
+    except TypeError:
+        return None
+    return np.asarray(view) if view.ndim == 2 else None
+
+
+class MatrixFile(object):
+    '''A 2-D matrix stored in a binary file, read a line at a time.
+
+    `path` is a raw file of `dtype` items in `order` ('C' row-major or
+    'F' column-major) starting at byte `offset`, or a .npy file when
+    shape and dtype are not given.
+    '''
+
+    # Elements closer than this are read together in one block...
+    GAP = 64 * 1024
+    # ...of at most this many bytes
+    BLOCK = 4 * 1024 * 1024
+
+    def __init__(self, path, shape=None, dtype=None, offset=0, order='C'):
+        if np is None:
+            raise ImportError('MatrixFile needs NumPy')
+        self.path = os.fspath(path)
+        if shape is None:
+            with open(self.path, 'rb') as f:
+                version = np.lib.format.read_magic(f)
+                if version == (1, 0):
+                    header = np.lib.format.read_array_header_1_0(f)
+                elif version == (2, 0):
+                    header = np.lib.format.read_array_header_2_0(f)
+                else:
+                    raise ValueError('Unsupported .npy version {}.{}'.format(*version))
+                shape, fortran, dtype = header
+                offset, order = f.tell(), 'F' if fortran else 'C'
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        self.offset = offset
+        self.order = order
+        if len(self.shape) != 2:
+            raise ValueError('MatrixFile needs a 2-D matrix, not {!r}'.format(self.shape))
+
+    @classmethod
+    def from_memmap(cls, m):
+        'Return the MatrixFile behind an np.memmap, None if it is a view'
+        if not isinstance(m.base, mmap.mmap) or m.ndim != 2:
+            return None
+        order = 'F' if m.flags.f_contiguous and not m.flags.c_contiguous else 'C'
+        return cls(m.filename, m.shape, m.dtype, m.offset, order)
+
+    def __len__(self):
+        return self.shape[0]
+
+    def _strides(self):
+        size = self.dtype.itemsize
+        rows, cols = self.shape
+        return (cols * size, size) if self.order == 'C' else (size, rows * size)
+
+    def line(self, cols):
+        '''Return the array of elements (i, cols[i]) for every row i.
+
+        The elements are read in file order, nearby ones coalesced into
+        blocks of up to BLOCK bytes, so reads move forward through the file
+        and only the pages holding the line are touched. Reads go through
+        the page cache, nothing is mapped into the process.
+        '''
+        size = self.dtype.itemsize
+        rs, cs = self._strides()
+        offsets = self.offset + np.arange(self.shape[0]) * rs + np.asarray(cols) * cs
+        order = np.argsort(offsets, kind='stable')
+        offsets = offsets[order].tolist()
+        out = np.empty(len(offsets), self.dtype)
+        with open(self.path, 'rb', buffering=0) as f:
+            fd, start = f.fileno(), 0
+            while start < len(offsets):
+                stop = start + 1
+                while (stop < len(offsets) and offsets[stop] - offsets[stop - 1] <= self.GAP
+                       and offsets[stop] + size - offsets[start] <= self.BLOCK):
+                    stop += 1
+                base = offsets[start]
+                block = np.frombuffer(
+                    _pread(f, fd, offsets[stop - 1] + size - base, base), self.dtype)
+                # Offsets differ by multiples of the item size
+                out[order[start:stop]] = block[(np.array(offsets[start:stop]) - base) // size]
+                start = stop
+        return out
+
+    def rows(self, start, stop):
+        'Return rows start to stop as an array'
+        if self.order == 'C':
+            rs = self.shape[1] * self.dtype.itemsize
+            with open(self.path, 'rb', buffering=0) as f:
+                data = _pread(f, f.fileno(), (stop - start) * rs, self.offset + start * rs)
+            return np.frombuffer(data, self.dtype).reshape(stop - start, self.shape[1])
+        # Column-major rows are scattered all over the file anyway
+        m = np.memmap(self.path, self.dtype, 'r', self.offset, self.shape, 'F')
+        return np.array(m[start:stop])
+
+
+def _pread(f, fd, n, offset):
+    if hasattr(os, 'pread'):
+        return os.pread(fd, n, offset)
+    f.seek(offset)
+    return f.read(n)
+
+
+def _as_file(mtx):
+    'Return mtx as a MatrixFile, None if it is not backed by one'
+    if isinstance(mtx, MatrixFile):
+        return mtx
+    if isinstance(mtx, (str, os.PathLike)):
+        return MatrixFile(mtx)
+    if np is not None and isinstance(mtx, np.memmap):
+        return MatrixFile.from_memmap(mtx)
+    return None
+
+
+def _file_lines(src, idx, n, cols_of):
+    '''Read line idx, or the lines a slice or list idx selects out of n, of
+    the MatrixFile src; cols_of(k) gives the column of every row in line k'''
+    if isinstance(idx, Integral):
+        return src.line(cols_of(idx))
+    return np.stack([src.line(cols_of(k)) for k in _indexes(idx, n)])
+
+
+def _indexes(idx, n):
+    'Return the list of indexes a slice or list selects out of n'
+    if isinstance(idx, slice):
+        return list(range(n)[idx])
+    return list(idx)
+
+
+def _wrapped_diagonal(arr, idx):
+    '''Return the idx-th wrapped diagonal of arr.
+
+    Each stretch of the diagonal between two wraps is a diagonal view, a
+    diagonal that never wraps is returned as such, others are gathered
+    from their stretches.
+    '''
+    rows, cols = arr.shape
+    pieces, row, col = [], 0, idx % cols
+    while row < rows:
+        length = min(rows - row, cols - col)
+        pieces.append(arr[row:row + length, col:col + length].diagonal())
+        row, col = row + length, 0
+    return pieces[0] if len(pieces) == 1 else np.concatenate(pieces)
+
+
+def _wrapped_diagonals(arr, idxs):
+    'Return the wrapped diagonals idxs of arr, one per row'
+    rows = np.arange(arr.shape[0])
+    return arr[rows, (rows + np.asarray(idxs)[:, None]) % arr.shape[1]]
 
 
 def column(mtx):
     '''Returns an indexable that returns a column of the matrix when indexed.
-    
+
     >>> a = ((1,2,3),
     ...      (4,5,6),
     ...      (7,8,9))
@@ -11,10 +204,24 @@ def column(mtx):
     (1, 4, 7)
     >>> tuple(column(a)[-1])
     (3, 6, 9)
+    >>> [tuple(c) for c in column(a)[::2]]
+    [(1, 4, 7), (3, 6, 9)]
     '''
+    src = _as_file(mtx)
+    arr = _as_array(mtx) if src is None else None
+
     class _column(object):
         def __getitem__(self, idx):
-            return (i[idx] for i in mtx)
+            if src is not None:
+                n = src.shape[1]
+                return _file_lines(src, idx, n, lambda k: range(n)[k])
+            if isinstance(idx, Integral):
+                if arr is not None:
+                    return arr[:, idx]
+                return (i[idx] for i in mtx)
+            if arr is not None:
+                return arr[:, idx].T
+            return tuple(self[j] for j in _indexes(idx, len(mtx[0])))
     return _column()
 
 
@@ -29,10 +236,26 @@ def diag(mtx):
     >>> tuple(diag(a)[1])
     (2, 6, 7)
     '''
+    src = _as_file(mtx)
+    arr = _as_array(mtx) if src is None else None
+
     class _diag(object):
         def __getitem__(self, idx):
-            l = len(mtx)
-            return (mtx[i][(i+idx)%l] for i in range(l))
+            if src is not None:
+                rows, cols = src.shape
+                return _file_lines(src, idx, cols, lambda k: (np.arange(rows) + k) % cols)
+            if arr is not None:
+                l = arr.shape[1]
+            else:
+                l = len(mtx[0]) if len(mtx) else 0
+            if isinstance(idx, Integral):
+                if arr is not None:
+                    return _wrapped_diagonal(arr, idx)
+                return (mtx[i][(i+idx)%l] for i in range(len(mtx)))
+            idxs = _indexes(idx, l)
+            if arr is not None:
+                return _wrapped_diagonals(arr, idxs)
+            return tuple(self[j] for j in idxs)
     return _diag()
 
 
@@ -47,10 +270,137 @@ def adiag(mtx):
     >>> tuple(adiag(a)[2])
     (3, 5, 7)
     '''
+    src = _as_file(mtx)
+    arr = _as_array(mtx) if src is None else None
+
     class _adiag(object):
+        # The antidiagonal idx is the wrapped diagonal l - 1 - idx of the
+        # matrix with its columns reversed, a view as well
         def __getitem__(self, idx):
-            l = len(mtx)
-            return (mtx[i][(idx-i)%l] for i in range(l))
+            if src is not None:
+                rows, cols = src.shape
+                return _file_lines(src, idx, cols, lambda k: (k - np.arange(rows)) % cols)
+            if arr is not None:
+                l = arr.shape[1]
+            else:
+                l = len(mtx[0]) if len(mtx) else 0
+            if isinstance(idx, Integral):
+                if arr is not None:
+                    return _wrapped_diagonal(arr[:, ::-1], l - 1 - idx)
+                return (mtx[i][(idx-i)%l] for i in range(len(mtx)))
+            idxs = _indexes(idx, l)
+            if arr is not None:
+                return _wrapped_diagonals(arr[:, ::-1], [l - 1 - j for j in idxs])
+            return tuple(self[j] for j in idxs)
     return _adiag()
 
 
+# Elements per block of rows the reductions gather at once, about what
+# fits in L2 cache
+BLOCK_ITEMS = 1 << 16
+
+# Python functions with a matching ufunc
+_UFUNCS = {}
+if np is not None:
+    from operator import add, mul, and_, or_, xor
+    _UFUNCS.update({add: np.add, mul: np.multiply, max: np.maximum, min: np.minimum,
+                    and_: np.bitwise_and, or_: np.bitwise_or, xor: np.bitwise_xor})
+
+
+def _reduce_blocks(blocks, cols, op, skew):
+    '''Fold op over the rows of blocks, (start row, array) pairs, with row i
+    rotated by skew * i first'''
+    acc, ks = None, np.arange(cols)
+    for start, block in blocks:
+        if skew:
+            rows = np.arange(start, start + len(block))[:, None]
+            block = block[rows - start, (ks + skew * rows) % cols]
+        part = op.reduce(block, axis=0)
+        acc = part if acc is None else op(acc, part)
+    if acc is None:
+        if not cols:
+            return np.empty(0)
+        if op.identity is None:
+            raise ValueError("Can't reduce the empty columns of a matrix with no rows "
+                             "with {}, it has no identity".format(op.__name__))
+        return op.reduce(np.empty((0, cols)), axis=0)
+    return acc
+
+
+def _reduce_rows(rows, op, skew):
+    '''Fold op over rows, sequences, with row i rotated by skew * i first'''
+    acc = None
+    for i, row in enumerate(rows):
+        if skew and row:
+            s = skew * i % len(row)
+            row = row[s:] + row[:s]
+        acc = list(row) if acc is None else list(map(op, acc, row))
+    return [] if acc is None else acc
+
+
+def _reduce(mtx, op, skew):
+    src = _as_file(mtx)
+    arr = _as_array(mtx) if src is None else None
+    if src is None and arr is None:
+        return _reduce_rows(mtx, op, skew)
+    rows, cols = arr.shape if src is None else src.shape
+    step = max(1, BLOCK_ITEMS // max(cols, 1))
+    if src is not None:
+        blocks = ((i, src.rows(i, min(i + step, rows))) for i in range(0, rows, step))
+    else:
+        blocks = ((i, arr[i:i + step]) for i in range(0, rows, step))
+    ufunc = op if isinstance(op, np.ufunc) else _UFUNCS.get(op)
+    if ufunc is None:
+        return _reduce_rows((row.tolist() for _, b in blocks for row in b), op, skew)
+    return _reduce_blocks(blocks, cols, ufunc, skew)
+
+
+def column_reduce(mtx, op):
+    '''Return op folded over every column, from the first row down.
+
+    op is a binary function, or a NumPy ufunc. Arrays and matrix files
+    are reduced with NumPy a block of rows at a time, with the matching
+    ufunc for `+`, `*`, `&`, `|`, `^`, `max` and `min`; an array of
+    results is returned. Nested sequences, or other ops, are folded in a
+    single loop over the rows and a list is returned.
+
+    An empty matrix gives an empty result. Arrays with columns but no
+    rows are reduced to the identity of the ufunc, ValueError is raised
+    for ufuncs without one, such as `max` and `min`.
+
+    >>> from operator import add
+    >>> a = ((1,2,3),
+    ...      (4,5,6),
+    ...      (7,8,9))
+    >>> column_reduce(a, add)
+    [12, 15, 18]
+    '''
+    return _reduce(mtx, op, 0)
+
+
+def diag_reduce(mtx, op):
+    '''Return op folded over every diagonal, `diag(mtx)[k]` for all k.
+
+    See `column_reduce`.
+
+    >>> a = ((1,2,3),
+    ...      (4,5,6),
+    ...      (7,8,9))
+    >>> diag_reduce(a, max)
+    [9, 7, 8]
+    '''
+    return _reduce(mtx, op, 1)
+
+
+def adiag_reduce(mtx, op):
+    '''Return op folded over every antidiagonal, `adiag(mtx)[k]` for all k.
+
+    See `column_reduce`.
+
+    >>> a = ((1,2,3),
+    ...      (4,5,6),
+    ...      (7,8,9))
+    >>> adiag_reduce(a, max)
+    [8, 9, 7]
+    '''
+    return _reduce(mtx, op, -1)
@@ -0,0 +1,292 @@
+'''Bounded memoization with pluggable eviction.
+
+>>> from funcyou import memoize
+>>> @memoize(maxsize=2)
+... def double(xs):
+...     return [x * 2 for x in xs]
+>>> double([1, 2]), double([1, 2])
+([2, 4], [2, 4])
+>>> double.stats.hits, double.stats.misses
+(1, 1)
+'''
+
+from collections import OrderedDict, namedtuple
+from functools import partial, update_wrapper
+from threading import Lock
+import sys
+import time
+
+CacheStats = namedtuple('CacheStats', 'hits misses evictions size nbytes')
+
+_MISSING = object()
+
+# Separates positional and keyword arguments in keys
+_KWARGS = object()
+
+
+def freeze(value):
+    '''Return a hashable equivalent of value.
+
+    Lists, tuples, dicts and sets are converted recursively, tagged with
+    their type so that `[1]` and `(1,)` stay different keys.
+    '''
+    if isinstance(value, (list, tuple)):
+        return (type(value),) + tuple(map(freeze, value))
+    if isinstance(value, dict):
+        return (dict, frozenset((k, freeze(v)) for k, v in value.items()))
+    if isinstance(value, (set, frozenset)):
+        return (frozenset, frozenset(map(freeze, value)))
+    return value
+
+
+def make_key(args, kwargs):
+    'Default key function, falls back to freeze() for unhashable arguments'
+    key = args + (_KWARGS,) + tuple(kwargs.items()) if kwargs else args
+    try:
+        hash(key)
+    except TypeError:
+        return freeze(key)
+    return key
+
+
+class Cache(object):
+    '''Base class of the eviction policies.
+
+    Subclasses store entries in `self.data` and implement `get` (return
+    the value or _MISSING), `store`, `discard` and `evict` (drop one entry
+    and return its key). The base class keeps the entry count and the
+    byte size under `maxsize` and `maxbytes`, either of which can be None
+    for no limit.
+    '''
+
+    def __init__(self, maxsize=128, maxbytes=None, sizeof=sys.getsizeof):
+        self.maxsize = maxsize
+        self.maxbytes = maxbytes
+        self.sizeof = sizeof
+        self.data = {}
+        self.sizes = {}
+        self.nbytes = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self.data)
+
+    def put(self, key, value):
+        if key in self.data:
+            self._remove(key)
+        size = self.sizeof(value)
+        if self.maxsize is not None and self.maxsize <= 0:
+            return
+        if self.maxbytes is not None and size > self.maxbytes:
+            return
+        while self.data and (
+                (self.maxsize is not None and len(self.data) >= self.maxsize) or
+                (self.maxbytes is not None and self.nbytes + size > self.maxbytes)):
+            self.nbytes -= self.sizes.pop(self.evict())
+            self.evictions += 1
+        self.sizes[key] = size
+        self.nbytes += size
+        self.store(key, value)
+
+    def clear(self):
+        self.data.clear()
+        self.sizes.clear()
+        self.nbytes = 0
+
+    def _remove(self, key):
+        self.discard(key)
+        self.nbytes -= self.sizes.pop(key)
+
+    def get(self, key):
+        raise NotImplementedError
+
+    def store(self, key, value):
+        raise NotImplementedError
+
+    def discard(self, key):
+        raise NotImplementedError
+
+    def evict(self):
+        raise NotImplementedError
+
+
+class LRU(Cache):
+    'Evict the least recently used entry'
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.data = OrderedDict()
+
+    def get(self, key):
+        value = self.data.get(key, _MISSING)
+        if value is not _MISSING:
+            self.data.move_to_end(key)
+        return value
+
+    def store(self, key, value):
+        self.data[key] = value
+
+    def discard(self, key):
+        del self.data[key]
+
+    def evict(self):
+        return self.data.popitem(last=False)[0]
+
+
+class LFU(Cache):
+    'Evict the least frequently used entry, the oldest one among ties'
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.counts = {}
+        # use count -> keys with that count, in insertion order
+        self.buckets = {}
+        self.min_count = 0
+
+    def _unlink(self, key):
+        'Remove key from its bucket, return its count'
+        count = self.counts.pop(key)
+        bucket = self.buckets[count]
+        del bucket[key]
+        if not bucket:
+            del self.buckets[count]
+            if self.min_count == count:
+                self.min_count = min(self.buckets, default=0)
+        return count
+
+    def _link(self, key, count):
+        self.counts[key] = count
+        self.buckets.setdefault(count, OrderedDict())[key] = None
+        if count < self.min_count or not self.min_count:
+            self.min_count = count
+
+    def get(self, key):
+        value = self.data.get(key, _MISSING)
+        if value is not _MISSING:
+            self._link(key, self._unlink(key) + 1)
+        return value
+
+    def store(self, key, value):
+        self.data[key] = value
+        self._link(key, 1)
+
+    def discard(self, key):
+        del self.data[key]
+        self._unlink(key)
+
+    def evict(self):
+        key = next(iter(self.buckets[self.min_count]))
+        self.discard(key)
+        return key
+
+    def clear(self):
+        super().clear()
+        self.counts.clear()
+        self.buckets.clear()
+        self.min_count = 0
+
+
+class TTL(Cache):
+    'Expire entries `ttl` seconds after they were stored, evict the oldest'
+
+    def __init__(self, *args, ttl=60, timer=time.monotonic, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.data = OrderedDict()
+        self.ttl = ttl
+        self.timer = timer
+
+    def get(self, key):
+        entry = self.data.get(key)
+        if entry is None:
+            return _MISSING
+        value, expires = entry
+        if self.timer() >= expires:
+            self._remove(key)
+            self.evictions += 1
+            return _MISSING
+        return value
+
+    def store(self, key, value):
+        self.data[key] = (value, self.timer() + self.ttl)
+
+    def discard(self, key):
+        del self.data[key]
+
+    def evict(self):
+        return self.data.popitem(last=False)[0]
+
+
+POLICIES = {'lru': LRU, 'lfu': LFU, 'ttl': TTL}
+
+
+class Memoized(object):
+    '''A memoized callable, see `memoize`.
+
+    `stats` returns a `CacheStats` snapshot, `cache_clear()` empties the
+    cache and resets the counters.
+    '''
+
+    def __init__(self, func, cache, key=make_key):
+        self.func = func
+        self.cache = cache
+        self.key = key
+        self.hits = self.misses = 0
+        self.lock = Lock()
+        update_wrapper(self, func)
+
+    def __call__(self, *args, **kwargs):
+        key = self.key(args, kwargs)
+        with self.lock:
+            value = self.cache.get(key)
+            if value is not _MISSING:
+                self.hits += 1
+                return value
+            self.misses += 1
+        value = self.func(*args, **kwargs)
+        with self.lock:
+            self.cache.put(key, value)
+        return value
+
+    def __get__(self, obj, objtype=None):
+        return self if obj is None else partial(self, obj)
+
+    @property
+    def stats(self):
+        with self.lock:
+            return CacheStats(self.hits, self.misses, self.cache.evictions,
+                              len(self.cache), self.cache.nbytes)
+
+    def cache_clear(self):
+        with self.lock:
+            self.cache.clear()
+            self.hits = self.misses = self.cache.evictions = 0
+
+    def __repr__(self):
+        return 'memoize({!r})'.format(self.func)
+
+
+def memoize(func=None, maxsize=128, maxbytes=None, policy='lru', key=make_key,
+            sizeof=sys.getsizeof, **options):
+    '''Memoize func, usable as `@memoize` or `@memoize(...)`.
+
+    `policy` is 'lru', 'lfu', 'ttl' (pass `ttl=seconds`) or a `Cache`
+    subclass, extra keyword `options` go to its constructor. The cache
+    holds at most `maxsize` entries and `maxbytes` bytes of values as
+    measured by `sizeof` (None for no limit).
+
+    `key(args, kwargs)` builds the cache key; the default one handles
+    unhashable arguments such as lists and dicts by freezing them.
+
+    The result keeps func's signature, so it can be curried, composed or
+    used as a Pipe stage like func itself.
+    '''
+    if func is None:
+        return lambda func: memoize(func, maxsize, maxbytes, policy, key, sizeof, **options)
+    if isinstance(policy, str):
+        try:
+            policy = POLICIES[policy]
+        except KeyError:
+            raise ValueError('Unknown policy {!r}, use one of {}'.format(
+                policy, ', '.join(POLICIES))) from None
+    cache = policy(maxsize, maxbytes, sizeof, **options)
+    return Memoized(func, cache, key)
@@ -0,0 +1,234 @@
+'''Lazy, streaming pipes.
+
+`LazyPipe` records its stages and only runs them when called or iterated.
+Items flow through the stages in chunks (lists of `chunksize` items), so
+memory stays bounded by the chunk size however long the input is:
+
+>>> from funcyou.streams import LazyPipe, map_, filter_, take, first
+>>> evens = LazyPipe(range(10 ** 12)) | filter_(lambda x: x % 2 == 0) | map_(str)
+>>> list(evens | take(3))
+['0', '2', '4']
+>>> (evens | first)()
+'0'
+'''
+
+from collections import deque
+from concurrent.futures import (Executor, FIRST_COMPLETED, ProcessPoolExecutor,
+                                ThreadPoolExecutor, wait)
+from itertools import chain, islice
+import os
+
+CHUNKSIZE = 1024
+
+
+def chunked(iterable, size):
+    'Yield lists with up to size items of iterable'
+    it = iter(iterable)
+    return iter(lambda: list(islice(it, size)), [])
+
+
+def _flatten(chunks):
+    return chain.from_iterable(chunks)
+
+
+class Stage(object):
+    '''A streaming pipe stage.
+
+    `transform` takes an iterator of chunks and returns another one. Stages
+    are callables too, so they also work on plain iterables and in the
+    eager `funcyou.Pipe`, where they return a list.
+    '''
+
+    def __init__(self, transform, name='stage'):
+        self.transform = transform
+        self.name = name
+
+    def __call__(self, items):
+        return list(_flatten(self.transform(chunked(items, CHUNKSIZE))))
+
+    def __repr__(self):
+        return self.name
+
+
+def map_(func):
+    'Stage applying func to every item'
+    def transform(chunks):
+        for chunk in chunks:
+            yield list(map(func, chunk))
+    return Stage(transform, 'map_({!r})'.format(func))
+
+
+def filter_(pred):
+    'Stage keeping the items for which pred is true'
+    def transform(chunks):
+        for chunk in chunks:
+            chunk = list(filter(pred, chunk))
+            if chunk:
+                yield chunk
+    return Stage(transform, 'filter_({!r})'.format(pred))
+
+
+def flat_map(func):
+    '''Stage replacing every item by the items of the iterable func returns.
+
+    The iterables are read lazily, into chunks as big as the input ones,
+    so they can be huge or infinite when a later stage stops early.
+    '''
+    def transform(chunks):
+        size = 1
+        for chunk in chunks:
+            size = max(size, len(chunk))
+            yield from chunked(_flatten(map(func, chunk)), size)
+    return Stage(transform, 'flat_map({!r})'.format(func))
+
+
+def take(n):
+    'Stage keeping the first n items, upstream is not pulled any further'
+    def transform(chunks):
+        left = n
+        if left <= 0:
+            return
+        for chunk in chunks:
+            if len(chunk) >= left:
+                yield chunk[:left]
+                return
+            left -= len(chunk)
+            yield chunk
+    return Stage(transform, 'take({!r})'.format(n))
+
+
+def _map_chunk(func, chunk):
+    return list(map(func, chunk))
+
+
+def _filter_chunk(pred, chunk):
+    return list(filter(pred, chunk))
+
+
+def _executor(executor, workers):
+    'Return (executor, owned), owned executors are shut down by the stage'
+    if isinstance(executor, Executor):
+        return executor, False
+    if executor == 'thread':
+        return ThreadPoolExecutor(workers), True
+    if executor == 'process':
+        return ProcessPoolExecutor(workers), True
+    raise ValueError("executor must be 'thread', 'process' or an Executor, "
+                     "not {!r}".format(executor))
+
+
+def _parallel(apply, func, workers, chunksize, ordered, executor):
+    '''Return a transform running apply(func, chunk) for every chunk on an
+    executor, with at most 2 * workers chunks in flight'''
+    workers = workers or os.cpu_count() or 1
+    inflight = 2 * workers
+
+    def transform(chunks):
+        if chunksize is not None:
+            chunks = chunked(_flatten(chunks), chunksize)
+        pool, owned = _executor(executor, workers)
+        pending = deque()
+
+        def drain(limit):
+            'Yield finished chunks until at most limit are pending'
+            nonlocal pending
+            while len(pending) > limit:
+                if ordered:
+                    done = (pending.popleft(),)
+                else:
+                    done, rest = wait(pending, return_when=FIRST_COMPLETED)
+                    pending = deque(rest)
+                for future in done:
+                    result = future.result()
+                    if result:
+                        yield result
+
+        try:
+            for chunk in chunks:
+                pending.append(pool.submit(apply, func, chunk))
+                yield from drain(inflight - 1)
+            yield from drain(0)
+        finally:
+            for future in pending:
+                future.cancel()
+            if owned:
+                pool.shutdown(wait=True)
+    return transform
+
+
+def pmap(func, workers=None, chunksize=None, ordered=True, executor='thread'):
+    '''Stage applying func to every item on a pool of workers.
+
+    Work is submitted a chunk at a time, `chunksize` items per chunk
+    (the pipe chunks when None), and at most `2 * workers` chunks are in
+    flight, so memory stays capped however long the input is. With
+    `ordered=False` chunks are yielded as soon as they are done.
+
+    `executor` is 'thread' for I/O bound work, 'process' for CPU bound
+    work (func and the items must be picklable then) or an existing
+    `concurrent.futures.Executor`, which is left running. An exception
+    raised by func is re-raised by the pipe and the pending chunks are
+    cancelled.
+    '''
+    return Stage(_parallel(_map_chunk, func, workers, chunksize, ordered, executor),
+                 'pmap({!r})'.format(func))
+
+
+def pfilter(pred, workers=None, chunksize=None, ordered=True, executor='thread'):
+    'Stage keeping the items for which pred is true, see pmap'
+    return Stage(_parallel(_filter_chunk, pred, workers, chunksize, ordered, executor),
+                 'pfilter({!r})'.format(pred))
+
+
+def first(items, default=None):
+    'Return the first item, or default when there is none'
+    return next(iter(items), default)
+
+
+class LazyPipe(object):
+    '''A pipe that records stages and streams items through them on demand.
+
+    Stages are either `Stage`s, which are fused into a single chunked
+    stream, or plain callables, which get the stream as an iterator and
+    whose result becomes the new value (e.g. `| sum` or `| first`). As in
+    `funcyou.Pipe` a non callable replaces the value:
+
+    >>> (LazyPipe() | range(5) | map_(lambda x: x * x) | sum)()
+    30
+
+    Calling the pipe returns the final value, an iterator if the pipe ends
+    with streaming stages. Pipes are immutable, `|` returns a new one, so
+    a pipe can be run many times over a re-iterable source.
+    '''
+
+    def __init__(self, source=None, chunksize=CHUNKSIZE, stages=()):
+        self.source = source
+        self.chunksize = chunksize
+        self.stages = stages
+
+    def __or__(self, other):
+        if not callable(other):
+            return LazyPipe(other, self.chunksize)
+        return LazyPipe(self.source, self.chunksize, self.stages + (other,))
+
+    def __call__(self):
+        value, chunks = self.source, None
+        for stage in self.stages:
+            if isinstance(stage, Stage):
+                if chunks is None:
+                    chunks = chunked(value, self.chunksize)
+                chunks = stage.transform(chunks)
+            else:
+                if chunks is not None:
+                    value, chunks = _flatten(chunks), None
+                value = stage(value)
+        if chunks is not None:
+            return _flatten(chunks)
+        return value
+
+    def __iter__(self):
+        return iter(self())
+
+    def __repr__(self):
+        return ' | '.join(['LazyPipe({!r})'.format(self.source)] +
+                          [getattr(s, '__name__', repr(s)) for s in self.stages])
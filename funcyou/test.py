@@ -1,6 +1,19 @@
+import importlib
+import os
+import subprocess
+import sys
 import unittest
 
-from . import LAMBDA as _, Pipe
+from . import LAMBDA as _, Pipe, Composition, compose, curry, memoize
+from .streams import (LazyPipe, map_, filter_, flat_map, take, first,
+                      pmap, pfilter)
+from .aio import AsyncPipe, amap, afilter
+from .indexers import (column, diag, adiag, column_reduce, diag_reduce,
+                       adiag_reduce, MatrixFile, np)
+
+
+def square(x):
+    return x * x
 
 class Test(unittest.TestCase):
     def test_lambda(self):
@@ -33,7 +46,454 @@ class Test(unittest.TestCase):
         ae((5 /  _)(2), 2.5)
         ae((_ /  2)(5), 2.5)
 
+    def test_lambda_chaining(self):
+        ae = self.assertEqual
+
+        ae(((_ * 2 + 1) % 7)(4), 2)
+        ae(((_ + 1) * (_ - 1))(3), 8)
+        ae((10 - _ * 2)(3), 4)
+        ae((-_ ** 2)(3), -9)
+        ae((_ & 6)(3), 2)
+        ae((_ ^ 6)(3), 5)
+        ae(((-2) ** _)(2), 4)
+        ae((_ ** -1)(2), 0.5)
+        big = 10 ** 5000
+        ae((_ + big)(1) - big, 1)
+        ae((big // _)(big), 1)
+        ae((-_ ** -2)(2), -0.25)
+        ae(list(filter(_ % 3 == 0, range(10))), [0, 3, 6, 9])
+        ae(repr((_ * 2 + 1) % 7), '(((_ * 2) + 1) % 7)')
+
+        # Non literal constants are bound into the compiled function
+        xs = [1]
+        ae((_ + xs)([0]), [0, 1])
+        self.assertIs((_ + xs).func.__closure__[0].cell_contents, xs)
+
+        with self.assertRaises(TypeError):
+            0 < _ < 1
+
+    def test_lazy_numpy(self):
+        code = ('import sys, funcyou; from funcyou import LAMBDA as _;'
+                '(_ * 2).map_batch([1]); print("numpy" in sys.modules)')
+        out = subprocess.run([sys.executable, '-c', code], capture_output=True,
+                             text=True, cwd=os.path.dirname(os.path.dirname(__file__)))
+        self.assertEqual(out.stdout, 'False\n')
+
+    def test_lambda_batch(self):
+        ae = self.assertEqual
+
+        ae((_ * 2 + 1).map_batch(range(4)), [1, 3, 5, 7])
+        ae((_ < 2).mask([0, 1, 2, 3]), [True, True, False, False])
+        ae((_ % 2 == 0).filter_batch([1, 2, 3, 4]), [2, 4])
+        ae((_ % 3).mask(i for i in range(5)), [False, True, True, False, True])
+
+    @unittest.skipIf(np is None, 'NumPy is not installed')
+    def test_lambda_batch_numpy(self):
+        a = np.arange(-50, 50)
+        expr = (_ * 2 + 1) % 7
+        expected = [expr(int(i)) for i in a]
+
+        for chunksize in (7, 100, 1000):
+            res = expr.map_batch(a, chunksize)
+            self.assertIsInstance(res, np.ndarray)
+            self.assertEqual(res.tolist(), expected)
+
+            mask = (_ < 1).mask(a, chunksize)
+            self.assertEqual(mask.dtype, bool)
+            self.assertEqual(mask.tolist(), [i < 1 for i in range(-50, 50)])
+
+            self.assertEqual((_ % 3 == 0).filter_batch(a, chunksize).tolist(),
+                             list(range(-48, 50, 3)))
+
+    def test_curry(self):
+        ae = self.assertEqual
+
+        def f(a, b, c, d=4, *, e=5):
+            return a + b + c + d + e
+
+        ae(curry(f)(1)(2)(3), 15)
+        ae(curry(f)(1, 2)(3, 0), 11)
+        ae(curry(f)(1, e=0)(2)(3), 10)
+        ae(curry(f, 4)(1)(2)(3)(0), 11)
+        ae(curry(max)(1)(2), 2)
+
+        # Required parameters given by keyword count toward the arity
+        def f3(a, b, c):
+            return a * 100 + b * 10 + c
+
+        ae(curry(f3)(1)(b=2, c=3), 123)
+        ae(curry(f3)(c=3)(1)(b=2), 123)
+        ae(curry(f3)(1, c=3)(2), 123)
+        ae(curry(f3)(a=1, b=2, c=3), 123)
+
+        def bad(a, b):
+            return len(a) + b
+
+        # TypeErrors from the body are not mistaken for missing arguments
+        with self.assertRaises(TypeError):
+            curry(bad)(1)(2)
+
+    def test_memoize(self):
+        ae = self.assertEqual
+        calls = []
+
+        @memoize(maxsize=2)
+        def total(xs, scale=1):
+            calls.append(xs)
+            return sum(xs) * scale
+
+        ae(total([1, 2]), 3)
+        ae(total([1, 2]), 3)
+        ae(total((1, 2)), 3)
+        ae(total([1, 2], scale=2), 6)
+        ae(total([1, 2], scale=2), 6)
+        ae(len(calls), 3)
+        ae(total.stats[:4], (2, 3, 1, 2))
+        total.cache_clear()
+        ae(total.stats[:4], (0, 0, 0, 0))
+        ae(total.__name__, 'total')
+
+        # Keyword arguments never collide with positional ones
+        args = memoize(lambda *a, **kw: (a, kw))
+        ae(args(x=1), ((), {'x': 1}))
+        ae(args((), (('x', 1),)), (((), (('x', 1),)), {}))
+        ae(args((('x', 1),)), (((('x', 1),),), {}))
+        ae(args.stats.misses, 3)
+
+        # Dicts are keyed whatever the order and types of their keys
+        size = memoize(len)
+        ae(size({1: 'a', 'b': 2}), 2)
+        ae(size({'b': 2, 1: 'a'}), 2)
+        ae(size.stats[:2], (1, 1))
+
+        # Memoized functions curry, compose and pipe like the originals
+        add = memoize(lambda a, b: a + b)
+        ae(curry(add)(1)(2), 3)
+        ae(compose(str, add)(1, 2), '3')
+        ae((Pipe([1, 2, 3]) | memoize(sum))(), 6)
+        curried = memoize(curry(lambda a, b: a * b))
+        ae(curried(3)(4), 12)
+        ae(curried.stats.misses, 1)
+
+    def test_memoize_policies(self):
+        ae = self.assertEqual
+
+        lfu = memoize(lambda x: x, maxsize=2, policy='lfu')
+        lfu(1), lfu(1), lfu(2), lfu(3)
+        ae(sorted(lfu.cache.data), [(1,), (3,)])
+
+        lru = memoize(lambda x: x, maxsize=2, policy='lru')
+        lru(1), lru(2), lru(1), lru(3)
+        ae(sorted(lru.cache.data), [(1,), (3,)])
+
+        now = [0]
+        ttl = memoize(lambda x: x, policy='ttl', ttl=10, timer=lambda: now[0])
+        ttl(1), ttl(1)
+        now[0] = 11
+        ttl(1)
+        ae(ttl.stats[:3], (1, 2, 1))
+
+        sized = memoize(lambda n: 'x' * n, maxsize=None, maxbytes=300)
+        for n in range(10):
+            sized(100)
+            sized(n * 100)
+        self.assertLessEqual(sized.stats.nbytes, 300)
+
+        with self.assertRaises(ValueError):
+            memoize(len, policy='fifo')
+
+    def test_compose(self):
+        ae = self.assertEqual
+
+        ae(compose(str, _ + 1, int)('41'), '42')
+        ae(compose(len, sorted)([3, 1], key=_ * -1), 2)
+        ae(compose(*[_ + 1] * 100)(0), 100)
+        self.assertIs(compose(len), len)
+
+    def test_composition(self):
+        ae = self.assertEqual
+
+        f = Composition() | sum | (_ * _) | range | list
+        ae(f([1, 2]), [0, 1, 2, 3, 4, 5, 6, 7, 8])
+        f | len
+        ae(f([1, 2]), 9)
+
+        g = Composition() | sorted | list
+        ae(g([2, 1], reverse=True), [2, 1])
+
+        h = Composition()
+        for _i in range(100):
+            h | (_ + 1)
+        ae(h(0), 100)
+
     def test_pipe(self):
         from itertools import product
         res = Pipe() | range(1,6) | product
         self.assertTrue(res(), product(range(1,6)))
+
+    def test_lazy_pipe(self):
+        ae = self.assertEqual
+
+        pulled = []
+
+        def source():
+            for i in range(10 ** 9):
+                pulled.append(i)
+                yield i
+
+        p = (LazyPipe(source(), chunksize=10) | filter_(_ % 2 == 0)
+             | map_(_ * 10) | flat_map(lambda x: (x, x + 1)) | take(5))
+        ae(pulled, [])
+        ae(list(p), [0, 1, 20, 21, 40])
+        ae(len(pulled), 10)
+
+        # Inner iterables are read lazily, even infinite ones
+        from itertools import count
+        ae(list(LazyPipe(range(3), chunksize=2) | flat_map(count) | take(5)), [0, 1, 2, 3, 4])
+        ae(list(LazyPipe('ab') | flat_map(lambda c: c * 3) | take(4)), ['a', 'a', 'a', 'b'])
+        ae(flat_map(range)([0, 1, 2, 3]), [0, 0, 1, 0, 1, 2])
+
+        ae((LazyPipe() | range(10) | map_(_ + 1) | sum)(), 55)
+        ae((LazyPipe(range(3, 10)) | filter_(_ > 4) | first)(), 5)
+        ae((LazyPipe([]) | first)(), None)
+        ae((LazyPipe(range(10)) | take(0) | list)(), [])
+
+        # Stages work in the eager pipe too
+        ae((Pipe() | range(5) | map_(_ * 2) | take(3))(), [0, 2, 4])
+
+    def test_parallel_stages(self):
+        ae = self.assertEqual
+
+        data = range(1000)
+        for ordered in (True, False):
+            res = list(LazyPipe(data, chunksize=7) | pmap(_ * 2, workers=4, ordered=ordered)
+                       | pfilter(_ % 3 == 0, chunksize=5, ordered=ordered))
+            expected = [x * 2 for x in data if x * 2 % 3 == 0]
+            ae(res if ordered else sorted(res), expected)
+
+        ae((Pipe(range(5)) | pmap(square, workers=2, executor='process'))(),
+           [0, 1, 4, 9, 16])
+
+        # In flight work is bounded
+        pulled = []
+
+        def source():
+            for i in range(10 ** 9):
+                pulled.append(i)
+                yield i
+
+        ae(list(LazyPipe(source(), chunksize=10) | pmap(_ + 1, workers=2) | take(3)),
+           [1, 2, 3])
+        self.assertLessEqual(len(pulled), 40)
+
+        with self.assertRaises(ZeroDivisionError):
+            list(LazyPipe(range(100), chunksize=10) | pmap(1 // _, workers=2))
+        with self.assertRaises(ValueError):
+            list(LazyPipe(range(3)) | pmap(square, executor='fibers'))
+
+    def test_async_pipe(self):
+        import asyncio
+        import time
+
+        ae = self.assertEqual
+        calls = []
+
+        async def service(x):
+            'A fake remote call'
+            calls.append(x)
+            await asyncio.sleep(0.05)
+            return x * 2
+
+        async def numbers():
+            for i in range(20):
+                yield i
+
+        async def main():
+            start = time.perf_counter()
+            res = await (AsyncPipe(numbers()) | amap(service, limit=20)
+                         | afilter(_ % 4 == 0) | sum)()
+            return res, time.perf_counter() - start
+
+        res, elapsed = asyncio.run(main())
+        ae(res, sum(x * 2 for x in range(20) if x * 2 % 4 == 0))
+        # 20 calls of 50ms run concurrently, not one after the other
+        self.assertLess(elapsed, 0.5)
+
+        async def collect(pipe):
+            return [x async for x in pipe]
+
+        pipe = AsyncPipe(range(10)) | amap(service, limit=3, ordered=False)
+        ae(sorted(asyncio.run(collect(pipe))), list(range(0, 20, 2)))
+        ae(asyncio.run((AsyncPipe() | [3, 1, 2] | sorted | amap(service))()), [2, 4, 6])
+
+        with self.assertRaises(ZeroDivisionError):
+            asyncio.run((AsyncPipe(range(5)) | amap(1 // _))())
+        for limit in (0, -1):
+            with self.assertRaises(ValueError):
+                amap(_ + 1, limit=limit)
+            with self.assertRaises(ValueError):
+                afilter(_ > 1, limit=limit)
+
+    def test_indexers(self):
+        ae = self.assertEqual
+        m = tuple(tuple(range(i * 5, i * 5 + 5)) for i in range(5))
+
+        ae([tuple(c) for c in column(m)[1:4:2]], [(1, 6, 11, 16, 21), (3, 8, 13, 18, 23)])
+        ae([tuple(d) for d in diag(m)[[0, 4]]], [(0, 6, 12, 18, 24), (4, 5, 11, 17, 23)])
+        ae([tuple(d) for d in adiag(m)[3:]], [(3, 7, 11, 15, 24), (4, 8, 12, 16, 20)])
+
+    @unittest.skipIf(np is None, 'NumPy is not installed')
+    def test_indexers_numpy(self):
+        ae = self.assertEqual
+        nested = tuple(tuple(range(i * 6, i * 6 + 6)) for i in range(6))
+        a = np.array(nested)
+
+        for indexer in (column, diag, adiag):
+            for i in range(-6, 6):
+                ae(indexer(a)[i].tolist(), list(indexer(nested)[i]))
+            for idx in (slice(None), slice(1, 5, 2), [3, 0, -1]):
+                ae(indexer(a)[idx].tolist(),
+                   [list(line) for line in indexer(nested)[idx]])
+
+        # No copies
+        self.assertTrue(np.shares_memory(column(a)[2], a))
+        self.assertTrue(np.shares_memory(column(a)[1:4], a))
+        self.assertTrue(np.shares_memory(diag(a)[0], a))
+        self.assertTrue(np.shares_memory(adiag(a)[5], a))
+
+        # Buffer protocol objects are viewed through NumPy
+        buf = memoryview(a)
+        ae(column(buf)[1].tolist(), [1, 7, 13, 19, 25, 31])
+        self.assertTrue(np.shares_memory(column(buf)[1], a))
+        for indexer in (diag, adiag):
+            ae(indexer(buf)[1].tolist(), indexer(a)[1].tolist())
+            ae(indexer(buf)[:].tolist(), indexer(a)[:].tolist())
+        self.assertTrue(np.shares_memory(diag(buf)[0], a))
+        self.assertTrue(np.shares_memory(adiag(buf)[5], a))
+
+    @unittest.skipIf(np is None, 'NumPy is not installed')
+    def test_indexers_files(self):
+        import os
+        import tempfile
+
+        a = np.arange(48.0).reshape(6, 8)
+        with tempfile.TemporaryDirectory() as tmp:
+            npy, fortran, raw = (os.path.join(tmp, name) for name in ('a.npy', 'f.npy', 'a.bin'))
+            np.save(npy, a)
+            np.save(fortran, np.asfortranarray(a))
+            a.tofile(raw)
+
+            for src in (npy, fortran, MatrixFile(raw, (6, 8), 'f8'), np.load(npy, mmap_mode='r')):
+                for i in range(-8, 8):
+                    self.assertEqual(column(src)[i].tolist(), column(a)[i].tolist())
+                self.assertEqual(column(src)[2:5].tolist(), column(a)[2:5].tolist())
+
+            for i in range(-8, 8):
+                self.assertEqual(diag(npy)[i].tolist(), diag(a)[i].tolist())
+                self.assertEqual(adiag(npy)[i].tolist(), adiag(a)[i].tolist())
+            self.assertEqual(diag(npy)[[0, 3]].tolist(), diag(a)[[0, 3]].tolist())
+
+            from operator import add
+            self.assertEqual(diag_reduce(npy, add).tolist(), diag_reduce(a, add).tolist())
+            self.assertEqual(column_reduce(fortran, max).tolist(), a.max(axis=0).tolist())
+
+            with self.assertRaises(IndexError):
+                column(npy)[8]
+
+    def test_indexers_non_square(self):
+        ae = self.assertEqual
+        wide = ((0, 1, 2, 3),
+                (4, 5, 6, 7))
+        tall = ((0, 1),
+                (2, 3),
+                (4, 5))
+
+        ae([tuple(d) for d in diag(wide)[:]], [(0, 5), (1, 6), (2, 7), (3, 4)])
+        ae([tuple(d) for d in adiag(wide)[:]], [(0, 7), (1, 4), (2, 5), (3, 6)])
+        ae([tuple(d) for d in diag(tall)[:]], [(0, 3, 4), (1, 2, 5)])
+        ae([tuple(d) for d in adiag(tall)[:]], [(0, 3, 4), (1, 2, 5)])
+
+        if np is None:
+            return
+        for m in (wide, tall):
+            a = np.array(m)
+            for indexer in (diag, adiag):
+                for i in range(len(m[0])):
+                    ae(indexer(a)[i].tolist(), list(indexer(m)[i]))
+                ae(indexer(a)[:].tolist(), [list(d) for d in indexer(m)[:]])
+
+    def test_reduce(self):
+        from operator import add, mul
+        ae = self.assertEqual
+
+        for m in (tuple(tuple(range(i * 7, i * 7 + 7)) for i in range(5)),
+                  tuple(tuple(range(i * 3, i * 3 + 3)) for i in range(8))):
+            for op in (add, mul, max, min, lambda a, b: a - b):
+                for reduce_, indexer in ((column_reduce, column), (diag_reduce, diag),
+                                         (adiag_reduce, adiag)):
+                    expected = []
+                    for k in range(len(m[0])):
+                        line = list(indexer(m)[k])
+                        acc = line[0]
+                        for x in line[1:]:
+                            acc = op(acc, x)
+                        expected.append(acc)
+                    ae(reduce_(m, op), expected)
+                    if np is not None:
+                        ae(list(reduce_(np.array(m), op)), expected)
+        ae(diag_reduce((), add), [])
+        ae(diag_reduce(((), ()), max), [])
+        if np is not None:
+            for reduce_ in (column_reduce, diag_reduce, adiag_reduce):
+                ae(reduce_(np.empty((0, 0)), max).tolist(), [])
+                ae(reduce_(np.empty((2, 0)), max).tolist(), [])
+                ae(reduce_(np.empty((0, 3)), add).tolist(), [0, 0, 0])
+                with self.assertRaisesRegex(ValueError, 'no rows'):
+                    reduce_(np.empty((0, 3)), max)
+
+    def test_fy(self):
+        import math
+        import os.path
+        from .fy import Session, parse
+        ae = self.assertEqual
+
+        ae(parse('f a b c'), ((('f', 'a'), 'b'), 'c'))
+        session = Session()
+        ae(session.eval(parse('from os import path')), os.path)
+        ae(session.eval(parse('from math import sqrt as root')), math.sqrt)
+        ae(session.eval(parse('max 1 (add 2 (root 16)) 3')), 6.0)
+        ae(session.eval(parse('path.sep')), os.sep)
+        ae(session.eval(parse('os.path.sep')), os.sep)
+        ae(session.eval(parse('math.floor (math.sqrt 10)')), 3)
+
+        # Resolved names are cached, rebinding a name forgets its attributes
+        ae(session.names['path.sep'], os.sep)
+        ae(session.modules['math'], math)
+        session.eval(parse('from math import pi as path'))
+        self.assertNotIn('path.sep', session.names)
+        ae(session.eval(parse('path')), math.pi)
+
+        with self.assertRaises(NameError):
+            session.eval(parse('nosuchname 1'))
+        with self.assertRaises(SyntaxError):
+            parse('(add 1')
+        ae(list(Session().run(['add 1 2', '', 'mul 2 3'])), [3.0, 6.0])
+
+    def test_fy_batch(self):
+        import io
+        from contextlib import redirect_stderr
+        import ply.yacc as yacc
+        from . import fy
+        ae = self.assertEqual
+
+        # The prebuilt tables are up to date with the grammar
+        reflect = yacc.ParserReflect(dict(vars(fy)), log=yacc.NullLogger())
+        reflect.get_all()
+        ae(importlib.import_module(fy.TABMODULE)._lr_signature, reflect.signature())
+
+        out, err = io.StringIO(), io.StringIO()
+        self.assertTrue(fy.batch(['from math import sqrt', '', 'sqrt 4'], out=out))
+        ae(out.getvalue().splitlines()[1], '2.0')
+        with redirect_stderr(err):
+            self.assertFalse(fy.batch(['add 1 2', 'add 1 $', 'add 2 2'], name='s.fy', out=out))
+        ae(err.getvalue(), "s.fy:2: SyntaxError: Illegal character '$'\n")
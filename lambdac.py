@@ -1 +1,543 @@
-# Migrated to https://github.com/dhilst/lampy
+r"""Untyped lambda calculus on abstract machines.
+
+Terms use de Bruijn indices: `Var(0)` is the variable bound by the
+innermost lambda. `Machine` reduces them to weak head normal form with a
+Krivine machine, call by name or call by need, or a CEK machine, call by
+value, and `normalize` computes full beta normal forms by running the
+machine under lambdas, so no term is ever substituted or copied:
+
+>>> machine = Machine("need")
+>>> show(machine.normalize(parse(r"(\m n. n m) (\f x. f (f x)) (\f x. f (f (f x)))")))
+"\\x x'. x (x (x (x (x (x (x (x x')))))))"
+>>> machine.betas
+12
+>>> to_int(Machine("name").normalize(program(PRELUDE + "times 6 7")))
+42
+
+Every machine is a loop over an explicit stack, environments are linked
+lists of closures, so evaluation depth is not bounded by the Python
+stack. `steps` counts machine transitions and `betas` beta reductions.
+
+`python lambdac.py [--strategy name|need|value] [--int] TERM` prints the
+normal form of TERM, with the definitions of `PRELUDE` in scope.
+"""
+
+import argparse
+import re
+import sys
+from typing import List, Optional, Union
+
+
+class Var:
+    "The variable bound by the lambda `index` lambdas up"
+
+    __slots__ = ("index",)
+
+    def __init__(self, index: int):
+        self.index = index
+
+
+class Lam:
+    "A lambda, `name` is the name of its parameter in the source"
+
+    __slots__ = ("body", "name")
+
+    def __init__(self, body: "Term", name: str = "x"):
+        self.body = body
+        self.name = name
+
+
+class App:
+    __slots__ = ("fun", "arg")
+
+    def __init__(self, fun: "Term", arg: "Term"):
+        self.fun = fun
+        self.arg = arg
+
+
+class Free:
+    "A variable bound by no lambda"
+
+    __slots__ = ("name",)
+
+    def __init__(self, name: str):
+        self.name = name
+
+
+Term = Union[Var, Lam, App, Free]
+
+
+class Neutral:
+    """A value that can't reduce: `head`, a Free or the level of a
+    variable bound by a lambda the normalizer went under, applied to
+    `args`, Thunks"""
+
+    __slots__ = ("head", "args")
+
+    def __init__(self, head, args: tuple = ()):
+        self.head = head
+        self.args = args
+
+
+class Thunk:
+    """A closure, term in the environment env, a linked list of Thunks
+    `(thunk, env)`. It is evaluated when term is a Lam or a Neutral (env
+    is then unused)"""
+
+    __slots__ = ("term", "env")
+
+    def __init__(self, term, env):
+        self.term = term
+        self.env = env
+
+
+class _Update:
+    "Call by need: overwrite thunk with the value of its term"
+
+    __slots__ = ("thunk",)
+
+    def __init__(self, thunk: Thunk):
+        self.thunk = thunk
+
+
+STRATEGIES = ("name", "need", "value")
+
+# Tasks of the normalizer
+_NORMALIZE, _LAM, _APPLY = range(3)
+
+
+class Machine:
+    """Evaluate terms by `strategy`, counting `steps` and `betas`
+
+    Call by name and call by need run a Krivine machine, call by need
+    overwrites a thunk with its value the first time it is evaluated so
+    arguments are evaluated at most once. Call by value runs a CEK
+    machine: arguments are evaluated before the call, so only the Z fixed
+    point combinator terminates.
+    """
+
+    def __init__(self, strategy: str = "need"):
+        if strategy not in STRATEGIES:
+            raise ValueError(f"Unknown strategy {strategy!r}, use one of {STRATEGIES}")
+        self.strategy = strategy
+        self.steps = 0
+        self.betas = 0
+
+    def whnf(self, thunk: Thunk) -> Thunk:
+        "Evaluate thunk to weak head normal form, return the evaluated Thunk"
+        kind = type(thunk.term)
+        if kind is Lam or kind is Neutral:
+            return thunk
+        if self.strategy == "value":
+            return self._cek(thunk.term, thunk.env)
+        return self._krivine(thunk, self.strategy == "need")
+
+    def evaluate(self, term: Term) -> Thunk:
+        "The weak head normal form of the closed term"
+        return self.whnf(Thunk(term, None))
+
+    def _krivine(self, thunk: Thunk, lazy: bool) -> Thunk:
+        stack: list = [_Update(thunk)] if lazy else []
+        term, env = thunk.term, thunk.env
+        steps = betas = 0
+        while True:
+            steps += 1
+            kind = type(term)
+            if kind is App:
+                arg = term.arg
+                if type(arg) is Var:
+                    # The closure of a variable is the one it is bound to
+                    index, bound = arg.index, env
+                    while index:
+                        bound = bound[1]
+                        index -= 1
+                    stack.append(bound[0])
+                else:
+                    stack.append(Thunk(arg, env))
+                term = term.fun
+            elif kind is Var:
+                index = term.index
+                while index:
+                    env = env[1]
+                    index -= 1
+                thunk = env[0]
+                term, env = thunk.term, thunk.env
+                if lazy and type(term) is not Lam and type(term) is not Neutral:
+                    stack.append(_Update(thunk))
+            elif kind is Lam:
+                while stack and type(stack[-1]) is _Update:
+                    updated = stack.pop().thunk
+                    updated.term, updated.env = term, env
+                if not stack:
+                    result = Thunk(term, env)
+                    break
+                env = (stack.pop(), env)
+                term = term.body
+                betas += 1
+            else:
+                # Stuck on a variable, the stack holds its arguments
+                if kind is Neutral:
+                    head, args = term.head, list(term.args)
+                else:
+                    head, args = term, []
+                while stack:
+                    item = stack.pop()
+                    if type(item) is _Update:
+                        item.thunk.term, item.thunk.env = Neutral(head, tuple(args)), None
+                    else:
+                        args.append(item)
+                result = Thunk(Neutral(head, tuple(args)), None)
+                break
+        self.steps += steps
+        self.betas += betas
+        return result
+
+    def _cek(self, term: Term, env) -> Thunk:
+        # The stack holds (term, env) arguments to evaluate, evaluated
+        # functions, Thunks, waiting for their argument and [value]
+        # arguments waiting for their function
+        stack: list = []
+        steps = betas = 0
+        while True:
+            steps += 1
+            kind = type(term)
+            if kind is App:
+                arg = term.arg
+                if type(arg) is Var:
+                    # Variables and lambdas are values already
+                    index, bound = arg.index, env
+                    while index:
+                        bound = bound[1]
+                        index -= 1
+                    stack.append([bound[0]])
+                elif type(arg) is Lam:
+                    stack.append([Thunk(arg, env)])
+                else:
+                    stack.append((arg, env))
+                term = term.fun
+                continue
+            if kind is Var:
+                index = term.index
+                while index:
+                    env = env[1]
+                    index -= 1
+                value = env[0]
+            elif kind is Lam:
+                value = Thunk(term, env)
+            elif kind is Free:
+                value = Thunk(Neutral(term), None)
+            else:
+                value = Thunk(term, None)
+            # Return value to the continuation
+            while stack:
+                steps += 1
+                frame = stack.pop()
+                kind = type(frame)
+                if kind is tuple:
+                    stack.append(value)
+                    term, env = frame
+                    break
+                if kind is list:
+                    # value is the function, frame holds its argument
+                    frame, value = value, frame[0]
+                fun = frame.term
+                if type(fun) is Lam:
+                    term, env = fun.body, (value, frame.env)
+                    betas += 1
+                    break
+                value = Thunk(Neutral(fun.head, fun.args + (value,)), None)
+            else:
+                self.steps += steps
+                self.betas += betas
+                return value
+
+    def normalize(self, term: Term) -> Term:
+        """The beta normal form of the closed term
+
+        Lambdas are normalized by evaluating their body with the
+        parameter bound to a Neutral, stuck applications by normalizing
+        their arguments; the result is read back from the levels of the
+        Neutrals. Call by name and need normalize in normal order and
+        find the normal form whenever there is one.
+        """
+        tasks: list = [(_NORMALIZE, Thunk(term, None), 0)]
+        results: List[Term] = []
+        while tasks:
+            task = tasks.pop()
+            kind = task[0]
+            if kind == _LAM:
+                results.append(Lam(results.pop(), task[1]))
+            elif kind == _APPLY:
+                n = task[1]
+                args = results[-n:]
+                del results[-n:]
+                node = results.pop()
+                for arg in args:
+                    node = App(node, arg)
+                results.append(node)
+            else:
+                _, thunk, depth = task
+                value = self.whnf(thunk)
+                term = value.term
+                if type(term) is Lam:
+                    bound = Thunk(Neutral(depth), None)
+                    tasks.append((_LAM, term.name))
+                    tasks.append((_NORMALIZE, Thunk(term.body, (bound, value.env)), depth + 1))
+                    continue
+                head = term.head
+                results.append(head if type(head) is Free else Var(depth - head - 1))
+                if term.args:
+                    tasks.append((_APPLY, len(term.args)))
+                    for arg in reversed(term.args):
+                        tasks.append((_NORMALIZE, arg, depth))
+        return results[0]
+
+
+def church(n: int) -> Term:
+    r"The Church numeral n, `\f x. f (f ... x)`"
+    body: Term = Var(0)
+    for _ in range(n):
+        body = App(Var(1), body)
+    return Lam(Lam(body, "x"), "f")
+
+
+def to_int(term: Term) -> int:
+    "The number the Church numeral in normal form term stands for"
+    n = 0
+    if type(term) is Lam and type(term.body) is Lam:
+        body = term.body.body
+        while type(body) is App and type(body.fun) is Var and body.fun.index == 1:
+            n += 1
+            body = body.arg
+        if type(body) is Var and body.index == 0:
+            return n
+    raise ValueError(f"{show(term)} is not a Church numeral")
+
+
+def show(term: Term) -> str:
+    r"""The source of term, `\x y. body` for lambdas. Parameters shadowing
+    a name in scope or a free name get primes"""
+    free = set()
+    stack: list = [term]
+    while stack:
+        node = stack.pop()
+        kind = type(node)
+        if kind is App:
+            stack += (node.fun, node.arg)
+        elif kind is Lam:
+            stack.append(node.body)
+        elif kind is Free:
+            free.add(node.name)
+    out: List[str] = []
+    # Items are strings to output or (term, names in scope, context),
+    # names a linked list (name, names)
+    stack = [(term, None, _TOP)]
+    while stack:
+        item = stack.pop()
+        if type(item) is str:
+            out.append(item)
+            continue
+        term, names, context = item
+        kind = type(term)
+        if kind is Var:
+            index = term.index
+            while index:
+                names = names[1]
+                index -= 1
+            out.append(names[0])
+        elif kind is Free:
+            out.append(term.name)
+        elif kind is Lam:
+            params = []
+            while type(term) is Lam:
+                name = term.name
+                while name in free or _bound(name, names):
+                    name += "'"
+                names = (name, names)
+                params.append(name)
+                term = term.body
+            if context != _TOP:
+                stack.append(")")
+            stack.append((term, names, _TOP))
+            stack.append("\\" + " ".join(params) + ". ")
+            if context != _TOP:
+                stack.append("(")
+        else:
+            if context == _ARG:
+                stack.append(")")
+            stack.append((term.arg, names, _ARG))
+            stack.append(" ")
+            stack.append((term.fun, names, _FUN))
+            if context == _ARG:
+                stack.append("(")
+    return "".join(out)
+
+
+# Contexts of show, where a term is parenthesized: lambdas everywhere
+# but at the top, applications as arguments
+_TOP, _FUN, _ARG = range(3)
+
+
+def _bound(name: str, names) -> bool:
+    while names is not None:
+        if names[0] == name:
+            return True
+        names = names[1]
+    return False
+
+
+TOKENS = re.compile(r"\s*(?:([\\λ.()=;])|([A-Za-z_][A-Za-z0-9_']*)|(\d+))")
+
+
+def _tokens(text: str) -> list:
+    tokens, pos = [], 0
+    text = re.sub(r"#.*", "", text).rstrip()
+    while pos < len(text):
+        match = TOKENS.match(text, pos)
+        if not match:
+            raise SyntaxError(f"Unexpected {text[pos:].strip()[0]!r} at {pos}")
+        symbol, name, number = match.groups()
+        tokens.append(symbol or name or int(number))
+        pos = match.end()
+    tokens.append(None)
+    return tokens
+
+
+class _Parser:
+    """Parse the terms of a token list. `defs` maps names to closed
+    terms, which replace the free names"""
+
+    def __init__(self, tokens: list, defs: dict):
+        self.tokens = tokens
+        self.pos = 0
+        self.defs = defs
+
+    def peek(self):
+        return self.tokens[self.pos]
+
+    def expect(self, token):
+        if self.peek() != token:
+            raise SyntaxError(f"Expected {token!r}, got {self.peek()!r} at token {self.pos}")
+        self.pos += 1
+
+    def term(self, scope) -> Term:
+        "Parse a term, scope is the linked list of the names bound"
+        # The terms being parsed, innermost last: [applications so far,
+        # the parameters of a lambda body or "(" or None, scope]
+        stack: list = [[None, None, scope]]
+        while True:
+            token = self.peek()
+            if token in (None, ")", ";"):
+                arg, opened, scope = stack.pop()
+                if arg is None:
+                    raise SyntaxError(f"Expected a term at token {self.pos}")
+                if opened is None:
+                    return arg
+                if opened == "(":
+                    self.expect(")")
+                else:
+                    for param in reversed(opened):
+                        arg = Lam(arg, param)
+            else:
+                self.pos += 1
+                scope = stack[-1][2]
+                if token in ("\\", "λ"):
+                    params = []
+                    while type(self.peek()) is str and self.peek() not in "\\λ.()=;":
+                        params.append(self.peek())
+                        self.pos += 1
+                    if not params:
+                        raise SyntaxError(f"Expected parameters at token {self.pos}")
+                    self.expect(".")
+                    for param in params:
+                        scope = (param, scope)
+                    stack.append([None, params, scope])
+                    continue
+                if token == "(":
+                    stack.append([None, "(", scope])
+                    continue
+                if type(token) is int:
+                    arg = church(token)
+                elif token in (".", "="):
+                    raise SyntaxError(f"Unexpected {token!r} at token {self.pos - 1}")
+                else:
+                    arg = self.name(token, scope)
+            outer = stack[-1]
+            outer[0] = arg if outer[0] is None else App(outer[0], arg)
+
+    def name(self, name: str, scope) -> Term:
+        index = 0
+        while scope is not None:
+            if scope[0] == name:
+                return Var(index)
+            scope = scope[1]
+            index += 1
+        if name in self.defs:
+            return self.defs[name]
+        return Free(name)
+
+
+def parse(text: str, defs: Optional[dict] = None) -> Term:
+    r"""Parse a term: `\x y. body` or `λx y. body`, application is
+    juxtaposition, numbers are Church numerals and the free names in
+    `defs` are replaced by their terms"""
+    parser = _Parser(_tokens(text), defs or {})
+    term = parser.term(None)
+    parser.expect(None)
+    return term
+
+
+def program(text: str, defs: Optional[dict] = None) -> Term:
+    """Parse definitions `name = term;` followed by a term. Definitions
+    see the ones before them, they are shared by their uses, not copied"""
+    defs = dict(defs or {})
+    parser = _Parser(_tokens(text), defs)
+    while True:
+        start = parser.pos
+        name = parser.peek()
+        if type(name) is str and parser.tokens[start + 1] == "=":
+            parser.pos += 2
+            defs[name] = parser.term(None)
+            parser.expect(";")
+        else:
+            term = parser.term(None)
+            parser.expect(None)
+            return term
+
+
+PRELUDE = r"""
+    id = \x. x;
+    true = \t f. t;
+    false = \t f. f;
+    succ = \n f x. f (n f x);
+    plus = \m n f x. m f (n f x);
+    times = \m n f. m (n f);
+    pow = \m n. n m;
+    pred = \n f x. n (\g h. h (g f)) (\u. x) (\u. u);
+    minus = \m n. n pred m;
+    iszero = \n. n (\x. false) true;
+    Y = \f. (\x. f (x x)) (\x. f (x x));
+    Z = \f. (\x. f (\v. x x v)) (\x. f (\v. x x v));
+    nil = \c n. n;
+    cons = \h t c n. c h (t c n);
+    sum = \l. l plus 0;
+    map = \f l c n. l (\h t. c (f h) t) n;
+    length = \l. l (\h t. succ t) 0;
+"""
+
+
+def main(argv: List[str]):
+    parser = argparse.ArgumentParser(prog="lambdac.py", description=__doc__.split("\n")[0])
+    parser.add_argument("--strategy", choices=STRATEGIES, default="need")
+    parser.add_argument("--int", action="store_true", help="print the normal form as a number")
+    parser.add_argument("term", nargs="+", help="definitions and term, - for stdin")
+    args = parser.parse_args(argv)
+    text = sys.stdin.read() if args.term == ["-"] else " ".join(args.term)
+    machine = Machine(args.strategy)
+    normal = machine.normalize(program(PRELUDE + text))
+    print(to_int(normal) if args.int else show(normal))
+    print(f"{machine.steps} steps, {machine.betas} betas", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
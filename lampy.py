@@ -1,4 +1,5 @@
 import ast
+import builtins
 import readline
 from pyparsing import *
 
@@ -57,7 +58,7 @@ class Expression(Value):
             if name in env:
                 return env[name](*args)
             try:
-                return getattr(__builtins__, name)(args)
+                return getattr(builtins, name)(args)
             except AttributeError:
                 pass
         
@@ -96,5 +97,6 @@ def eval_expr(expr):
     for e in expr:
         print(e.eval())
 
-e = exprs.parseString('(def inc x (sum x 1)) (inc 2) (inc 10)')
-eval_expr(e)
+if __name__ == '__main__':
+    e = exprs.parseString('(def inc x (sum x 1)) (inc 2) (inc 10)')
+    eval_expr(e)
@@ -0,0 +1,47 @@
+"""Run a pyml module, printing every binding as soon as it is evaluated
+
+    python -m pyml [--engine ENGINE] [--no-typecheck] [--profile] [--collapsed OUT] [FILE]
+
+FILE, or the standard input when it is missing or "-", is read one line
+at a time, see pyml.lang.stream. With --profile the interpreter is
+profiled (see pyml.profiler) and the report printed to stderr,
+--collapsed writes the profiled stacks to OUT for flame graph tools.
+"""
+
+import argparse
+import sys
+
+from pyml.lang import ENGINES, stream
+from pyml.profiler import Profiler
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m pyml", description=__doc__.splitlines()[0])
+    parser.add_argument("file", nargs="?", default="-")
+    parser.add_argument("--engine", choices=ENGINES, default="interpreter")
+    parser.add_argument("--no-typecheck", dest="typecheck", action="store_false")
+    parser.add_argument("--profile", action="store_true")
+    parser.add_argument("--collapsed", metavar="OUT")
+    args = parser.parse_args(argv)
+    profiler = Profiler() if args.profile or args.collapsed else None
+    f = sys.stdin if args.file == "-" else open(args.file)
+    if profiler:
+        profiler.start()
+    try:
+        for name, value in stream(f, args.engine, args.typecheck):
+            print(name, "=", "<fun>" if callable(value) else repr(value), flush=True)
+    except (SyntaxError, TypeError, LookupError, ZeroDivisionError) as e:
+        sys.exit(f"error: {e}")
+    finally:
+        f.close()
+        if profiler:
+            profiler.stop()
+            if args.profile:
+                print(profiler.report(), file=sys.stderr)
+            if args.collapsed:
+                with open(args.collapsed, "w") as out:
+                    print(profiler.collapsed(), file=out)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""Persistent cache of parsed and compiled pyml modules.
+
+Parsing is the expensive part of starting a pyml program. `ModuleCache`
+stores the statements of a source (pickled) and its compiled code
+(marshalled) under a cache directory. Entries are keyed by the hash of
+the source and of the interpreter version, so a process running the same
+program again loads it instead of parsing it:
+
+>>> import tempfile
+>>> from pyml import lang
+>>> from pyml.cache import ModuleCache
+>>> cache = ModuleCache(tempfile.mkdtemp())
+>>> lang.run("val x = 1 + 2;", cache=cache)["x"]
+3
+>>> lang.run("val x = 1 + 2;", cache=cache)["x"], cache.hits, cache.misses
+(3, 1, 1)
+
+The interpreter version is a hash of the pyml modules that define the
+trees and the bytecode plus the Python cache tag, so changing either
+invalidates the cache. Only point the cache at a directory you trust,
+entries are unpickled.
+"""
+
+import hashlib
+import marshal
+import os
+import pickle
+import sys
+import tempfile
+from types import CodeType
+from typing import Any, Callable, List, Optional
+
+from pyml import compiler, infer, lang, parser
+from pyml import optimize as optimizer
+
+_version: Optional[str] = None
+
+
+def version() -> str:
+    "Return the interpreter version entries are keyed by"
+    global _version
+    if _version is None:
+        digest = hashlib.sha256(sys.implementation.cache_tag.encode())
+        for module in (lang, parser, compiler, infer, optimizer):
+            with open(module.__file__, "rb") as f:
+                digest.update(f.read())
+        _version = digest.hexdigest()
+    return _version
+
+
+def default_directory() -> str:
+    "$PYML_CACHE_DIR, else pyml under the user cache directory"
+    if "PYML_CACHE_DIR" in os.environ:
+        return os.environ["PYML_CACHE_DIR"]
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(
+        os.path.expanduser("~"), ".cache"
+    )
+    return os.path.join(base, "pyml")
+
+
+class ModuleCache:
+    """Cache parsed statements and compiled code of pyml sources
+
+    `parse` and `compile` return the cached result for a source or build
+    and store it. Unreadable entries are rebuilt, entries that can't be
+    written (e.g. trees too deep to pickle) are just not cached. `hits`
+    and `misses` count the lookups.
+    """
+
+    def __init__(self, directory: Optional[str] = None):
+        self.directory = directory or default_directory()
+        self.hits = self.misses = 0
+
+    def path(self, source: str, kind: str) -> str:
+        key = hashlib.sha256(version().encode() + source.encode()).hexdigest()
+        return os.path.join(self.directory, f"{key}.{kind}")
+
+    def _cached(self, path: str, build: Callable[[], Any], loads, dumps):
+        try:
+            with open(path, "rb") as f:
+                value = loads(f.read())
+        except Exception:
+            pass
+        else:
+            self.hits += 1
+            return value
+        self.misses += 1
+        value = build()
+        try:
+            data = dumps(value)
+            os.makedirs(self.directory, exist_ok=True)
+            # Write then rename, so concurrent readers never see half a file
+            fd, tmp = tempfile.mkstemp(dir=self.directory)
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(data)
+                os.replace(tmp, path)
+            except OSError:
+                os.remove(tmp)
+                raise
+        except (OSError, RecursionError, pickle.PicklingError):
+            pass
+        return value
+
+    def parse(self, source: str) -> List[lang.Statement]:
+        "Return the statements of source"
+        return self._cached(
+            self.path(source, "parse"),
+            lambda: lang.parse(source),
+            pickle.loads,
+            lambda value: pickle.dumps(value, pickle.HIGHEST_PROTOCOL),
+        )
+
+    def compile(
+        self, source: str, typecheck: bool = True, optimize: bool = True
+    ) -> CodeType:
+        """Return the code of source, see pyml.compiler. With `typecheck`
+        it is type checked first and compiled without operand checks, with
+        `optimize` it goes through pyml.optimize"""
+
+        def build():
+            statements = self.parse(source)
+            if typecheck:
+                infer.check(statements)
+            if optimize:
+                statements = optimizer.optimize(statements)
+            return compiler.compile_module(statements)
+
+        kind = ("typed." if typecheck else "") + ("opt." if optimize else "") + "code"
+        return self._cached(
+            self.path(source, kind),
+            build,
+            marshal.loads,
+            marshal.dumps,
+        )
+
+    def clear(self):
+        "Remove every entry"
+        if os.path.isdir(self.directory):
+            for name in os.listdir(self.directory):
+                if name.endswith((".parse", ".code")):
+                    os.remove(os.path.join(self.directory, name))
@@ -0,0 +1,367 @@
+"""Compile pyml modules to Python bytecode.
+
+Every statement becomes a Python statement: `val x = e;` an assignment
+and `fun f a b = e;` a `def`, so identifiers are resolved by the Python
+compiler (parameters are fast locals, module level names are globals of
+the namespace the code runs in) and operators are inlined. The operand
+type check the interpreter does is inlined as well, so both engines agree
+on every program:
+
+>>> from pyml import compiler, lang
+>>> code = compiler.compile_module(lang.parse("fun f a b = a * 2 + b; val x = f 3 4;"))
+>>> compiler.run(code)["x"]
+10
+>>> print(compiler.source(lang.parse("fun inc a = a + 1;")))
+def g_inc(a_a):
+    return (a_a + 1 if type(a_a) is int else _mismatch('+', a_a, 1))
+
+Calls in tail position don't grow the stack, a function calling itself
+there compiles to a loop:
+
+>>> print(compiler.source(lang.parse("fun loop n = if n == 0 then 0 else loop (n - 1) end;")))
+def g_loop(a_n):
+    while True:
+        if (a_n == 0 if type(a_n) is int else _mismatch('==', a_n, 0)):
+            return 0
+        else:
+            a_n = (a_n - 1 if type(a_n) is int else _mismatch('-', a_n, 1))
+            continue
+"""
+
+import sys
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from itertools import count
+from types import CodeType
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Set, Tuple
+
+from pyml.lang import (
+    BinOp,
+    Constant,
+    FuncDef,
+    FunCall,
+    Identifier,
+    IfExpr,
+    Node,
+    Statement,
+    Val,
+    left_chain,
+)
+
+# Stack of the thread running programs that recurse too deep for the
+# main thread, and the recursion limit there
+DEEP_STACK_SIZE = 512 << 20
+DEEP_RECURSION_LIMIT = 1_000_000
+
+# Longer chains of operators are compiled to a flat sequence of steps
+LONG_CHAIN = 32
+
+# fmt: off
+OPERATORS = {
+    "+": "+", "-": "-", "*": "*", "/": "//", "%": "%",
+    "==": "==", "!=": "!=", ">": ">", "<": "<", ">=": ">=", "<=": "<=",
+}
+# fmt: on
+
+
+class Partial(NamedTuple):
+    "A compiled function applied to fewer arguments than it takes"
+    func: Callable
+    args: Tuple
+
+    def __call__(self, *args):
+        return apply(self, args)
+
+
+class Tail(NamedTuple):
+    "A tail call returned by a trampolined function, for apply to make"
+    func: Callable
+    args: Tuple
+
+
+def apply(func: Any, args: Tuple) -> Any:
+    """Apply func to args with the pyml partial application rules, making
+    the tail calls it returns"""
+    while args:
+        if type(func) is Partial:
+            func, args = func.func, func.args + args
+        if not callable(func):
+            raise TypeError(f"{func!r} is not a function")
+        arity = func.__code__.co_argcount
+        if len(args) < arity:
+            return Partial(func, args)
+        func, args = func(*args[:arity]), args[arity:]
+        if type(func) is Tail:
+            func, args = func.func, func.args + args
+    return func
+
+
+def mismatch(op: str, arg1: Any, arg2: Any):
+    raise TypeError(f"{type(arg1).__name__} != {type(arg2).__name__}")
+
+
+def _name(name: str) -> str:
+    return "g_" + name
+
+
+def _param(name: str) -> str:
+    return "a_" + name
+
+
+def _tail_calls(node: Node):
+    "Yield the calls in tail position of a function body"
+    while isinstance(node, IfExpr):
+        yield from _tail_calls(node.body)
+        node = node.elsebody
+    if isinstance(node, FunCall):
+        yield node
+
+
+def _self_call(call: FunCall, fun: FuncDef) -> bool:
+    return (
+        call.name == fun.name
+        and call.name not in fun.args
+        and len(call.args) == len(fun.args)
+    )
+
+
+class Compiler:
+    """Translate statements to Python source.
+
+    `arities` maps the global functions defined so far to their number of
+    parameters, calls to them with that many arguments are direct Python
+    calls, any other call goes through `apply`. Names in `rebound` are
+    bound more than once, a later binding replaces the function the
+    direct call was compiled for so they are always called through `apply`.
+
+    Tail calls don't grow the stack. A function calling itself in tail
+    position becomes a loop rebinding its parameters. Other tail calls
+    return a `Tail` for `apply` to make, the functions doing so are
+    `trampolined` and always called through `apply`. When statements come
+    one by one the rebindings aren't known in advance: a function
+    rebinding a name already `called` directly is not trampolined.
+    """
+
+    def __init__(self, rebound: Iterable[str] = ()):
+        self.arities: Dict[str, int] = {}
+        self.trampolined: Set[str] = set()
+        self.rebound: Set[str] = set(rebound)
+        self.called: Set[str] = set()
+        self.temps = count()
+        # The temporaries of the last statement, globals when it is a val
+        self.statement_temps: List[str] = []
+
+    def statement(self, node: Statement) -> str:
+        self.statement_temps = []
+        if isinstance(node, Val):
+            self.arities.pop(node.name, None)
+            self.trampolined.discard(node.name)
+            return f"{_name(node.name)} = {self.expr(node.expr, ())}"
+        if isinstance(node, FuncDef):
+            self.arities[node.name] = len(node.args)
+            calls = list(_tail_calls(node.body))
+            loop = any(self.loops(call, node) for call in calls)
+            if node.name in self.called or all(self.loops(call, node) for call in calls):
+                self.trampolined.discard(node.name)
+            else:
+                self.trampolined.add(node.name)
+            lines = [f"def {_name(node.name)}({', '.join(map(_param, node.args))}):"]
+            if loop:
+                lines.append("    while True:")
+            lines += self.tail(node.body, node, 2 if loop else 1)
+            if node.name in self.trampolined:
+                lines.append(f"{_name(node.name)}.trampolined = True")
+            return "\n".join(lines)
+        raise TypeError(f"Can't compile {node!r}")
+
+    def loops(self, call: FunCall, fun: FuncDef) -> bool:
+        "Whether the tail call of fun can loop, it calls fun itself"
+        return _self_call(call, fun) and call.name not in self.rebound
+
+    def tail(self, node: Node, fun: FuncDef, indent: int) -> List[str]:
+        "Return the lines of the body of fun returning node"
+        pad = "    " * indent
+        if isinstance(node, IfExpr):
+            return [
+                f"{pad}if {self.expr(node.cond, fun.args)}:",
+                *self.tail(node.body, fun, indent + 1),
+                f"{pad}else:",
+                *self.tail(node.elsebody, fun, indent + 1),
+            ]
+        if isinstance(node, FunCall) and (self.loops(node, fun) or fun.name in self.trampolined):
+            args = ", ".join(self.expr(arg, fun.args) for arg in node.args)
+            if self.loops(node, fun):
+                return [f"{pad}{', '.join(map(_param, fun.args))} = {args}", f"{pad}continue"]
+            func = _param(node.name) if node.name in fun.args else _name(node.name)
+            return [f"{pad}return _Tail({func}, ({args},))"]
+        return [f"{pad}return {self.expr(node, fun.args)}"]
+
+    def expr(self, node: Node, params) -> str:
+        if isinstance(node, Constant):
+            return repr(node.value.value)
+        if isinstance(node, Identifier):
+            return _param(node.name) if node.name in params else _name(node.name)
+        if isinstance(node, BinOp):
+            return self.binop(node, params)
+        if isinstance(node, IfExpr):
+            cond, body, elsebody = (
+                self.expr(n, params) for n in (node.cond, node.body, node.elsebody)
+            )
+            return f"({body} if {cond} else {elsebody})"
+        if isinstance(node, FunCall):
+            args = [self.expr(arg, params) for arg in node.args]
+            if (
+                node.name not in params
+                and node.name not in self.trampolined
+                and node.name not in self.rebound
+                and self.arities.get(node.name) == len(args)
+            ):
+                self.called.add(node.name)
+                return f"{_name(node.name)}({', '.join(args)})"
+            func = _param(node.name) if node.name in params else _name(node.name)
+            return f"_apply({func}, ({', '.join(args)},))"
+        raise TypeError(f"Can't compile {node!r}")
+
+    def temp(self) -> str:
+        "Return a new temporary name"
+        temp = f"_t{next(self.temps)}"
+        self.statement_temps.append(temp)
+        return temp
+
+    def operand(self, node: Node, code: str) -> Tuple[str, str]:
+        """Return (first use, later uses) of the operand node compiled to
+        code, complex operands are stored to a temporary on first use"""
+        if isinstance(node, (Constant, Identifier)):
+            return code, code
+        temp = self.temp()
+        return f"({temp} := {code})", temp
+
+    def binop(self, node: BinOp, params) -> str:
+        """Compile the left nested chain of operators node ends in a loop
+
+        Chains longer than LONG_CHAIN nest deeper than Python can compile,
+        they become a flat tuple of steps assigning a temporary instead.
+        """
+        leaf, chain = left_chain(node)
+        code = self.expr(leaf, params)
+        if len(chain) <= LONG_CHAIN:
+            arg1 = leaf
+            for node in chain:
+                code = self.operation(node, arg1, code, params)
+                arg1 = node
+            return code
+        temp = self.temp()
+        steps = [f"({temp} := {code})"]
+        arg1 = Identifier(temp)
+        for node in chain:
+            steps.append(f"({temp} := {self.operation(node, arg1, temp, params)})")
+        return f"({', '.join(steps)})[-1]"
+
+    def operation(self, node: BinOp, arg1: Node, code1: str, params) -> str:
+        "The code of node applied to its first operand arg1, compiled to code1"
+        op = OPERATORS[node.op.name]
+        code2 = self.expr(node.arg2, params)
+        if node.typed:
+            return f"({code1} {op} {code2})"
+        first1, code1 = self.operand(arg1, code1)
+        first2, code2 = self.operand(node.arg2, code2)
+        if isinstance(node.arg2, Constant):
+            check = f"type({first1}) is {node.arg2.value.type.__name__}"
+        elif isinstance(arg1, Constant):
+            check = f"{arg1.value.type.__name__} is type({first2})"
+        else:
+            check = f"type({first1}) is type({first2})"
+        if isinstance(arg1, Constant) and isinstance(node.arg2, Constant):
+            if arg1.value.type is node.arg2.value.type:
+                return f"({code1} {op} {code2})"
+            check = "False"
+        fallback = f"_mismatch({node.op.name!r}, {code1}, {code2})"
+        return f"({code1} {op} {code2} if {check} else {fallback})"
+
+
+def source(statements: List[Statement]) -> str:
+    "Return the Python source of statements"
+    counts = Counter(statement.name for statement in statements)
+    compiler = Compiler(name for name, n in counts.items() if n > 1)
+    return "\n".join(compiler.statement(s) for s in statements)
+
+
+def compile_module(statements: List[Statement], filename: str = "<pyml>") -> CodeType:
+    "Compile statements to a code object, run it with `run`"
+    return compile(source(statements), filename, "exec")
+
+
+def _namespace() -> Dict[str, Any]:
+    return {"_apply": apply, "_mismatch": mismatch, "_Tail": Tail}
+
+
+def _exec_deep(code: CodeType, namespace: Dict[str, Any]):
+    "exec() with a high recursion limit, for threads of _deep_executor()"
+    limit = sys.getrecursionlimit()
+    sys.setrecursionlimit(DEEP_RECURSION_LIMIT)
+    try:
+        exec(code, namespace)
+    finally:
+        sys.setrecursionlimit(limit)
+
+
+def _deep_executor() -> ThreadPoolExecutor:
+    """An executor running code on a single thread with a big stack, so
+    programs can recurse deeper than the main thread allows
+
+    The stack size only applies to the thread started here. The recursion
+    limit is global to the interpreter, it is only raised while code runs.
+    """
+    executor = ThreadPoolExecutor(1)
+    size = threading.stack_size(DEEP_STACK_SIZE)
+    try:
+        executor.submit(int).result()
+    finally:
+        threading.stack_size(size)
+    return executor
+
+
+def _to_python(value: Any) -> Any:
+    "Trampolined functions only work through apply"
+    if getattr(value, "trampolined", False):
+        return lambda *args: apply(value, args)
+    return value
+
+
+def run(code: CodeType) -> Dict[str, Any]:
+    """Execute compiled code, return the pyml globals it defines
+
+    The code runs on a thread with a big stack, so programs can recurse
+    deeper than the Python stack of the main thread allows.
+    """
+    namespace = _namespace()
+    with _deep_executor() as executor:
+        executor.submit(_exec_deep, code, namespace).result()
+    return {k[2:]: _to_python(v) for k, v in namespace.items() if k.startswith("g_")}
+
+
+class Program:
+    """Compile and run statements one at a time in the same namespace
+
+    The compiled counterpart of pyml.lang.Module, for statements read one
+    by one. The statements are not kept, only the names they bind: the
+    temporaries of module level expressions are dropped once they ran.
+    """
+
+    def __init__(self, filename: str = "<pyml>"):
+        self.compiler = Compiler()
+        self.namespace = _namespace()
+        self.filename = filename
+        self.executor = _deep_executor()
+
+    def eval(self, statement: Statement) -> Any:
+        "Compile and run statement, return the value it binds"
+        code = compile(self.compiler.statement(statement), self.filename, "exec")
+        try:
+            self.executor.submit(_exec_deep, code, self.namespace).result()
+        finally:
+            if isinstance(statement, Val):
+                for temp in self.compiler.statement_temps:
+                    self.namespace.pop(temp, None)
+        return _to_python(self.namespace[_name(statement.name)])
@@ -0,0 +1,337 @@
+"""Hindley-Milner type inference for pyml.
+
+`check` infers the type of every statement with Algorithm W and raises
+`TypeCheckError` for ill typed programs before anything runs:
+
+>>> from pyml import infer, lang
+>>> statements = lang.parse("fun twice f x = f (f x); fun inc a = a + 1; val x = twice inc 1;")
+>>> types = infer.check(statements)
+>>> types["twice"], types["x"]
+('(a -> a) -> a -> a', 'int')
+>>> infer.check(lang.parse('val x = 1 + "a";'))
+Traceback (most recent call last):
+  ...
+pyml.infer.TypeCheckError: val x: can't unify int with str
+
+The base types are the Python types int, str and bool. Functions are
+curried, so partial application is typed like a call. `+` works on ints
+and strings, the other arithmetic operators on ints, comparisons on any
+base type, and `if` conditions must be bools. Top level `val`s and
+`fun`s are generalized (let polymorphism), and a name bound again must
+keep its type.
+
+BinOp and BoolOp nodes of checked statements are marked `typed`, so the
+interpreter skips its runtime operand checks and the compiler emits bare
+Python operators.
+
+Generalization uses levels (as in OCaml) and type variables are union
+find nodes, so checking takes time close to linear in the program size.
+"""
+
+from typing import Dict, List, NamedTuple, Optional, Union
+
+from pyml.lang import (
+    BinOp,
+    BoolOp,
+    Constant,
+    FuncDef,
+    FunCall,
+    Identifier,
+    IfExpr,
+    Node,
+    Statement,
+    Val,
+    left_chain,
+)
+
+# Level of the generalized type variables of a type scheme
+GENERIC = 1 << 30
+
+BASE = frozenset((int, str, bool))
+
+
+class TypeCheckError(TypeError):
+    pass
+
+
+class TVar:
+    """A type variable, `ref` is the type it was unified with
+
+    `kinds` is the set of base types the variable may stand for, None for
+    any type.
+    """
+
+    __slots__ = ("ref", "level", "kinds")
+
+    def __init__(self, level: int, kinds: Optional[frozenset] = None):
+        self.ref: Optional[Type] = None
+        self.level = level
+        self.kinds = kinds
+
+
+class TFun(NamedTuple):
+    arg: "Type"
+    ret: "Type"
+
+
+Type = Union[type, TVar, TFun]
+
+# fmt: off
+OPERATORS = {
+    "+": frozenset((int, str)),
+    "-": frozenset((int,)), "*": frozenset((int,)),
+    "/": frozenset((int,)), "%": frozenset((int,)),
+    "==": BASE, "!=": BASE, ">": BASE, "<": BASE, ">=": BASE, "<=": BASE,
+}
+# fmt: on
+
+
+def prune(t: Type) -> Type:
+    "Return what t stands for, compressing the TVar chain on the way"
+    root = t
+    while type(root) is TVar and root.ref is not None:
+        root = root.ref
+    while type(t) is TVar and t.ref is not None:
+        t.ref, t = root, t.ref
+    return root
+
+
+def show(t: Type) -> str:
+    "Return t as text, type variables named a, b, ..."
+    names: Dict[TVar, str] = {}
+
+    def name(var):
+        if var not in names:
+            names[var] = chr(ord("a") + len(names) % 26) + "'" * (len(names) // 26)
+        return names[var]
+
+    def go(t, nested):
+        t = prune(t)
+        if type(t) is TVar:
+            return name(t)
+        if type(t) is TFun:
+            text = f"{go(t.arg, True)} -> {go(t.ret, False)}"
+            return f"({text})" if nested else text
+        return t.__name__
+
+    return go(t, False)
+
+
+def _adjust(var: TVar, t: Type):
+    "Fail if var occurs in t, lower the levels in t to var's"
+    stack = [t]
+    while stack:
+        t = prune(stack.pop())
+        if t is var:
+            raise TypeCheckError(f"infinite type {show(var)} = {show(t)}")
+        if type(t) is TVar:
+            t.level = min(t.level, var.level)
+        elif type(t) is TFun:
+            stack += t
+    return t
+
+
+def _bind(var: TVar, t: Type):
+    if type(t) is TVar:
+        if var.kinds is None:
+            kinds = t.kinds
+        elif t.kinds is None:
+            kinds = var.kinds
+        else:
+            kinds = var.kinds & t.kinds
+            if not kinds:
+                raise TypeCheckError(f"can't unify {show(var)} with {show(t)}")
+        t.kinds = kinds
+        t.level = min(t.level, var.level)
+    elif var.kinds is not None and t not in var.kinds:
+        names = " or ".join(sorted(k.__name__ for k in var.kinds))
+        raise TypeCheckError(f"expected {names}, got {show(t)}")
+    else:
+        _adjust(var, t)
+    var.ref = t
+
+
+def unify(t1: Type, t2: Type):
+    stack = [(t1, t2)]
+    while stack:
+        t1, t2 = stack.pop()
+        t1, t2 = prune(t1), prune(t2)
+        if t1 is t2:
+            continue
+        if type(t1) is TVar:
+            _bind(t1, t2)
+        elif type(t2) is TVar:
+            _bind(t2, t1)
+        elif type(t1) is TFun and type(t2) is TFun:
+            stack.append((t1.ret, t2.ret))
+            stack.append((t1.arg, t2.arg))
+        else:
+            raise TypeCheckError(f"can't unify {show(t1)} with {show(t2)}")
+
+
+def generalize(t: Type, level: int):
+    "Quantify the variables of t above level"
+    stack = [t]
+    while stack:
+        t = prune(stack.pop())
+        if type(t) is TVar:
+            if t.level > level:
+                t.level = GENERIC
+        elif type(t) is TFun:
+            stack += t
+
+
+def instantiate(t: Type, level: int) -> Type:
+    "Return t with fresh variables for the quantified ones"
+    fresh: Dict[TVar, TVar] = {}
+
+    def go(t):
+        t = prune(t)
+        if type(t) is TVar:
+            if t.level != GENERIC:
+                return t
+            if t not in fresh:
+                fresh[t] = TVar(level, t.kinds)
+            return fresh[t]
+        if type(t) is TFun:
+            return TFun(go(t.arg), go(t.ret))
+        return t
+
+    return go(t)
+
+
+def _canonical(t: Type) -> str:
+    "show() plus the kinds of the variables, to compare schemes"
+    kinds = []
+    stack = [t]
+    while stack:
+        t = prune(stack.pop())
+        if type(t) is TVar and t.kinds is not None:
+            kinds.append(",".join(sorted(k.__name__ for k in t.kinds)))
+        elif type(t) is TFun:
+            stack += t
+    return show(t) + " " + " ".join(kinds)
+
+
+class Checker:
+    """Infer the types of statements one at a time
+
+    Names used before they are defined get a monomorphic type variable,
+    unified with their definition when it comes, so funs can be mutually
+    recursive. `finish` fails for names that were never defined.
+    """
+
+    def __init__(self):
+        self.globals: Dict[str, Type] = {}
+        self.pending: Dict[str, TVar] = {}
+        self.level = 0
+        self.typed: List[BinOp] = []
+
+    def statement(self, node: Statement) -> Type:
+        "Check node, return its type"
+        kind = "val" if isinstance(node, Val) else "fun"
+        try:
+            if isinstance(node, Val):
+                self.level += 1
+                t = self.expr(node.expr, {})
+                self.level -= 1
+            elif isinstance(node, FuncDef):
+                t = self.fun(node)
+            else:
+                raise TypeCheckError(f"can't check {node!r}")
+            generalize(t, self.level)
+            self.define(node.name, t)
+        except TypeCheckError as e:
+            self.level, self.typed = 0, []
+            raise TypeCheckError(f"{kind} {node.name}: {e}") from None
+        for binop in self.typed:
+            binop.typed = True
+        self.typed = []
+        return t
+
+    def finish(self):
+        "Fail if names used were never defined"
+        if self.pending:
+            raise LookupError(f"Can't find {', '.join(self.pending)}")
+
+    def define(self, name: str, t: Type):
+        if name in self.pending:
+            unify(self.pending.pop(name), instantiate(t, 0))
+        if name in self.globals and _canonical(self.globals[name]) != _canonical(t):
+            raise TypeCheckError(
+                f"{name} was {show(self.globals[name])}, can't rebind it to {show(t)}"
+            )
+        self.globals[name] = t
+
+    def fun(self, node: FuncDef) -> Type:
+        if not node.args:
+            raise TypeCheckError("a fun needs parameters, use a val")
+        self.level += 1
+        params = {name: TVar(self.level) for name in node.args}
+        t = TVar(self.level)
+        # The body sees the function itself, monomorphically
+        saved = self.globals.get(node.name)
+        self.globals[node.name] = t
+        try:
+            body = self.expr(node.body, params)
+        finally:
+            if saved is None:
+                del self.globals[node.name]
+            else:
+                self.globals[node.name] = saved
+        for name in reversed(node.args):
+            body = TFun(params[name], body)
+        unify(t, body)
+        self.level -= 1
+        return t
+
+    def lookup(self, name: str, params: Dict[str, TVar]) -> Type:
+        if name in params:
+            return params[name]
+        if name in self.globals:
+            return instantiate(self.globals[name], self.level)
+        if name not in self.pending:
+            self.pending[name] = TVar(0)
+        return self.pending[name]
+
+    def expr(self, node: Node, params: Dict[str, TVar]) -> Type:
+        if isinstance(node, Constant):
+            return node.value.type
+        if isinstance(node, Identifier):
+            return self.lookup(node.name, params)
+        if isinstance(node, BinOp):
+            leaf, chain = left_chain(node)
+            t = self.expr(leaf, params)
+            for node in chain:
+                operand = TVar(self.level, OPERATORS[node.op.name])
+                unify(operand, t)
+                unify(operand, self.expr(node.arg2, params))
+                self.typed.append(node)
+                t = bool if isinstance(node, BoolOp) else operand
+            return t
+        if isinstance(node, IfExpr):
+            unify(bool, self.expr(node.cond, params))
+            t = self.expr(node.body, params)
+            unify(t, self.expr(node.elsebody, params))
+            return t
+        if isinstance(node, FunCall):
+            t = self.lookup(node.name, params)
+            for arg in node.args:
+                ret = TVar(self.level)
+                unify(t, TFun(self.expr(arg, params), ret))
+                t = ret
+            return t
+        raise TypeCheckError(f"can't check {node!r}")
+
+
+def check(statements: List[Statement]) -> Dict[str, str]:
+    """Check statements, return the types of the names they define
+
+    Raises TypeCheckError for ill typed programs and LookupError for names
+    that are used but never defined.
+    """
+    checker = Checker()
+    for statement in statements:
+        checker.statement(statement)
+    checker.finish()
+    return {name: show(t) for name, t in checker.globals.items()}
@@ -1,28 +1,12 @@
-from typing import Dict, Any, NamedTuple, Optional, Callable
-from pprint import pprint, pformat
-from pyparsing import (  # type: ignore
-    Combine,
-    Forward,
-    Group,
-    Keyword,
-    ParseResults,
-    Literal,
-    Word,
-    alphanums,
-    alphas,
-    dblQuotedString,
-    delimitedList,
-    infixNotation,
-    nums,
-    oneOf,
-    opAssoc,
-    restOfLine,
-)
-from collections.abc import MutableMapping
-from abc import ABC, abstractmethod, abstractproperty
-import operator as op
+"""The pyml language: syntax tree, interpreter and the pyparsing grammar
+
+Importing this module does no work, the grammar (and pyparsing) is only
+loaded the first time BNF() is called.
+"""
 
-from pyml.utils import logger, classproperty
+from typing import Dict, Any, Iterable, Iterator, List, NamedTuple, Optional, Callable, Tuple
+from abc import ABC, abstractmethod
+import operator as op
 
 
 class _TypeUnknow:
@@ -42,272 +26,450 @@ class Value:
         return f"{self.value}:{self.type.__name__}"
 
 
-class ScopeEnv:
+# fmt: off
+OPERATORS: Dict[str, Callable] = {
+    "+": op.add, "-": op.sub, "%": op.mod, "*": op.mul, "/": op.floordiv,
+    "==": op.eq, "!=": op.ne, ">": op.gt, "<": op.lt, ">=": op.ge, "<=": op.le,
+}
+# fmt: on
+
+Frame = List[Any]
+
+
+class Scope:
     """
-    Our environment as nested scopes
+    The names bound by the module or by a function and their slots
+
+    Variables are resolved to (depth, slot) pairs before evaluation. At
+    runtime every scope is a frame, a list whose slot 0 holds the frame of
+    the enclosing scope, so a variable is read by following `depth` links
+    and indexing `slot`. Unbound slots hold None.
     """
 
-    # fmt: off
-    _scope: Dict[str, Any] = {
-        "+": Value(op.add, op.add),
-        "-": Value(op.sub, op.sub),
-        "%": Value(op.mod, op.mod),
-        "*": Value(op.mul, op.mul),
-        "/": Value(op.floordiv, op.floordiv),
-    }
-    # fmt: on
-
-    _current = _scope
-
-    @classmethod
-    def push(cls, scope: str, key: str, value: Value):
-        "Push value to scope"
-        cls._scope.setdefault(scope, {})[key] = value
-        cls._current = cls._scope[scope]
-
-    @classmethod
-    def pop(cls, scope: str):
-        "Pop an scope"
-        cls._current = cls._scope
-
-    @classmethod
-    def dump(cls) -> str:
-        return pformat(cls._scope)
-
-    @classproperty
-    def current(cls):
-        "Return the current scope"
-        return cls._current
-
-    @classproperty
-    def current_name(cls):
-        for k, v in cls._scope:
-            if v is cls._current:
-                return k
-        return "global"
-
-    @classmethod
-    def lookup(cls, key) -> Optional[Any]:
-        "Lookup a value from current scope"
-        val = cls.current.get(key)
-        logger.debug("looking up %s => %s in scope %s", key, val, cls.current)
-        if val is not None:
-            return val
-        val = cls._scope.get(key)
-        logger.debug("looking up %s => %s in scope %s", key, val, cls._scope)
-        if val is not None:
-            return val
-        return None
+    def __init__(self, parent: Optional["Scope"] = None, names: List[str] = ()):
+        self.parent = parent
+        self.slots: Dict[str, int] = {}
+        for name in names:
+            self.define(name)
+
+    def __len__(self):
+        "The size of a frame for this scope"
+        return len(self.slots) + 1
+
+    def define(self, name: str) -> int:
+        "Return the slot of name in this scope, adding it if needed"
+        return self.slots.setdefault(name, len(self.slots) + 1)
+
+    def resolve(self, name: str) -> Tuple[int, int]:
+        """Return the (depth, slot) of name, names bound nowhere are module
+        level names defined later on"""
+        depth, scope = 0, self
+        while name not in scope.slots:
+            if scope.parent is None:
+                return depth, scope.define(name)
+            depth, scope = depth + 1, scope.parent
+        return depth, scope.slots[name]
 
 
 class Node(ABC):
+    # Whether the node is free of calls, resolve() computes it for
+    # composite nodes. execute() evaluates simple nodes recursively.
+    simple = True
+
     @abstractmethod
-    def __init__(self, tokens: ParseResults):
-        self.expr: Optional[Node]
-        self.value: Optional[Value]
+    def __init__(self, *args):
+        pass
 
     def __repr__(self):
-        if hasattr(self, "value") and self.value is not None:
-            attrs = ", ".join(
-                f"{k}={repr(v)}" for k, v in self.__dict__.items() if k != "expr"
-            )
-        else:
-            attrs = ", ".join(
-                f"{k}={repr(v)}" for k, v in self.__dict__.items() if k != "value"
-            )
+        attrs = ", ".join(f"{k}={repr(v)}" for k, v in self.__dict__.items())
         return f"{self.__class__.__name__}({attrs})"
 
 
 class Identifier(Node):
-    def __init__(self, tokens: ParseResults):
-        self.name = tokens[0]
-        self.value: Optional[Any] = None
-
-    def eval(self):
-        if self.value is not None:
-            return self.value
-        val = ScopeEnv.lookup(self.name)
-        logger.debug(
-            "Identifier looked up %s => %s:%s", self.name, val.value, val.type.__name__
-        )
-        self.value = val
-        return self.value
+    def __init__(self, name: str):
+        self.name = name
+
+    def resolve(self, scope: Scope):
+        self.depth, self.slot = scope.resolve(self.name)
+
+    def eval(self, frame: Frame) -> Value:
+        for _ in range(self.depth):
+            frame = frame[0]
+        val = frame[self.slot]
+        if val is None:
+            raise LookupError(f"Can't find {self.name}")
+        return val
 
 
 class Expr(Node):
-    def __init__(self, tokens: ParseResults):
-        self.value = Value(tokens.value)
+    @abstractmethod
+    def resolve(self, scope: Scope):
+        pass
 
     @abstractmethod
-    def eval(self) -> Value:
+    def eval(self, frame: Frame) -> Value:
         pass
 
 
 class Constant(Expr):
-    def __init__(self, tokens: ParseResults, type):
-        if type is int:
-            v = int(tokens.value)
-        elif type is bool:
-            v = tokens.value == "true"
-        else:
-            v = tokens.value
-        self.value = Value(v, type)
-
-    def eval(self):
-        return self.value
+    def __init__(self, value: Any, type):
+        self.value = Value(value, type)
 
+    def resolve(self, scope: Scope):
+        pass
 
-class BinOp(Expr):
-    def __init__(self, tokens: ParseResults):
-        self.type = TypeUnknow
-        self.op = Identifier(tokens[0][1][:])
-        self.arg1 = tokens[0][0]
-        self.arg2 = tokens[0][2]
-        self.value: Optional[Value] = None
-
-    def eval(self) -> Value:
-        if self.value is not None:
-            return self.value
-        logger.debug("evaluate BinOp %s %s %s", self.arg1, self.op, self.arg2)
-        self.op.eval()
-        self.arg1.eval()
-        self.arg2.eval()
-
-        if self.arg1.value.type != self.arg2.value.type:
-            raise TypeError("{self.arg1.type} != {self.arg2.type}")
-        if self.op.value is None:
-            raise LookupError("Can't find {self.op}")
-
-        logger.debug("op => %s", self.op.value.value)
-        value = self.op.value.value(self.arg1.value.value, self.arg2.value.value)
-        self.value = Value(value, self.arg1.value.type)  # type: ignore
+    def eval(self, frame: Frame):
         return self.value
 
 
-class BoolOp(Expr):
-    def eval(self) -> Value:
-        return Value(None, bool)
+class BinOp(Expr):
+    # Set by pyml.infer on nodes of type checked programs, whose operands
+    # can't have different types
+    typed = False
+
+    def __init__(self, op: str, arg1: Node, arg2: Node):
+        self.op = Identifier(op)
+        self.arg1 = arg1
+        self.arg2 = arg2
+
+    def resolve(self, scope: Scope):
+        leaf, chain = left_chain(self)
+        leaf.resolve(scope)
+        simple = leaf.simple
+        for node in chain:
+            node.func = OPERATORS[node.op.name]
+            node.arg2.resolve(scope)
+            simple = node.simple = simple and node.arg2.simple
+
+    def operate(self, arg1: Value, arg2: Value) -> Value:
+        if not self.typed and arg1.type != arg2.type:
+            raise TypeError(f"{arg1.type.__name__} != {arg2.type.__name__}")
+        return Value(self.func(arg1.value, arg2.value), arg1.type)
+
+    def eval(self, frame: Frame) -> Value:
+        kind = type(self.arg1)
+        if kind is not BinOp and kind is not BoolOp:
+            return self.operate(self.arg1.eval(frame), self.arg2.eval(frame))
+        leaf, chain = left_chain(self)
+        value = leaf.eval(frame)
+        for node in chain:
+            value = node.operate(value, node.arg2.eval(frame))
+        return value
+
+
+class BoolOp(BinOp):
+    def operate(self, arg1: Value, arg2: Value) -> Value:
+        if not self.typed and arg1.type != arg2.type:
+            raise TypeError(f"{arg1.type.__name__} != {arg2.type.__name__}")
+        return Value(self.func(arg1.value, arg2.value), bool)
+
+
+def left_chain(node: BinOp) -> Tuple[Node, List[BinOp]]:
+    """Return the leftmost operand of node and the operators of the left
+    nested chain `a op b op c ...` it ends, innermost first
+
+    Operators are left associative, so long chains are deep on the left:
+    walking them with this loop instead of recursing on arg1 keeps their
+    length out of the Python stack.
+    """
+    chain = []
+    while type(node) is BinOp or type(node) is BoolOp:
+        chain.append(node)
+        node = node.arg1
+    chain.reverse()
+    return node, chain
 
 
 class IfExpr(Expr):
-    def __init__(self, tokens: ParseResults):
-        self.type = TypeUnknow
-        self.cond = tokens.ifcond
-        self.body = tokens.ifbody
-        self.elsebody = tokens.eslebody
+    def __init__(self, cond: Node, body: Node, elsebody: Node):
+        self.cond = cond
+        self.body = body
+        self.elsebody = elsebody
+
+    def resolve(self, scope: Scope):
+        self.cond.resolve(scope)
+        self.body.resolve(scope)
+        self.elsebody.resolve(scope)
+        self.simple = self.cond.simple and self.body.simple and self.elsebody.simple
 
-    def eval(self) -> Value:
-        return Value(None, None)
+    def eval(self, frame: Frame) -> Value:
+        if self.cond.eval(frame).value:
+            return self.body.eval(frame)
+        return self.elsebody.eval(frame)
 
 
 class FunCall(Expr):
-    def __init__(self, tokens: ParseResults):
-        self.type = TypeUnknow
-        self.name = tokens.name
-        self.args = tokens.args.args
+    simple = False
+
+    def __init__(self, name: str, args: List[Node]):
+        self.name = name
+        self.args = args
+
+    def resolve(self, scope: Scope):
+        self.depth, self.slot = scope.resolve(self.name)
+        for arg in self.args:
+            arg.resolve(scope)
+        self.simple_args = all(arg.simple for arg in self.args)
 
-    def eval(self):
-        result = ScopeEnv.lookup(self.name).call(self.args)
-        self.type = result.type
-        return result
+    def lookup(self, frame: Frame) -> Value:
+        for _ in range(self.depth):
+            frame = frame[0]
+        func = frame[self.slot]
+        if func is None:
+            raise LookupError(f"Can't find {self.name}")
+        return func
+
+    def eval(self, frame: Frame):
+        return execute(self, frame)
 
 
 class Statement(Node):
-    pass
+    @abstractmethod
+    def resolve(self, scope: Scope):
+        pass
+
+    @abstractmethod
+    def eval(self, frame: Frame):
+        pass
 
 
 class Val(Statement):
-    def __init__(self, tokens: ParseResults):
-        self.name = tokens.name.name
-        self.value = None
-        self.expr: Expr = tokens.expr
+    def __init__(self, name: str, expr: Expr):
+        self.name = name
+        self.expr = expr
 
-    def eval(self):
-        if self.value is not None:
-            return self.value
-        self.expr.eval()
-        self.value = self.expr.value
-        logger.debug("Val evaluated: %s", self)
-        ScopeEnv.push("global", self.name, self.value)
+    def resolve(self, scope: Scope):
+        self.expr.resolve(scope)
+        self.slot = scope.define(self.name)
+
+    def eval(self, frame: Frame):
+        value = execute(self.expr, frame)
+        frame[self.slot] = value
+        return value
 
 
 class FuncDef(Statement):
-    def __init__(self, tokens: ParseResults):
-        self.name = tokens.name.name
-        self.args = [t.name for t in tokens.args]
-        self.body: Expr = tokens.body
+    def __init__(self, name: str, args: List[str], body: Expr):
+        self.name = name
+        self.args = args
+        self.body = body
+
+    def resolve(self, scope: Scope):
+        self.slot = scope.define(self.name)
+        self.body.resolve(Scope(scope, self.args))
+
+    def eval(self, frame: Frame):
+        value = Value(Closure(self, frame), FuncDef)
+        frame[self.slot] = value
+        return value
+
+    def call(self, env: Frame, args: List[Value]) -> Value:
+        "Evaluate the body in a new frame holding args"
+        return execute(self.body, [env, *args])
+
+
+class Closure(NamedTuple):
+    "A function and the frame it was defined in"
+    func: FuncDef
+    env: Frame
+
+
+class Partial(NamedTuple):
+    "A function applied to fewer arguments than it takes"
+    func: Closure
+    args: List[Value]
+
+
+# The continuations of execute()
+_IF, _ARG1, _ARG2, _ARGS, _APPLY = range(5)
+
+
+def _enter(func: Value, args: List[Value], stack: List[tuple]):
+    """Start applying func to args, return (body, frame, None) to evaluate
+    or (None, None, value) for a partial application. Extra arguments are
+    pushed to be applied to the result."""
+    f = func.value
+    if type(f) is Partial:
+        f, args = f.func, f.args + args
+    if type(f) is not Closure:
+        raise TypeError(f"{f!r} is not a function")
+    arity = len(f.func.args)
+    if len(args) < arity:
+        return None, None, Value(Partial(f, args), FuncDef)
+    if len(args) > arity:
+        stack.append((_APPLY, args[arity:]))
+        args = args[:arity]
+    return f.func.body, [f.env, *args], None
+
+
+def execute(node: Optional[Node], frame: Frame, stack=None, value=None) -> Value:
+    """Evaluate node in frame, a trampolined loop over an explicit stack
+
+    Simple nodes (free of calls) are evaluated by their eval() method,
+    the others by the loop, which keeps what is left to do after a sub
+    expression as a continuation on `stack`. Calls push nothing: the body
+    of the callee just replaces the node being evaluated, so tail calls
+    run in constant space and other calls grow `stack` instead of the
+    Python stack, however deep the recursion.
+
+    With node None the loop starts by returning value to the top of stack.
+    """
+    if stack is None:
+        stack = []
+    while True:
+        if node is not None:
+            if node.simple:
+                value = node.eval(frame)
+            elif type(node) is FunCall:
+                func = node.lookup(frame)
+                if node.simple_args:
+                    args = [arg.eval(frame) for arg in node.args]
+                    node, frame, value = _enter(func, args, stack)
+                    continue
+                stack.append((_ARGS, node, frame, func, []))
+                node = node.args[0]
+                continue
+            elif type(node) is IfExpr:
+                if node.cond.simple:
+                    node = node.body if node.cond.eval(frame).value else node.elsebody
+                    continue
+                stack.append((_IF, node, frame))
+                node = node.cond
+                continue
+            elif node.arg1.simple:
+                stack.append((_ARG2, node, node.arg1.eval(frame)))
+                node = node.arg2
+                continue
+            else:
+                stack.append((_ARG1, node, frame))
+                node = node.arg1
+                continue
+        if not stack:
+            return value
+        k = stack.pop()
+        kind = k[0]
+        if kind == _IF:
+            node, frame = k[1].body if value.value else k[1].elsebody, k[2]
+        elif kind == _ARG1:
+            stack.append((_ARG2, k[1], value))
+            node, frame = k[1].arg2, k[2]
+        elif kind == _ARG2:
+            value = k[1].operate(k[2], value)
+            node = None
+        elif kind == _ARGS:
+            args = k[4]
+            args.append(value)
+            if len(args) < len(k[1].args):
+                stack.append(k)
+                node, frame = k[1].args[len(args)], k[2]
+            else:
+                node, frame, value = _enter(k[3], args, stack)
+        else:
+            node, frame, value = _enter(value, k[1], stack)
+
 
-    def eval(self):
-        ScopeEnv.push("global", self.name, self)
+def apply(func: Value, args: List[Value]) -> Value:
+    """Apply a function value to args, returning a Partial for missing
+    arguments and applying the result to the extra ones"""
+    if not args:
+        return func
+    return execute(None, [], [(_APPLY, args)], func)
 
-    def call(self, args):
-        self.body.eval(args)
 
+def _binop(cls):
+    "Parse action folding `a op b op c` to left nested cls nodes"
 
-def eval_statement(self, tokens: ParseResults):
-    tokens[0].eval()
+    def action(tokens):
+        tokens = tokens[0]
+        node = tokens[0]
+        for i in range(1, len(tokens), 2):
+            node = cls(tokens[i], node, tokens[i + 1])
+        return node
+
+    return action
 
 
 def BNF():
     if hasattr(BNF, "_cache"):
         return BNF._cache
 
+    from pyparsing import (  # type: ignore
+        Combine,
+        Forward,
+        Group,
+        Keyword,
+        MatchFirst,
+        Literal,
+        Suppress,
+        Word,
+        alphas,
+        dblQuotedString,
+        nums,
+        oneOf,
+        restOfLine,
+    )
+
     expr = Forward()
 
-    INT = Word(nums)("value").setParseAction(lambda t: Constant(t, int))
-    STRING = dblQuotedString("value").setParseAction(lambda t: Constant(t, str))
-    ID = Word(alphas + "_").setParseAction(Identifier)
-    BOOL = oneOf("true false")("value").setParseAction(lambda t: Constant(t, bool))
+    IF = Keyword("if").suppress()
+    THEN = Keyword("then").suppress()
+    ELSE = Keyword("else").suppress()
+    END = Keyword("end").suppress()
+    VAL = Keyword("val").suppress()
+    FUN = Keyword("fun").suppress()
+    KEYWORD = MatchFirst(
+        Keyword(k) for k in ("if", "then", "else", "end", "val", "fun", "true", "false")
+    )
 
-    IF = Keyword("if")
-    THEN = Keyword("then")
-    ELSE = Keyword("else")
-    END = Keyword("end")
-    VAL = Keyword("val")
-    FUN = Keyword("fun")
+    INT = Word(nums).setParseAction(lambda t: Constant(int(t[0]), int))
+    STRING = dblQuotedString.copy().setParseAction(lambda t: Constant(t[0][1:-1], str))
+    NAME = Combine(~KEYWORD + Word(alphas + "_"))
+    ID = NAME.copy().setParseAction(lambda t: Identifier(t[0]))
+    BOOL = (Keyword("true") | Keyword("false")).setParseAction(
+        lambda t: Constant(t[0] == "true", bool)
+    )
 
     EQUAL = Literal("=").suppress()
     SEMICOLON = Literal(";").suppress()
+    LPAR, RPAR = Suppress("("), Suppress(")")
     COMMENT = Literal("#").suppress() + restOfLine
 
     constant = INT | STRING | BOOL
-    value = constant | ID
+    atom = constant | ID | LPAR + expr + RPAR
 
-    boolop = oneOf("== != > < >= <=")
+    boolop = oneOf("== != >= <= > <")
     mulop = oneOf("* / %")
     plusop = oneOf("+ -")
 
-    # fmt: off
-    infix_expr = infixNotation(
-        value,
-        [
-            (mulop,  2, opAssoc.LEFT, BinOp),
-            (plusop, 2, opAssoc.LEFT, BinOp),
-            (boolop,  2, opAssoc.LEFT, BoolOp),
-        ]
-
-    )
-    # fmt: on
-
     # Expressions
-    fun_call_expr = (ID("name") + value("args")).setParseAction(FunCall)
+    fun_call_expr = (NAME + Group(atom[1, ...])).setParseAction(
+        lambda t: FunCall(t[0], list(t[1]))
+    )
 
-    if_expr = (
-        IF + expr("ifcond") + THEN + ELSE + expr("elsebody") + END
-    ).setParseAction(IfExpr)
+    if_expr = (IF + expr + THEN + expr + ELSE + expr + END).setParseAction(
+        lambda t: IfExpr(t[0], t[1], t[2])
+    )
 
-    expr <<= if_expr | infix_expr | fun_call_expr | constant | ID
+    # One rule per precedence level, lowest last. Unlike infixNotation
+    # these never parse an operand twice, so packrat caching isn't needed
+    # (it makes this grammar twice as slow).
+    operand = if_expr | fun_call_expr | atom
+    mul_expr = Group(operand + (mulop + operand)[...]).setParseAction(_binop(BinOp))
+    plus_expr = Group(mul_expr + (plusop + mul_expr)[...]).setParseAction(_binop(BinOp))
+    bool_expr = Group(plus_expr + (boolop + plus_expr)[...]).setParseAction(_binop(BoolOp))
 
-    expr_list = delimitedList(expr, ";")
+    expr <<= bool_expr
 
     # Statements
-    val_stmt = (VAL + ID("name") + EQUAL + expr("expr") + SEMICOLON).setParseAction(Val)
+    val_stmt = (VAL + NAME + EQUAL + expr + SEMICOLON).setParseAction(
+        lambda t: Val(t[0], t[1])
+    )
 
-    fun_stmt = (
-        FUN + ID("name") + ID[...]("args") + EQUAL + expr("body") + SEMICOLON
-    ).setParseAction(FuncDef)
+    fun_stmt = (FUN + NAME + Group(NAME[...]) + EQUAL + expr + SEMICOLON).setParseAction(
+        lambda t: FuncDef(t[0], list(t[1]), t[2])
+    )
 
-    statement = (val_stmt ^ fun_stmt)("stmt").setParseAction(eval_statement)
+    statement = val_stmt | fun_stmt
 
     module = statement[1, ...].ignore(COMMENT)
 
@@ -315,15 +477,162 @@ def BNF():
     return module
 
 
-BNF().runTests(
+PARSERS = ("pratt", "pyparsing")
+
+
+def parse(source: str, parser: str = "pratt") -> List[Statement]:
+    """Parse a pyml module to a list of statements
+
+    `parser` is "pratt", the hand written parser of pyml.parser, or
+    "pyparsing", the BNF() grammar. Both build the same trees, the first
+    one is much faster on big sources.
+    """
+    if parser == "pratt":
+        from pyml import parser as pratt
+
+        return pratt.parse(source)
+    if parser == "pyparsing":
+        return list(BNF().parseString(source, parseAll=True))
+    raise ValueError(f"Unknown parser {parser!r}, use one of {', '.join(PARSERS)}")
+
+
+class Module:
+    "The module scope and frame statements are evaluated in"
+
+    def __init__(self):
+        self.scope = Scope()
+        self.frame: Frame = [None]
+
+    def eval(self, statement: Statement):
+        "Resolve and evaluate statement"
+        statement.resolve(self.scope)
+        self.frame.extend([None] * (len(self.scope) - len(self.frame)))
+        return statement.eval(self.frame)
+
+    @property
+    def globals(self) -> Dict[str, Value]:
+        "The bound module level names and their values"
+        return {
+            name: self.frame[slot]
+            for name, slot in self.scope.slots.items()
+            if self.frame[slot] is not None
+        }
+
+
+def interpret(statements: List[Statement]) -> Dict[str, Value]:
+    "Evaluate statements in a new module, return its globals"
+    module = Module()
+    for statement in statements:
+        module.eval(statement)
+    return module.globals
+
+
+def to_python(value: Value) -> Any:
+    "Return the Python equivalent of value, functions become callables"
+    if value.type is FuncDef:
+        return lambda *args: to_python(
+            apply(value, [Value(a, type(a)) for a in args])
+        )
+    return value.value
+
+
+ENGINES = ("interpreter", "compiler")
+
+
+def run(
+    source: str,
+    engine: str = "interpreter",
+    cache=None,
+    typecheck: bool = True,
+    optimize: bool = True,
+) -> Dict[str, Any]:
+    """Run a pyml module, return its globals as Python values
+
+    `engine` is "interpreter", which walks the tree evaluating nodes, or
+    "compiler", which compiles the module to Python bytecode first (see
+    pyml.compiler). Both give the same results, pyml functions become
+    Python callables. `cache`, a pyml.cache.ModuleCache, skips parsing and
+    compiling sources that were run before.
+
+    With `typecheck` the types are inferred first (see pyml.infer), ill
+    typed programs fail before running and the operators of well typed
+    ones run without checking their operands.
+
+    With `optimize` the module is rewritten by pyml.optimize first.
     """
-    val foo = 10;
-    val bar = 20;
-    val zar = foo;
-    val a = 1 + 2;
-    val hello = "Hello";
-    fun foofunc a b = a + b;
-    val foofuncres = foofunc 1;
-    # fun odd x = x % 2 == 0;
+    from pyml import infer, optimize as optimizer
+
+    if engine == "interpreter":
+        statements = cache.parse(source) if cache else parse(source)
+        if typecheck:
+            infer.check(statements)
+        if optimize:
+            statements = optimizer.optimize(statements)
+        scope = interpret(statements)
+        return {name: to_python(value) for name, value in scope.items()}
+    if engine == "compiler":
+        from pyml import compiler
+
+        if cache:
+            code = cache.compile(source, typecheck, optimize)
+        else:
+            statements = parse(source)
+            if typecheck:
+                infer.check(statements)
+            if optimize:
+                statements = optimizer.optimize(statements)
+            code = compiler.compile_module(statements)
+        return compiler.run(code)
+    raise ValueError(f"Unknown engine {engine!r}, use one of {', '.join(ENGINES)}")
+
+
+def stream(
+    lines: Iterable[str], engine: str = "interpreter", typecheck: bool = True
+) -> Iterator[Tuple[str, Any]]:
+    """Run a pyml module one statement at a time as its lines are read,
+    yield the (name, Python value) of every binding
+
+    Unlike run() the module is never held whole: every statement is
+    parsed, checked and evaluated before the next line is read, and its
+    tree is dropped once evaluated (funs keep their body), so memory only
+    grows with the number of names bound. Since later statements aren't
+    known yet, the optimizer only folds constants. With `typecheck`,
+    ill typed statements fail when they are reached, and names used but
+    never defined when the input ends.
     """
-)
+    from pyml import infer, optimize, parser
+
+    if engine == "interpreter":
+        module = Module()
+        evaluate = lambda statement: to_python(module.eval(statement))
+    elif engine == "compiler":
+        from pyml import compiler
+
+        evaluate = compiler.Program().eval
+    else:
+        raise ValueError(f"Unknown engine {engine!r}, use one of {', '.join(ENGINES)}")
+    checker = infer.Checker() if typecheck else None
+    # With no statements ahead every name may be bound again
+    folder = optimize.Optimizer(())
+    for statement in parser.statements(lines):
+        if checker:
+            checker.statement(statement)
+        statement = folder.statement(statement)
+        yield statement.name, evaluate(statement)
+    if checker:
+        checker.finish()
+
+
+if __name__ == "__main__":
+    BNF().runTests(
+        """
+        val foo = 10;
+        val bar = 20;
+        val zar = foo;
+        val a = 1 + 2;
+        val hello = "Hello";
+        fun foofunc a b = a + b;
+        val foofuncres = foofunc 1;
+        # fun odd x = x % 2 == 0;
+        """
+    )
@@ -0,0 +1,367 @@
+"""Optimize pyml modules before they run.
+
+`optimize` rewrites the statements of a module to equivalent, smaller
+ones. It folds operators on constants, drops the dead branch of `if`s
+with a constant condition, replaces the names of constants and aliases
+bound by `val`s with their values and inlines calls to small non
+recursive `fun`s:
+
+>>> from pyml import lang
+>>> from pyml.optimize import dump, optimize
+>>> print(dump(optimize(lang.parse(
+...     "val a = 1 + 2; val b = a; fun inc x = x + 1;"
+...     "fun f x = if b > 2 then inc x else 0 end;"))))
+val a = 3;
+val b = 3;
+fun inc x = x + 1;
+fun f x = x + 1;
+
+Names bound more than once are left alone, since functions see the
+binding current when they are called. Operators that would fail, e.g. on
+operands of different types, are not folded so the program fails at the
+same point as without the optimizer. Run it after `pyml.infer.check`,
+the `typed` marks of the operators are kept.
+
+`python -m pyml.optimize FILE` prints the optimized module and the node
+counts before and after.
+"""
+
+import logging
+import operator
+import sys
+from collections import Counter
+from typing import Dict, Iterator, List, Sequence
+
+from pyml.lang import (
+    OPERATORS,
+    BinOp,
+    BoolOp,
+    Constant,
+    FuncDef,
+    FunCall,
+    Identifier,
+    IfExpr,
+    Node,
+    Statement,
+    Val,
+    left_chain,
+    parse,
+)
+from pyml.parser import BINDING
+from pyml.utils import logger
+
+# The types of operator nodes, matched with `is` since isinstance() is
+# slow on the abstract Node classes
+BINOPS = (BinOp, BoolOp)
+
+# Functions whose body has at most this many nodes are inlined
+INLINE_SIZE = 16
+
+# How many inlined calls may be nested, calls to parameters can inline
+# functions again once the arguments are known
+INLINE_DEPTH = 4
+
+
+def size(node: Node) -> int:
+    "The number of nodes of a tree"
+    if isinstance(node, Val):
+        return 1 + size(node.expr)
+    if isinstance(node, FuncDef):
+        return 1 + size(node.body)
+    if isinstance(node, BinOp):
+        leaf, chain = left_chain(node)
+        return len(chain) + size(leaf) + sum(size(n.arg2) for n in chain)
+    if isinstance(node, IfExpr):
+        return 1 + size(node.cond) + size(node.body) + size(node.elsebody)
+    if isinstance(node, FunCall):
+        return 1 + sum(map(size, node.args))
+    return 1
+
+
+def names(node: Node, strict: bool = True) -> Iterator[tuple]:
+    """Yield (name, strict) for every name used in node, strict when it is
+    evaluated every time node is, False within the branches of an if"""
+    if isinstance(node, Identifier):
+        yield node.name, strict
+    elif isinstance(node, BinOp):
+        leaf, chain = left_chain(node)
+        yield from names(leaf, strict)
+        for n in chain:
+            yield from names(n.arg2, strict)
+    elif isinstance(node, IfExpr):
+        yield from names(node.cond, strict)
+        yield from names(node.body, False)
+        yield from names(node.elsebody, False)
+    elif isinstance(node, FunCall):
+        yield node.name, strict
+        for arg in node.args:
+            yield from names(arg, strict)
+
+
+def fold(node: BinOp, arg1: Constant, arg2: Constant) -> Node:
+    "Return the constant result of node on constant operands, if it has one"
+    value1, value2 = arg1.value, arg2.value
+    if value1.type is value2.type:
+        try:
+            value = OPERATORS[node.op.name](value1.value, value2.value)
+        except Exception:
+            pass
+        else:
+            return Constant(value, bool if isinstance(node, BoolOp) else value1.type)
+    return _binop(node, arg1, arg2)
+
+
+def _binop(node: BinOp, arg1: Node, arg2: Node) -> BinOp:
+    "A copy of node with other operands"
+    new = type(node)(node.op.name, arg1, arg2)
+    if node.typed:
+        new.typed = True
+    return new
+
+
+def _copy(node: Node) -> Node:
+    return substitute(node, {})
+
+
+def substitute(node: Node, args: Dict[str, Node]) -> Node:
+    "A copy of node with the names in args replaced by copies of their nodes"
+    kind = type(node)
+    if kind is Identifier:
+        if node.name in args:
+            return _copy(args[node.name])
+        return Identifier(node.name)
+    if kind is Constant:
+        return Constant(node.value.value, node.value.type)
+    if kind in BINOPS:
+        leaf, chain = left_chain(node)
+        result = substitute(leaf, args)
+        for n in chain:
+            result = _binop(n, result, substitute(n.arg2, args))
+        return result
+    if kind is IfExpr:
+        return IfExpr(*(substitute(n, args) for n in (node.cond, node.body, node.elsebody)))
+    if kind is FunCall:
+        name = args[node.name].name if node.name in args else node.name
+        return FunCall(name, [substitute(arg, args) for arg in node.args])
+    raise TypeError(f"Can't copy {node!r}")
+
+
+class Optimizer:
+    """Optimize the statements of a module in order
+
+    `constants` and `aliases` map the names bound once by a `val` to the
+    constant or the name they are bound to, `functions` the small non
+    recursive `fun`s bound once. Only the statements after a binding see
+    it, the ones before would fail to find the name.
+    """
+
+    def __init__(self, statements: Sequence[Statement]):
+        counts = Counter(statement.name for statement in statements)
+        self.once = {name for name, n in counts.items() if n == 1}
+        self.defined = set()
+        self.constants: Dict[str, Constant] = {}
+        self.aliases: Dict[str, str] = {}
+        self.functions: Dict[str, FuncDef] = {}
+
+    def statement(self, node: Statement) -> Statement:
+        if isinstance(node, Val):
+            expr = self.expr(node.expr, ())
+            if node.name in self.once:
+                if isinstance(expr, Constant):
+                    self.constants[node.name] = expr
+                elif isinstance(expr, Identifier) and expr.name in self.once:
+                    if expr.name in self.defined:
+                        self.aliases[node.name] = expr.name
+            result = Val(node.name, expr)
+        elif isinstance(node, FuncDef):
+            body = self.expr(node.body, node.args)
+            result = FuncDef(node.name, list(node.args), body)
+            if (
+                node.name in self.once
+                and node.name not in node.args
+                and size(body) <= INLINE_SIZE
+                and all(name != node.name for name, _ in names(body))
+            ):
+                self.functions[node.name] = result
+        else:
+            raise TypeError(f"Can't optimize {node!r}")
+        self.defined.add(node.name)
+        return result
+
+    def global_name(self, name: str) -> str:
+        return self.aliases.get(name, name)
+
+    def expr(self, node: Node, params: Sequence[str], depth: int = 0) -> Node:
+        "Return node optimized, node itself when nothing changed"
+        kind = type(node)
+        if kind is Identifier:
+            if node.name in params:
+                return node
+            name = self.global_name(node.name)
+            if name in self.constants:
+                return self.constants[name]
+            return node if name == node.name else Identifier(name)
+        if kind is Constant:
+            return node
+        if kind in BINOPS:
+            leaf, chain = left_chain(node)
+            arg1 = self.expr(leaf, params, depth)
+            for node in chain:
+                arg2 = self.expr(node.arg2, params, depth)
+                if type(arg1) is Constant and type(arg2) is Constant:
+                    arg1 = fold(node, arg1, arg2)
+                elif arg1 is node.arg1 and arg2 is node.arg2:
+                    arg1 = node
+                else:
+                    arg1 = _binop(node, arg1, arg2)
+            return arg1
+        if kind is IfExpr:
+            cond = self.expr(node.cond, params, depth)
+            if type(cond) is Constant:
+                branch = node.body if cond.value.value else node.elsebody
+                return self.expr(branch, params, depth)
+            body = self.expr(node.body, params, depth)
+            elsebody = self.expr(node.elsebody, params, depth)
+            if cond is node.cond and body is node.body and elsebody is node.elsebody:
+                return node
+            return IfExpr(cond, body, elsebody)
+        if kind is FunCall:
+            args = [self.expr(arg, params, depth) for arg in node.args]
+            name = node.name if node.name in params else self.global_name(node.name)
+            fun = self.functions.get(name) if name not in params else None
+            if fun and depth < INLINE_DEPTH and self.inlinable(fun, args, params):
+                body = substitute(fun.body, dict(zip(fun.args, args)))
+                return self.expr(body, params, depth + 1)
+            if name == node.name and all(map(operator.is_, args, node.args)):
+                return node
+            return FunCall(name, args)
+        raise TypeError(f"Can't optimize {node!r}")
+
+    def inlinable(self, fun: FuncDef, args: List[Node], params: Sequence[str]) -> bool:
+        """Whether the call of fun with args can be replaced by its body
+        in a scope binding params
+
+        The arguments must be evaluated as often and in the same order as
+        in the call: either they are constants or bound names, or their
+        parameter is used exactly once outside of an if branch, and the
+        body uses these parameters in their order. The globals the body
+        uses must not be shadowed by params.
+        """
+        if len(args) != len(fun.args):
+            return False
+        uses: Dict[str, List[bool]] = {}
+        order = []
+        for name, strict in names(fun.body):
+            if name in fun.args:
+                uses.setdefault(name, []).append(strict)
+                order.append(name)
+            elif name in params:
+                return False
+        nontrivial = [
+            param
+            for param, arg in zip(fun.args, args)
+            if not isinstance(arg, (Constant, Identifier))
+        ]
+        if [name for name in order if name in nontrivial] != nontrivial:
+            return False
+        heads = {n.name for n in _calls(fun.body)}
+        for param, arg in zip(fun.args, args):
+            if param in heads and not isinstance(arg, Identifier):
+                return False
+            if uses.get(param) == [True] or isinstance(arg, Constant):
+                continue
+            if not isinstance(arg, Identifier):
+                return False
+            if arg.name not in params and arg.name not in self.defined:
+                return False
+        return True
+
+
+def _calls(node: Node) -> Iterator[FunCall]:
+    if isinstance(node, FunCall):
+        yield node
+        for arg in node.args:
+            yield from _calls(arg)
+    elif isinstance(node, BinOp):
+        leaf, chain = left_chain(node)
+        yield from _calls(leaf)
+        for n in chain:
+            yield from _calls(n.arg2)
+    elif isinstance(node, IfExpr):
+        for child in (node.cond, node.body, node.elsebody):
+            yield from _calls(child)
+
+
+def optimize(statements: Sequence[Statement]) -> List[Statement]:
+    """Return the optimized statements of a module
+
+    The result shares the subtrees left unchanged with statements, which
+    should not be evaluated afterwards: evaluating a tree resolves its
+    names in place."""
+    optimizer = Optimizer(statements)
+    result = [optimizer.statement(statement) for statement in statements]
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("optimized module:\n%s", dump(result))
+    return result
+
+
+def _constant(value, type) -> str:
+    if type is bool:
+        return "true" if value else "false"
+    if type is str:
+        return f'"{value}"'
+    # pyml has no negative literals
+    return f"(0 - {-value})" if value < 0 else str(value)
+
+
+def _expr(node: Node, power: int = 0) -> str:
+    "Source of node, parenthesized to bind tighter than power"
+    if isinstance(node, Constant):
+        return _constant(node.value.value, node.value.type)
+    if isinstance(node, Identifier):
+        return node.name
+    if isinstance(node, BinOp):
+        leaf, chain = left_chain(node)
+        # The power of the operand each node of the chain is
+        powers = [BINDING[n.op.name] - 1 for n in chain[1:]] + [power]
+        text = _expr(leaf, BINDING[chain[0].op.name] - 1)
+        for n, outer in zip(chain, powers):
+            binding = BINDING[n.op.name]
+            text = f"{text} {n.op.name} {_expr(n.arg2, binding)}"
+            if binding <= outer:
+                text = f"({text})"
+        return text
+    if isinstance(node, IfExpr):
+        return f"if {_expr(node.cond)} then {_expr(node.body)} else {_expr(node.elsebody)} end"
+    if isinstance(node, FunCall):
+        args = (
+            _expr(arg) if isinstance(arg, (Constant, Identifier)) else f"({_expr(arg)})"
+            for arg in node.args
+        )
+        return " ".join((node.name, *args))
+    raise TypeError(f"Can't dump {node!r}")
+
+
+def dump(statements: Sequence[Statement]) -> str:
+    "Return the source of statements, one per line"
+    lines = []
+    for statement in statements:
+        if isinstance(statement, Val):
+            lines.append(f"val {statement.name} = {_expr(statement.expr)};")
+        else:
+            params = " ".join(statement.args)
+            lines.append(f"fun {statement.name} {params} = {_expr(statement.body)};")
+    return "\n".join(lines)
+
+
+def main(argv: List[str]):
+    with open(argv[0]) if argv else sys.stdin as f:
+        statements = parse(f.read())
+    optimized = optimize(statements)
+    print(dump(optimized))
+    before, after = sum(map(size, statements)), sum(map(size, optimized))
+    print(f"# {before} nodes, {after} after optimizing", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
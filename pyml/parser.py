@@ -0,0 +1,213 @@
+"""Hand written pyml parser.
+
+A regular expression tokenizer feeds a Pratt (precedence climbing)
+parser that builds the same nodes as the pyparsing grammar in
+`pyml.lang.BNF`. It does not backtrack, so it parses in time linear in
+the source size:
+
+>>> from pyml.parser import parse
+>>> parse("val x = f 1 + 2 * 3;")
+[Val(name='x', expr=BinOp(op=Identifier(name='+'), arg1=FunCall(name='f', args=[Constant(value=1:int)]), arg2=BinOp(op=Identifier(name='*'), arg1=Constant(value=2:int), arg2=Constant(value=3:int))))]
+
+Tokens never span lines, so the tokenizer works on any iterable of
+lines, e.g. an open file, and `statements` yields every statement as
+soon as it is parsed.
+"""
+
+import re
+from typing import Iterable, Iterator, List, NamedTuple, Optional
+
+from pyml.lang import (
+    BinOp,
+    BoolOp,
+    Constant,
+    FuncDef,
+    FunCall,
+    Identifier,
+    IfExpr,
+    Node,
+    Statement,
+    Val,
+)
+
+TOKEN = re.compile(
+    r"""
+    (?P<skip>\s+|\#.*)
+  | (?P<int>\d+)
+  | (?P<string>"(?:[^"\n\r\\]|(?:"")|(?:\\(?:[^x]|x[0-9a-fA-F]+)))*")
+  | (?P<name>[A-Za-z_]+)
+  | (?P<op>==|!=|>=|<=|[-+*/%<>=;()])
+  | (?P<error>.)
+    """,
+    re.VERBOSE,
+)
+
+KEYWORDS = frozenset(("if", "then", "else", "end", "val", "fun", "true", "false"))
+
+# Binding power of the infix operators, all of them are left associative
+# fmt: off
+BINDING = {
+    "==": 1, "!=": 1, ">": 1, "<": 1, ">=": 1, "<=": 1,
+    "+": 2, "-": 2,
+    "*": 3, "/": 3, "%": 3,
+}
+# fmt: on
+
+# Tokens an atom, and so a function argument, starts with
+ATOM = frozenset(("int", "string", "name", "true", "false", "("))
+
+
+class Token(NamedTuple):
+    kind: str  # int, string, name, a keyword or an operator
+    text: str
+    line: int
+    column: int
+
+
+EOF = Token("eof", "", 0, 0)
+
+
+def tokenize(lines: Iterable[str]) -> Iterator[Token]:
+    "Yield the tokens of lines, skipping blanks and comments"
+    for lineno, line in enumerate(lines, 1):
+        for match in TOKEN.finditer(line):
+            kind = match.lastgroup
+            if kind == "skip":
+                continue
+            text = match.group()
+            if kind == "error":
+                raise SyntaxError(f"{lineno}:{match.start() + 1}: unexpected {text!r}")
+            if kind == "op" or kind == "name" and text in KEYWORDS:
+                kind = text
+            yield Token(kind, text, lineno, match.start() + 1)
+
+
+class Parser:
+    "Parse a token stream, one statement at a time"
+
+    def __init__(self, tokens: Iterator[Token]):
+        self.tokens = tokens
+        self.token = next(tokens, EOF)
+        # Whether self.token is the ";" ending the last statement, read
+        # past it only when the next statement is asked for so that no
+        # more input than needed is consumed
+        self.ended = False
+
+    def advance(self) -> Token:
+        token = self.token
+        self.token = next(self.tokens, EOF)
+        return token
+
+    def expect(self, kind: str) -> Token:
+        if self.token.kind != kind:
+            self.error(repr(kind))
+        return self.advance()
+
+    def end(self):
+        if self.token.kind != ";":
+            self.error("';'")
+        self.ended = True
+
+    def error(self, expected: str):
+        token = self.token
+        found = repr(token.text) if token is not EOF else "end of input"
+        raise SyntaxError(f"{token.line}:{token.column}: expected {expected}, found {found}")
+
+    def statement(self) -> Optional[Statement]:
+        "Parse the next statement, None at the end of input"
+        if self.ended:
+            self.advance()
+            self.ended = False
+        kind = self.token.kind
+        if kind == "eof":
+            return None
+        if kind == "val":
+            self.advance()
+            name = self.expect("name").text
+            self.expect("=")
+            expr = self.expr()
+            self.end()
+            return Val(name, expr)
+        if kind == "fun":
+            self.advance()
+            name = self.expect("name").text
+            args = []
+            while self.token.kind == "name":
+                args.append(self.advance().text)
+            self.expect("=")
+            body = self.expr()
+            self.end()
+            return FuncDef(name, args, body)
+        self.error("'val' or 'fun'")
+
+    def expr(self, power: int = 0) -> Node:
+        "Parse infix operators binding tighter than power"
+        left = self.operand()
+        while True:
+            op = self.token.kind
+            binding = BINDING.get(op)
+            if binding is None or binding <= power:
+                return left
+            self.advance()
+            right = self.expr(binding)
+            left = (BoolOp if binding == 1 else BinOp)(op, left, right)
+
+    def operand(self) -> Node:
+        kind = self.token.kind
+        if kind == "if":
+            self.advance()
+            cond = self.expr()
+            self.expect("then")
+            body = self.expr()
+            self.expect("else")
+            elsebody = self.expr()
+            self.expect("end")
+            return IfExpr(cond, body, elsebody)
+        if kind == "name":
+            name = self.advance().text
+            if self.token.kind not in ATOM:
+                return Identifier(name)
+            args = []
+            while self.token.kind in ATOM:
+                args.append(self.atom())
+            return FunCall(name, args)
+        return self.atom()
+
+    def atom(self) -> Node:
+        token = self.token
+        kind = token.kind
+        if kind == "int":
+            self.advance()
+            return Constant(int(token.text), int)
+        if kind == "string":
+            self.advance()
+            return Constant(token.text[1:-1], str)
+        if kind == "true" or kind == "false":
+            self.advance()
+            return Constant(kind == "true", bool)
+        if kind == "name":
+            self.advance()
+            return Identifier(token.text)
+        if kind == "(":
+            self.advance()
+            expr = self.expr()
+            self.expect(")")
+            return expr
+        self.error("an expression")
+
+
+def statements(lines: Iterable[str]) -> Iterator[Statement]:
+    "Yield the statements of lines as they are parsed"
+    parser = Parser(tokenize(lines))
+    statement = parser.statement()
+    while statement is not None:
+        yield statement
+        statement = parser.statement()
+
+
+def parse(source: str) -> List[Statement]:
+    "Parse a pyml module to a list of statements"
+    result = list(statements(source.splitlines()))
+    if not result:
+        raise SyntaxError("1:1: expected 'val' or 'fun', found end of input")
+    return result
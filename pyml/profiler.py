@@ -0,0 +1,244 @@
+"""Profile pyml evaluation.
+
+While a `Profiler` is active, the interpreter evaluates every node
+through an instrumented copy of `pyml.lang.execute`. It counts how many
+nodes of each type are evaluated and the time spent on them, how many
+times each function is called and the time spent in it, and the time
+spent in every stack of function calls:
+
+>>> from pyml import lang
+>>> from pyml.profiler import Profiler
+>>> with Profiler() as profiler:
+...     _ = lang.run("fun f a = a * 2; val x = f 1 + f 2;", optimize=False)
+>>> profiler.nodes["FunCall"][0], profiler.functions["f"][0]
+(2, 2)
+>>> sorted(profiler.stacks)
+[('<module>',), ('<module>', 'f')]
+
+`report()` formats the counts as a table and `collapsed()` the stacks
+in the format of flamegraph.pl and speedscope. Node times are self
+times, the time spent evaluating the node itself, so they add up to the
+total. Function times include the functions they call. A tail call
+replaces the caller on the stack, as it does in the interpreter.
+
+When no Profiler is active the interpreter runs its plain loop, so
+profiling costs nothing. Only the interpreter is profiled, compiled
+modules are Python code, see cProfile.
+"""
+
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+from pyml import lang
+from pyml.lang import (
+    _APPLY,
+    _ARG1,
+    _ARG2,
+    _ARGS,
+    _IF,
+    Closure,
+    Constant,
+    FunCall,
+    Identifier,
+    IfExpr,
+    Node,
+    Partial,
+    _enter,
+)
+
+# The continuation ending a function call
+_RETURN = _APPLY + 1
+
+ROOT = "<module>"
+
+
+def _name(func: lang.Value) -> Optional[str]:
+    "The name of the function value func, None if it is not one"
+    f = func.value
+    if type(f) is Partial:
+        f = f.func
+    return f.func.name if type(f) is Closure else None
+
+
+class Profiler:
+    """Collect evaluation statistics while active, use it as a context
+    manager or call start() and stop()
+
+    `nodes` maps node type names and `functions` function names to
+    [count, seconds] pairs, `stacks` maps tuples of function names, the
+    outermost first, to the seconds spent in the last one.
+
+    Stacks are numbered as they are first seen, a stack being its number
+    in `ids`, keyed by (number of the stack without its last function,
+    last function), so that calls and returns take constant time however
+    deep the recursion.
+    """
+
+    def __init__(self, clock=time.perf_counter):
+        self.clock = clock
+        self.nodes: Dict[str, List] = defaultdict(lambda: [0, 0.0])
+        self.functions: Dict[str, List] = defaultdict(lambda: [0, 0.0])
+        self.ids: Dict[Tuple[int, str], int] = {(-1, ROOT): 0}
+        self.parents: List[Tuple[int, str]] = [(-1, ROOT)]
+        self.times: List[float] = [0.0]
+        # The numbers of the stack and of its prefixes
+        self.path: List[int] = [0]
+        # Activations of each function, only the outermost one of a
+        # recursive function counts its time
+        self.active: Dict[str, int] = defaultdict(int)
+        self.saved = None
+
+    def start(self):
+        if self.saved is not None:
+            raise RuntimeError("Profiler already started")
+        self.saved = lang.execute
+        lang.execute = self.execute
+
+    def stop(self):
+        if self.saved is None:
+            raise RuntimeError("Profiler not started")
+        lang.execute, self.saved = self.saved, None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    @property
+    def stacks(self) -> Dict[Tuple[str, ...], float]:
+        result = {}
+        names: List[Tuple[str, ...]] = []
+        for parent, name in self.parents:
+            names.append((names[parent] if parent >= 0 else ()) + (name,))
+        for i, seconds in enumerate(self.times):
+            if seconds:
+                result[names[i]] = seconds
+        return result
+
+    def call(self, name: str, now: float):
+        key = (self.path[-1], name)
+        id = self.ids.get(key)
+        if id is None:
+            id = self.ids[key] = len(self.parents)
+            self.parents.append(key)
+            self.times.append(0.0)
+        self.path.append(id)
+        self.functions[name][0] += 1
+        self.active[name] += 1
+        return (_RETURN, name, now)
+
+    def ret(self, k: tuple, now: float):
+        name = k[1]
+        self.path.pop()
+        self.active[name] -= 1
+        if not self.active[name]:
+            self.functions[name][1] += now - k[2]
+
+    def execute(self, node: Optional[Node], frame, stack=None, value=None):
+        "lang.execute, counting and timing every step"
+        if stack is None:
+            stack = []
+        nodes, times, path, clock = self.nodes, self.times, self.path, self.clock
+        last = clock()
+        base = len(path)
+        try:
+            while True:
+                if node is not None:
+                    kind = type(node)
+                    stats = nodes[kind.__name__]
+                    stats[0] += 1
+                    if kind is Constant or kind is Identifier:
+                        value = node.eval(frame)
+                        node = None
+                    elif kind is FunCall:
+                        func = node.lookup(frame)
+                        stack.append((_ARGS, node, frame, func, []))
+                        node = node.args[0]
+                    elif kind is IfExpr:
+                        stack.append((_IF, node, frame))
+                        node = node.cond
+                    else:
+                        stack.append((_ARG1, node, frame))
+                        node = node.arg1
+                    now = clock()
+                    stats[1] += now - last
+                    times[path[-1]] += now - last
+                    last = now
+                    continue
+                if not stack:
+                    return value
+                k = stack.pop()
+                kind = k[0]
+                if kind == _RETURN:
+                    now = clock()
+                    times[path[-1]] += now - last
+                    self.ret(k, now)
+                    last = now
+                    continue
+                if kind == _IF:
+                    node, frame = k[1].body if value.value else k[1].elsebody, k[2]
+                    stats = nodes["IfExpr"]
+                elif kind == _ARG1:
+                    stack.append((_ARG2, k[1], value))
+                    node, frame = k[1].arg2, k[2]
+                    stats = nodes[type(k[1]).__name__]
+                elif kind == _ARG2:
+                    value = k[1].operate(k[2], value)
+                    stats = nodes[type(k[1]).__name__]
+                else:
+                    stats = nodes["FunCall"]
+                    if kind == _ARGS:
+                        args = k[4]
+                        args.append(value)
+                        if len(args) < len(k[1].args):
+                            stack.append(k)
+                            node, frame = k[1].args[len(args)], k[2]
+                            func = None
+                        else:
+                            func = k[3]
+                    else:
+                        func, args = value, k[1]
+                    if func is not None:
+                        now = clock()
+                        stats[1] += now - last
+                        times[path[-1]] += now - last
+                        last = now
+                        if stack and stack[-1][0] == _RETURN:
+                            # A tail call replaces the caller
+                            self.ret(stack.pop(), now)
+                        node, frame, value = _enter(func, args, stack)
+                        if node is not None:
+                            stack.append(self.call(_name(func), now))
+                        continue
+                now = clock()
+                stats[1] += now - last
+                times[path[-1]] += now - last
+                last = now
+        finally:
+            # Unwind the calls an error left open
+            now = clock()
+            for k in reversed(stack):
+                if k[0] == _RETURN:
+                    self.ret(k, now)
+            del path[base:]
+
+    def report(self) -> str:
+        "The node and function statistics as a text table"
+        lines = [f"{'node':<24} {'count':>10} {'seconds':>12}"]
+        for name, (count, seconds) in sorted(self.nodes.items(), key=lambda i: -i[1][1]):
+            lines.append(f"{name:<24} {count:>10} {seconds:>12.6f}")
+        lines.append("")
+        lines.append(f"{'function':<24} {'calls':>10} {'seconds':>12}")
+        for name, (count, seconds) in sorted(self.functions.items(), key=lambda i: -i[1][1]):
+            lines.append(f"{name:<24} {count:>10} {seconds:>12.6f}")
+        return "\n".join(lines)
+
+    def collapsed(self) -> str:
+        "The stacks as `f;g;h microseconds` lines, for flame graph tools"
+        return "\n".join(
+            f"{';'.join(stack)} {round(seconds * 1e6)}"
+            for stack, seconds in sorted(self.stacks.items())
+        )
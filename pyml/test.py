@@ -0,0 +1,490 @@
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import unittest
+
+from . import cache, compiler, infer, lang, optimize, profiler
+from .lang import parse, run, BinOp, BoolOp, Constant, FunCall, IfExpr
+
+
+PROGRAMS = [
+    "val a = 1 + 2 * 3 - 1; val b = 10 - 3 - 2; val c = (1 + 2) * 3;",
+    "val a = 7 / 2; val b = 7 % 2; val c = 1 < 2; val d = 2 == 3;",
+    'val s = "foo" + "bar"; val t = "a" < "b"; val u = true;',
+    "val foo = 10; val zar = foo; fun add a b = a + b; val x = add foo zar;",
+    "fun f x y = if x > y then x - y else y - x end; val a = f 3 10;",
+    "fun f x y = x * 10 + y; val p = f 1; val q = p 2; fun g h = h 3; val r = g p;",
+    "fun f a = a * 2; fun g a = f (f a) + 1; val r = g 5;",
+    "val x = if 1 < 2 then 1 else 2 end + 1;",
+    "fun fact n = if n == 0 then 1 else n * fact (n - 1) end; val x = fact 20;",
+    "fun even n = if n == 0 then true else odd (n - 1) end;"
+    " fun odd n = if n == 0 then false else even (n - 1) end; val x = even 31;",
+    "val a = 1; fun f a = a + 1; val b = f 10 + a; val a = 5; val c = f a;",
+]
+
+
+def tree(node):
+    "Nested tuples describing a parsed node, to compare trees"
+    if isinstance(node, lang.Node):
+        return (type(node).__name__,) + tuple(tree(v) for v in vars(node).values())
+    if isinstance(node, list):
+        return tuple(map(tree, node))
+    if isinstance(node, lang.Value):
+        return (node.value, node.type)
+    return node
+
+
+def random_expr(rnd, depth=3):
+    "Source of a random pyml expression"
+    names = ("a", "foo", "x_y", "iffy", "endo", "Val")
+    kind = rnd.randrange(8) if depth else rnd.randrange(4)
+    if kind == 0:
+        return str(rnd.randrange(1000))
+    if kind == 1:
+        return rnd.choice(('"s"', '"a b"', '""', "true", "false"))
+    if kind in (2, 3):
+        return rnd.choice(names)
+    sub = lambda: random_expr(rnd, depth - 1)
+    if kind == 4:
+        ops = ("+", "-", "*", "/", "%", "==", "!=", "<", ">", "<=", ">=")
+        return "{} {} {}".format(sub(), rnd.choice(ops), sub())
+    if kind == 5:
+        return "if {} then {} else {} end".format(sub(), sub(), sub())
+    if kind == 6:
+        args = [random_expr(rnd, 0) if rnd.random() < 0.5 else "(" + sub() + ")"
+                for _ in range(rnd.randrange(1, 4))]
+        return rnd.choice(names) + " " + " ".join(args)
+    return "(" + sub() + ")"
+
+
+def random_program_expr(rnd, values, functions, depth=3):
+    """Source of a random int expression using the names in values and
+    calling the functions, a dict of their arities"""
+    kind = rnd.randrange(7) if depth else rnd.randrange(3)
+    if kind == 0:
+        return str(rnd.randrange(9))
+    if kind == 1:
+        return rnd.choice(("true", '"s"')) if rnd.random() < 0.05 else str(rnd.randrange(4))
+    sub = lambda: random_program_expr(rnd, values, functions, depth - 1)
+    if kind == 2 or kind == 6 and not functions:
+        return rnd.choice(values) if values else "1"
+    if kind in (3, 4):
+        return "({} {} {})".format(sub(), rnd.choice("++--**/%"), sub())
+    if kind == 5:
+        return "if {} {} {} then {} else {} end".format(
+            sub(), rnd.choice(("<", "==")), sub(), sub(), sub())
+    name = rnd.choice(sorted(functions))
+    return " ".join([name] + ["(" + sub() + ")" for _ in range(functions[name])])
+
+
+def random_program(rnd):
+    "Source of a random module of vals, some of them rebound, and funs"
+    lines, values, functions = [], [], {}
+    for name in "abcdefghij":
+        if rnd.random() < 0.3:
+            # Funs only call the ones before them, so programs terminate
+            params = rnd.sample("xyz", rnd.randrange(1, 3))
+            body = random_program_expr(rnd, values + params, functions)
+            lines.append("fun {} {} = {};".format(name, " ".join(params), body))
+            functions[name] = len(params)
+        else:
+            name = rnd.choice(values + [name])
+            lines.append("val {} = {};".format(name, random_program_expr(rnd, values, functions)))
+            if name not in values:
+                values.append(name)
+    return " ".join(lines)
+
+
+class Test(unittest.TestCase):
+    def test_parse(self):
+        ae = self.assertEqual
+
+        (val,) = parse("val x = 1 + 2 * 3;")
+        ae(val.name, "x")
+        self.assertIsInstance(val.expr, BinOp)
+        ae(val.expr.op.name, "+")
+        ae(val.expr.arg2.op.name, "*")
+
+        (val,) = parse("val x = f 1 y + 2 == 3;")
+        self.assertIsInstance(val.expr, BoolOp)
+        call = val.expr.arg1.arg1
+        self.assertIsInstance(call, FunCall)
+        ae((call.name, len(call.args)), ("f", 2))
+
+        (fun,) = parse("# a comment\nfun f a b = if a then b else 0 end;")
+        ae(fun.args, ["a", "b"])
+        self.assertIsInstance(fun.body, IfExpr)
+
+        (val,) = parse('val s = "hi";')
+        self.assertIsInstance(val.expr, Constant)
+        ae(val.expr.value.value, "hi")
+
+    def test_parsers_agree(self):
+        rnd = random.Random(42)
+        lines = []
+        for i in range(200):
+            if rnd.random() < 0.3:
+                name = "".join(chr(97 + int(d)) for d in str(i))
+                lines.append("fun f{} a b = {};".format(name, random_expr(rnd)))
+            else:
+                lines.append("val v = {};".format(random_expr(rnd)))
+            if rnd.random() < 0.2:
+                lines.append("# a comment")
+        source = "\n".join(lines)
+        self.assertEqual(tree(parse(source, "pratt")), tree(parse(source, "pyparsing")))
+        for source in PROGRAMS:
+            self.assertEqual(tree(parse(source, "pratt")), tree(parse(source, "pyparsing")))
+
+        for source in ("", "val x = ;", "val x = 1", "val if = 1;", "fun = 1;",
+                       "val x = (1;", "val x = 1 2;", "val x = f if;", "val x = 1 $ 2;"):
+            for parser in lang.PARSERS:
+                with self.assertRaises(Exception, msg=(source, parser)):
+                    parse(source, parser)
+        with self.assertRaises(ValueError):
+            parse("val x = 1;", "lalr")
+
+    def test_interpreter(self):
+        ae = self.assertEqual
+
+        env = run(PROGRAMS[0])
+        ae((env["a"], env["b"], env["c"]), (6, 5, 9))
+        env = run(PROGRAMS[5])
+        ae((env["q"], env["r"]), (12, 13))
+        ae(env["f"](4, 2), 42)
+        ae(env["p"](3), 13)
+        with self.assertRaises(TypeError):
+            run('val x = 1 + "a";')
+        with self.assertRaises(TypeError):
+            run("val x = true + 1;")
+        with self.assertRaises(LookupError):
+            run("val x = y;")
+        with self.assertRaises(LookupError):
+            run("fun f a = g a; val x = f 1;")
+
+    def test_scopes(self):
+        ae = self.assertEqual
+
+        env = run(PROGRAMS[8])
+        ae(env["x"], 2432902008176640000)
+        env = run(PROGRAMS[9])
+        ae((env["x"], env["even"](10), env["odd"](10)), (False, True, False))
+        env = run(PROGRAMS[10])
+        ae((env["a"], env["b"], env["c"]), (5, 12, 6))
+
+        # a call chain through many functions, each frame sees its own a
+        source = "fun fa a = a + 1;" + "".join(
+            "fun f{0} a = f{1} (a * 2) + a;".format(chr(98 + i), chr(97 + i))
+            for i in range(20)
+        ) + "val x = fu 1;"
+        ae(run(source)["x"], run(source, "compiler")["x"])
+
+        statements = parse("val x = 1; fun f a b = a + b + x;")
+        module = lang.Module()
+        for statement in statements:
+            module.eval(statement)
+        body = statements[1].body
+        ae((body.arg2.depth, body.arg2.slot), (1, 1))
+        ae((body.arg1.arg2.depth, body.arg1.arg2.slot), (0, 2))
+
+    def test_engines_agree(self):
+        for source in PROGRAMS:
+            expected = run(source, "interpreter")
+            actual = run(source, "compiler")
+            self.assertEqual(expected.keys(), actual.keys(), source)
+            for name, value in expected.items():
+                if callable(value):
+                    for args in ((1,), (2, 3), (4, 5, 6)):
+                        try:
+                            result = value(*args)
+                        except TypeError:
+                            continue
+                        if not callable(result):
+                            self.assertEqual(actual[name](*args), result, source)
+                else:
+                    self.assertEqual(actual[name], value, source)
+
+        for source in ('val x = 1 + "a";', "val x = true + 1;",
+                       "fun f a = a + 1; val x = f false;"):
+            for engine in lang.ENGINES:
+                with self.assertRaises(TypeError):
+                    run(source, engine)
+
+        with self.assertRaises(ValueError):
+            run("val x = 1;", "jit")
+
+    def test_tail_calls(self):
+        sources = {
+            "fun loop n acc = if n == 0 then acc else loop (n - 1) (acc + n) end;"
+            "val x = loop 100000 0;": 5000050000,
+            "fun even n = if n == 0 then true else odd (n - 1) end;"
+            "fun odd n = if n == 0 then false else even (n - 1) end;"
+            "val x = odd 100001;": True,
+            "fun app f x = f x; fun count n = if n == 0 then 0 else app count (n - 1) end;"
+            "val x = count 100000;": 0,
+            # Not a tail call, deeper than the Python recursion limit
+            "fun sum n = if n == 0 then 0 else n + sum (n - 1) end;"
+            "val x = sum 20000;": 200010000,
+        }
+        for source, expected in sources.items():
+            for engine in lang.ENGINES:
+                self.assertEqual(run(source, engine)["x"], expected, (source, engine))
+        odd = run(list(sources)[1], "compiler")["odd"]
+        self.assertIs(odd(100001), True)
+        self.assertIn("continue", compiler.source(parse(list(sources)[0])))
+
+        # Calls made before a function is rebound see the new binding
+        rebound = "fun k x = x * 10; fun h x = x + 1; fun g x = h x + 1; fun h x = k x; val r = g 1;"
+        for engine in lang.ENGINES:
+            self.assertEqual(run(rebound, engine, typecheck=False)["r"], 11, engine)
+            statements = (statement + ";" for statement in rebound.split(";")[:-1])
+            self.assertEqual(dict(lang.stream(statements, engine))["r"], 11, engine)
+
+    def test_long_chains(self):
+        ae = self.assertEqual
+        # Left nested operator chains deeper than the Python stack
+        n = 5000
+        ones = " + ".join(["1"] * n)
+        calls = " + ".join(["f 1"] * n)
+        source = (f"fun f a = a; fun g a = {' + '.join(['a'] * n)};"
+                  f"val x = {ones}; val y = g 2 == {2 * n}; val z = {calls};")
+        for engine in lang.ENGINES:
+            for typecheck in (False, True):
+                for flag in (False, True):
+                    env = run(source, engine, typecheck=typecheck, optimize=flag)
+                    ae((env["x"], env["y"], env["z"]), (n, True, n), (engine, typecheck, flag))
+            with self.assertRaises(TypeError):
+                run(f'val x = {ones} + "a";', engine, typecheck=False)
+            bindings = dict(lang.stream([f"val x = {ones};"], engine))
+            ae(bindings["x"], n)
+        self.assertIn(f"val x = {n};", optimize.dump(optimize.optimize(parse(source))))
+        ae(optimize.dump(parse(f"val x = {ones};")), f"val x = {ones};")
+        ae(optimize.dump(parse("val x = 1 - (2 - 3) - 4 * (5 + 6);")),
+           "val x = 1 - (2 - 3) - 4 * (5 + 6);")
+
+    def test_compiler(self):
+        code = compiler.compile_module(parse("fun f a b = a + b; val x = f 1 2;"))
+        env = compiler.run(code)
+        # Deep recursion changes no process wide setting
+        limit, size = sys.getrecursionlimit(), threading.stack_size()
+        deep = "fun sum n = if n == 0 then 0 else n + sum (n - 1) end; val x = sum 20000;"
+        self.assertEqual(compiler.run(compiler.compile_module(parse(deep)))["x"], 200010000)
+        self.assertEqual((sys.getrecursionlimit(), threading.stack_size()), (limit, size))
+        self.assertEqual(env["x"], 3)
+        self.assertEqual(env["f"](2, 3), 5)
+        self.assertEqual(compiler.apply(env["f"], (1,))(2), 3)
+
+    def test_infer(self):
+        ae = self.assertEqual
+        check = lambda source: infer.check(parse(source))
+
+        types = check(PROGRAMS[5])
+        ae((types["f"], types["p"], types["g"], types["r"]),
+           ("int -> int -> int", "int -> int", "(int -> a) -> a", "int"))
+        types = check(PROGRAMS[9])
+        ae((types["even"], types["odd"]), ("int -> bool", "int -> bool"))
+        types = check("fun id x = x; val a = id 1; val b = id \"s\"; fun add a b = a + b;"
+                      "val c = add \"x\" \"y\"; fun k a b = a; val d = k true 1;")
+        ae((types["id"], types["a"], types["b"], types["c"], types["d"]),
+           ("a -> a", "int", "str", "str", "bool"))
+        ae(types["add"], "a -> a -> a")
+        ae(check("fun f a b = a == b;")["f"], "a -> a -> bool")
+
+        for source in ('val x = 1 + "a";', "val x = true + true;", 'val x = "a" * 2;',
+                       "val x = if 1 then 2 else 3 end;",
+                       'val x = if true then 1 else "a" end;',
+                       "fun f a = a + 1; val x = f false;", "fun f x = f;",
+                       "fun f a = a 1; val x = f 2;", "fun id x = x; val x = id == id;",
+                       'val a = 1; val a = "a";', "fun f = 1;", "val x = 1; val y = x 1;"):
+            with self.assertRaises(infer.TypeCheckError, msg=source):
+                check(source)
+        with self.assertRaises(LookupError):
+            check("fun f a = g a;")
+
+        # Checked operators skip the runtime operand checks
+        statements = parse("fun f a b = a + b;")
+        self.assertFalse(statements[0].body.typed)
+        infer.check(statements)
+        self.assertTrue(statements[0].body.typed)
+        self.assertNotIn("_mismatch", compiler.source(statements))
+
+        for source in PROGRAMS:
+            for engine in lang.ENGINES:
+                checked, unchecked = run(source, engine), run(source, engine, typecheck=False)
+                for name, value in checked.items():
+                    if not callable(value):
+                        ae(unchecked[name], value)
+
+    def test_optimize(self):
+        ae = self.assertEqual
+        opt = lambda source: optimize.dump(optimize.optimize(parse(source)))
+
+        ae(opt("val a = 1 + 2 * 3; val b = a; val c = b * 2; val s = \"a\" + \"b\";"),
+           'val a = 7;\nval b = 7;\nval c = 14;\nval s = "ab";')
+        ae(opt("val x = if 1 < 2 then 3 else y end;"), "val x = 3;")
+        ae(opt("fun f a b = a * 2 + b; fun g x = f x 1 - f 2 x;"),
+           "fun f a b = a * 2 + b;\nfun g x = x * 2 + 1 - (4 + x);")
+        # Not folded: failing operators, names bound twice, recursive funs,
+        # arguments an inlined body would not evaluate
+        ae(opt("val a = 1 / 0; val b = 1 + \"a\";"), 'val a = 1 / 0;\nval b = 1 + "a";')
+        ae(opt("val a = 1; fun f x = x + a; val a = 2;"),
+           "val a = 1;\nfun f x = x + a;\nval a = 2;")
+        ae(opt(PROGRAMS[8]).count("fact"), 3)
+        ae(opt("fun k a b = a; val x = k 1 (2 / 0);"), "fun k a b = a;\nval x = k 1 (2 / 0);")
+        # Nor arguments it would evaluate in another order
+        swapped = "fun loop n = loop n; fun k a b = b + a; val x = k (1 / 0) (loop 1);"
+        ae(opt(swapped).splitlines()[-1], "val x = k (1 / 0) (loop 1);")
+        for engine in lang.ENGINES:
+            with self.assertRaises(ZeroDivisionError):
+                run(swapped, engine, typecheck=False)
+        # Inlining never captures names
+        ae(opt("val y = 1; val z = y; fun g x = x + w; fun h w = g w;"),
+           "val y = 1;\nval z = 1;\nfun g x = x + w;\nfun h w = g w;")
+
+        statements = parse(PROGRAMS[0] + PROGRAMS[3] + PROGRAMS[7])
+        optimized = optimize.optimize(statements)
+        self.assertLess(sum(map(optimize.size, optimized)), sum(map(optimize.size, statements)) / 2)
+        ae(tree(parse(optimize.dump(optimized))), tree(optimized))
+        ae(tree(statements), tree(parse(PROGRAMS[0] + PROGRAMS[3] + PROGRAMS[7])))
+
+        # The optimizer changes no result nor error, on both engines
+        rnd = random.Random(19)
+        sources = list(PROGRAMS)
+        sources += [random_program(rnd) for _ in range(200)]
+        for source in sources:
+            for engine in lang.ENGINES:
+                results = []
+                for flag in (False, True):
+                    try:
+                        env = run(source, engine, typecheck=False, optimize=flag)
+                    except Exception as e:
+                        results.append(type(e))
+                    else:
+                        results.append({k: v for k, v in env.items() if not callable(v)})
+                ae(results[0], results[1], (source, engine))
+
+    def test_stream(self):
+        ae = self.assertEqual
+        for source in PROGRAMS:
+            for engine in lang.ENGINES:
+                expected = run(source, engine)
+                bindings = dict(lang.stream(source.splitlines(True), engine))
+                ae(expected.keys(), bindings.keys())
+                for name, value in expected.items():
+                    if not callable(value):
+                        ae(bindings[name], value, (source, engine))
+
+        # Every statement runs before the next line is read
+        def lines(results):
+            yield "val a = 1 + 2;"
+            ae(results, [("a", 3)])
+            yield "fun f x = x * a; val b ="
+            yield " f 2;"
+            ae(results[-1], ("b", 6))
+            yield "val b = 1 + true;"
+
+        for engine in lang.ENGINES:
+            results = []
+            with self.assertRaises(infer.TypeCheckError):
+                for binding in lang.stream(lines(results), engine):
+                    results.append(binding)
+            ae(len(results), 3)
+            with self.assertRaises(LookupError):
+                list(lang.stream(["fun f x = g x;"], engine))
+
+        # Streaming keeps no temporaries of the statements it ran
+        program = compiler.Program()
+        for i in range(100):
+            program.eval(parse(f"val x = (1 + {i}) * (2 + {i});")[0])
+            if i == 0:
+                size = len(program.namespace)
+        ae(len(program.namespace), size)
+        ae(program.namespace["g_x"], 100 * 101)
+
+        out = subprocess.run([sys.executable, "-m", "pyml", "--engine", "compiler"],
+                             input="val a = 1;\nfun f x = x;\nval s = \"a\" + \"b\";\nval e = 1 / 0;\n",
+                             capture_output=True, text=True,
+                             cwd=os.path.dirname(os.path.dirname(__file__)))
+        ae(out.stdout, "a = 1\nf = <fun>\ns = 'ab'\n")
+        ae((out.returncode, out.stderr.splitlines()[-1]), (1, "error: integer division or modulo by zero"))
+
+    def test_profiler(self):
+        ae = self.assertEqual
+        execute = lang.execute
+        source = ("fun sum n = if n == 0 then 0 else n + sum (n - 1) end;"
+                  "fun loop n = if n == 0 then sum 3 else loop (n - 1) end; val x = loop 100;")
+        with profiler.Profiler() as p:
+            ae(run(source, optimize=False)["x"], 6)
+        self.assertIs(lang.execute, execute)
+        ae(p.functions["loop"][0], 101)
+        ae(p.functions["sum"][0], 4)
+        ae(p.nodes["FunCall"][0], 105)
+        ae((p.nodes["IfExpr"][0], p.nodes["BoolOp"][0]), (105, 105))
+        # Tail calls replace the caller, other calls stack up
+        ae(sorted(p.stacks), [("<module>",), ("<module>", "loop")] +
+           [("<module>",) + ("sum",) * n for n in range(1, 5)])
+        total = sum(seconds for _, seconds in p.nodes.values())
+        self.assertAlmostEqual(total, sum(p.stacks.values()), delta=total / 10)
+        self.assertGreaterEqual(p.functions["loop"][1], p.functions["sum"][1])
+        lines = p.collapsed().splitlines()
+        ae(lines[-1].split()[0], "<module>;sum;sum;sum;sum")
+        self.assertTrue(all(line.rsplit(" ", 1)[1].isdigit() for line in lines))
+        self.assertIn("loop", p.report())
+
+        # Errors leave the profiler consistent
+        with profiler.Profiler() as p:
+            with self.assertRaises(ZeroDivisionError):
+                run("fun g a = a / 0; fun f a = 1 + g a; val x = f 1;", optimize=False)
+            ae(p.path, [0])
+            ae(run("fun f a = a * 2; val x = f 1;", optimize=False)["x"], 2)
+        ae((p.functions["f"][0], p.functions["g"][0]), (2, 1))
+        self.assertIs(lang.execute, execute)
+
+        # Stopping twice or before starting keeps the engine working
+        with self.assertRaises(RuntimeError):
+            p.stop()
+        with self.assertRaises(RuntimeError):
+            profiler.Profiler().stop()
+        self.assertIs(lang.execute, execute)
+
+    def test_cache(self):
+        ae = self.assertEqual
+        source = PROGRAMS[5]
+
+        with tempfile.TemporaryDirectory() as directory:
+            modules = cache.ModuleCache(directory)
+            for engine in lang.ENGINES:
+                expected = run(source, engine)
+                for _ in range(2):
+                    env = run(source, engine, cache=modules)
+                    ae((env["q"], env["r"]), (expected["q"], expected["r"]))
+            # parse miss, parse hit, code miss (parses from the cache), code hit
+            ae((modules.hits, modules.misses), (3, 2))
+            ae(len(os.listdir(directory)), 2)
+
+            # A new process loads from the cache
+            ae(cache.ModuleCache(directory).parse(source)[0].name, "f")
+
+            # Broken entries are rebuilt
+            with open(modules.path(source, "parse"), "wb") as f:
+                f.write(b"garbage")
+            ae(len(modules.parse(source)), 5)
+            ae(modules.misses, 3)
+
+            modules.clear()
+            ae(os.listdir(directory), [])
+
+    def test_import(self):
+        # Importing builds no grammar, loads no pyparsing and configures
+        # no logging
+        code = ("import logging, sys, pyml.lang; print('pyparsing' in sys.modules,"
+                " logging.getLogger('pyml').getEffectiveLevel() == logging.WARNING)")
+        out = subprocess.run([sys.executable, "-c", code], capture_output=True,
+                             text=True, check=True, cwd=os.path.dirname(os.path.dirname(__file__)))
+        self.assertEqual((out.stdout, out.stderr), ("False True\n", ""))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,16 +1,15 @@
 import logging
 
+# Silent unless the application configures logging, see enable_logging
 logger = logging.getLogger("pyml")
-logger.setLevel(logging.DEBUG)
-console_handler = logging.StreamHandler()
-formatter = logging.Formatter("==> %(levelname)s: %(message)s")
-console_handler.setFormatter(formatter)
-logger.addHandler(console_handler)
+logger.addHandler(logging.NullHandler())
 
 
-class classproperty:
-    def __init__(self, getter):
-        self.getter = getter
+def enable_logging(level: int = logging.DEBUG) -> logging.Handler:
+    "Print the pyml log records of level and above to stderr"
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter("==> %(levelname)s: %(message)s"))
+    logger.addHandler(handler)
+    logger.setLevel(level)
+    return handler
 
-    def __get__(self, obj, klass):
-        return self.getter(klass)
@@ -1,8 +1,37 @@
+r"""SKI combinators, as curried Python functions and as a graph reducer.
+
+`S`, `K` and `I` below are eager Python functions: `S x y z` evaluates
+`z` twice and nests Python calls. The graph reducer instead works on
+terms built from `App` nodes and reduces them lazily, overwriting every
+reduced redex with its result so shared subterms are reduced once, with
+an explicit spine stack instead of Python recursion:
+
+>>> reducer = Reducer()
+>>> show(reducer.normalize(term("S K K x")))
+'x'
+>>> reducer.steps, reducer.allocations
+(2, 2)
+>>> reducer.church(term(r"(\m n. n m) 2 16", numerals=True))
+65536
+
+`compile` translates lambda terms to combinators by bracket abstraction
+with Turner's B and C optimizations:
+
+>>> show(graph(compile(parse(r"\f g x. f (g x)"))))
+'B'
+"""
+
 from functools import wraps, partial, update_wrapper
+from inspect import signature
+import re
+import sys
+from typing import Dict, List, NamedTuple, Optional, Union
 
 
 class namedpartial:
     def __init__(self, func, *args):
+        if isinstance(func, namedpartial):
+            func, args = func.partial.func, func.partial.args + args
         self.func = func
         self.partial = partial(func, *args)
 
@@ -13,20 +42,28 @@ class namedpartial:
         return f"{self.partial.func.__name__} {' '.join(map(str, self.partial.args))}"
 
 
+def arity(func):
+    "Number of required positional parameters of func"
+    return sum(
+        1
+        for p in signature(func).parameters.values()
+        if p.kind in (p.POSITIONAL_ONLY, p.POSITIONAL_OR_KEYWORD)
+        and p.default is p.empty
+    )
+
+
 class curry:
-    def __init__(self, func):
+    def __init__(self, func, arity_=None):
         self.func = func
+        self.arity = arity(func) if arity_ is None else arity_
 
     def __call__(self, *args):
-        try:
-            return self.func(*args)
-        except TypeError as e:
-            if "required positional argument" in str(e):
-                return namedpartial(self.func, *args)
-            raise e
+        if len(args) < self.arity:
+            return curry(namedpartial(self.func, *args), self.arity - len(args))
+        return self.func(*args)
 
     def __repr__(self):
-        return self.func.__name__
+        return getattr(self.func, "__name__", None) or repr(self.func)
 
 
 @curry
@@ -46,4 +83,345 @@ def S(x, y, z):
     return xz(yz)
 
 
-print(S(K, S, K))
+class Atom:
+    "A combinator taking `arity` arguments, or a free variable (arity 0)"
+
+    __slots__ = ("name", "arity")
+
+    def __init__(self, name: str, arity: int = 0):
+        self.name = name
+        self.arity = arity
+
+    def __repr__(self):
+        return self.name
+
+
+class App:
+    """The application of fun to arg, a node of the graph
+
+    A redex reduced to another node becomes an indirection to it: fun is
+    None and arg is the node.
+    """
+
+    __slots__ = ("fun", "arg")
+
+    def __init__(self, fun, arg):
+        self.fun = fun
+        self.arg = arg
+
+
+Graph = Union[Atom, App]
+
+COMBINATORS: Dict[str, Atom] = {
+    name: Atom(name, arity)
+    for name, arity in (("S", 3), ("K", 2), ("I", 1), ("B", 3), ("C", 3))
+}
+
+
+class Reducer:
+    """Reduce graphs in place, counting `steps`, the combinator
+    reductions, and `allocations`, the nodes the reductions created.
+    With a `limit`, RuntimeError is raised once more steps than that were
+    made, for terms without a normal form"""
+
+    def __init__(self, limit: Optional[int] = None):
+        self.steps = 0
+        self.allocations = 0
+        self.limit = limit
+
+    def whnf(self, node: Graph) -> Graph:
+        "Reduce node to weak head normal form, return it"
+        spine: List[App] = []
+        steps = allocations = 0
+        budget = float("inf") if self.limit is None else self.limit - self.steps
+        while True:
+            # Unwind the spine down to the head, skipping indirections
+            while type(node) is App:
+                fun = node.fun
+                if fun is None:
+                    node = node.arg
+                    if spine:
+                        spine[-1].fun = node
+                    continue
+                spine.append(node)
+                node = fun
+            arity = node.arity
+            if not arity or len(spine) < arity:
+                break
+            name = node.name
+            steps += 1
+            if steps > budget:
+                self.steps += steps - 1
+                self.allocations += allocations
+                raise RuntimeError(f"No normal form within {self.limit} steps")
+            if name == "I":
+                root = spine.pop()
+                node = root.arg
+                root.fun = None
+                if spine:
+                    spine[-1].fun = node
+            elif name == "K":
+                x = spine.pop().arg
+                root = spine.pop()
+                root.fun, root.arg = None, x
+                node = x
+                if spine:
+                    spine[-1].fun = node
+            else:
+                f = spine.pop().arg
+                g = spine.pop().arg
+                root = node = spine.pop()
+                x = root.arg
+                if name == "S":
+                    root.fun, root.arg = App(f, x), App(g, x)
+                    allocations += 2
+                elif name == "B":
+                    root.fun, root.arg = f, App(g, x)
+                    allocations += 1
+                else:
+                    root.fun, root.arg = App(f, x), g
+                    allocations += 1
+        self.steps += steps
+        self.allocations += allocations
+        return spine[0] if spine else node
+
+    def normalize(self, node: Graph) -> Graph:
+        "Reduce node to normal form, return it"
+        root = node = self.whnf(node)
+        todo = [node]
+        while todo:
+            node = todo.pop()
+            while type(node) is App:
+                arg = node.arg = self.whnf(node.arg)
+                if type(arg) is App:
+                    todo.append(arg)
+                node = node.fun
+        return root
+
+    def church(self, node: Graph) -> int:
+        "The number the Church numeral node stands for"
+        f, x = Atom("f"), Atom("x")
+        node = App(App(node, f), x)
+        n = 0
+        while True:
+            node = self.whnf(node)
+            if node is x:
+                return n
+            if type(node) is not App or node.fun is not f:
+                raise ValueError(f"{show(node)} is not a Church numeral")
+            n += 1
+            node = node.arg
+
+
+def numeral(n: int) -> Graph:
+    "The Church numeral n, (S B)^n (K I)"
+    sb = App(COMBINATORS["S"], COMBINATORS["B"])
+    node = App(COMBINATORS["K"], COMBINATORS["I"])
+    for _ in range(n):
+        node = App(sb, node)
+    return node
+
+
+def show(node: Graph) -> str:
+    "The text of node, applications associate to the left"
+    out: List[str] = []
+    # Items are strings to output or nodes
+    stack: list = [node]
+    while stack:
+        node = stack.pop()
+        if type(node) is str:
+            out.append(node)
+            continue
+        while type(node) is App and node.fun is None:
+            node = node.arg
+        if type(node) is not App:
+            out.append(node.name)
+            continue
+        arg = node.arg
+        while type(arg) is App and arg.fun is None:
+            arg = arg.arg
+        if type(arg) is App:
+            stack += (")", arg, "(")
+        else:
+            stack.append(arg)
+        stack += (" ", node.fun)
+    return "".join(out)
+
+
+class Lam(NamedTuple):
+    param: str
+    body: "Term"
+
+
+class Apply(NamedTuple):
+    fun: "Term"
+    arg: "Term"
+
+
+# Variables are names, combinators Atoms
+Term = Union[str, Atom, Lam, Apply]
+
+TOKENS = re.compile(r"\s*(?:([\\λ.()])|([A-Za-z_][A-Za-z0-9_']*|\d+))")
+
+
+def parse(text: str) -> Term:
+    r"""Parse a lambda term: `\x y. body` or `λx y. body`, application is
+    juxtaposition"""
+    tokens, pos = [], 0
+    text = text.rstrip()
+    while pos < len(text):
+        match = TOKENS.match(text, pos)
+        if not match:
+            raise SyntaxError(f"Unexpected {text[pos:].strip()[0]!r} at {pos}")
+        tokens.append(match.group(1) or match.group(2))
+        pos = match.end()
+    tokens.append(None)
+    pos = 0
+
+    # The terms being parsed, innermost last: [applications so far, the
+    # parameters of a lambda body or "(" for parentheses or None]
+    stack: list = [[None, None]]
+    while True:
+        token = tokens[pos]
+        if token in (None, ")"):
+            arg, opened = stack.pop()
+            if arg is None:
+                raise SyntaxError("Expected a term")
+            if opened is None:
+                break
+            if opened == "(":
+                if token != ")":
+                    raise SyntaxError("Expected ')'")
+                pos += 1
+            else:
+                for param in reversed(opened):
+                    arg = Lam(param, arg)
+        else:
+            pos += 1
+            if token in ("\\", "λ"):
+                params = []
+                while tokens[pos] not in (None, "\\", "λ", ".", "(", ")"):
+                    params.append(tokens[pos])
+                    pos += 1
+                if not params or tokens[pos] != ".":
+                    raise SyntaxError(f"Expected parameters and '.' at token {pos}")
+                pos += 1
+                stack.append([None, params])
+                continue
+            if token == "(":
+                stack.append([None, "("])
+                continue
+            if token == ".":
+                raise SyntaxError(f"Unexpected '.' at token {pos - 1}")
+            arg = token
+        outer = stack[-1]
+        outer[0] = arg if outer[0] is None else Apply(outer[0], arg)
+
+    if tokens[pos] is not None:
+        raise SyntaxError(f"Unexpected {tokens[pos]!r}")
+    return arg
+
+
+def abstract(name: str, term: Term) -> Term:
+    "[name] term, a combinator term that applied to x is term with x for name"
+    # Subterms are abstracted bottom up, `done` holds (whether name occurs
+    # in the subterm, its abstraction if so else the subterm itself)
+    done: List[tuple] = []
+    stack: list = [(term, False)]
+    while stack:
+        node, visited = stack.pop()
+        if type(node) is not Apply:
+            if type(node) is str and node == name:
+                done.append((True, COMBINATORS["I"]))
+            else:
+                done.append((False, node))
+        elif not visited:
+            stack += ((node, True), (node.arg, False), (node.fun, False))
+        else:
+            arg_free, arg = done.pop()
+            fun_free, fun = done.pop()
+            if not fun_free and not arg_free:
+                done.append((False, node))
+            elif not fun_free:
+                if type(node.arg) is str and node.arg == name:
+                    done.append((True, fun))
+                else:
+                    done.append((True, Apply(Apply(COMBINATORS["B"], fun), arg)))
+            elif not arg_free:
+                done.append((True, Apply(Apply(COMBINATORS["C"], fun), arg)))
+            else:
+                done.append((True, Apply(Apply(COMBINATORS["S"], fun), arg)))
+    free, result = done[0]
+    return result if free else Apply(COMBINATORS["K"], term)
+
+
+def compile(term: Term, bound=frozenset()) -> Term:
+    """Translate a lambda term to combinators, innermost lambdas first.
+    Free names of combinators are the combinators"""
+    done: List[Term] = []
+    stack: list = [(term, bound, False)]
+    while stack:
+        node, bound, visited = stack.pop()
+        kind = type(node)
+        if kind is Lam:
+            if visited:
+                done.append(abstract(node.param, done.pop()))
+            else:
+                stack += ((node, bound, True), (node.body, bound | {node.param}, False))
+        elif kind is Apply:
+            if visited:
+                arg = done.pop()
+                done.append(Apply(done.pop(), arg))
+            else:
+                stack += ((node, bound, True), (node.arg, bound, False), (node.fun, bound, False))
+        elif kind is str and node not in bound:
+            done.append(COMBINATORS.get(node, node))
+        else:
+            done.append(node)
+    return done[0]
+
+
+def graph(term: Term, numerals: bool = False) -> Graph:
+    """The graph of a combinator term, free variables become Atoms. With
+    `numerals`, numbers are Church numerals"""
+    atoms: Dict[str, Atom] = {}
+    done: List[Graph] = []
+    stack: list = [(term, False)]
+    while stack:
+        term, visited = stack.pop()
+        if type(term) is Apply:
+            if visited:
+                arg = done.pop()
+                done.append(App(done.pop(), arg))
+            else:
+                stack += ((term, True), (term.arg, False), (term.fun, False))
+        elif type(term) is Atom:
+            done.append(term)
+        elif term.isdigit():
+            if not numerals:
+                raise ValueError(f"Unexpected number {term}")
+            done.append(numeral(int(term)))
+        else:
+            if term not in atoms:
+                atoms[term] = Atom(term)
+            done.append(atoms[term])
+    return done[0]
+
+
+def term(text: str, numerals: bool = False) -> Graph:
+    "The graph of the lambda term text"
+    return graph(compile(parse(text)), numerals)
+
+
+if __name__ == "__main__":
+    # ski.py [-n] TERM: the normal form of TERM, with -n the number it is
+    args = sys.argv[1:]
+    if args:
+        reducer = Reducer()
+        if args[0] == "-n":
+            print(reducer.church(term(" ".join(args[1:]), numerals=True)))
+        else:
+            print(show(reducer.normalize(term(" ".join(args), numerals=True))))
+        print(f"{reducer.steps} steps, {reducer.allocations} allocations", file=sys.stderr)
+    else:
+        print(S(K, S, K))
@@ -0,0 +1,156 @@
+import doctest
+import unittest
+
+import lambdac
+import ski
+
+
+class TestLambdac(unittest.TestCase):
+    def run_program(self, source, strategy):
+        machine = lambdac.Machine(strategy)
+        return machine, machine.normalize(lambdac.program(lambdac.PRELUDE + source))
+
+    def test_doctests(self):
+        self.assertEqual(doctest.testmod(lambdac).failed, 0)
+
+    def test_strategies(self):
+        ae = self.assertEqual
+        for strategy in lambdac.STRATEGIES:
+            machine, term = self.run_program("plus (times 2 3) (pow 2 3)", strategy)
+            ae(lambdac.to_int(term), 14, strategy)
+            ae(lambdac.show(self.run_program(r"(\x. x) (\y z. z y) a", strategy)[1]),
+               r"\z. z a")
+
+        # Call by name and need never evaluate unused arguments
+        omega = r"(\x. x x) (\x. x x)"
+        for strategy in ("name", "need"):
+            ae(lambdac.show(self.run_program(f"true a ({omega})", strategy)[1]), "a")
+
+        # Call by need evaluates a shared argument once, by name as often
+        # as it is used
+        betas = {strategy: self.run_program(r"(\x. plus x (plus x x)) (times 3 3)", strategy)[0].betas
+                 for strategy in lambdac.STRATEGIES}
+        self.assertLess(betas["need"], betas["name"])
+        self.assertLessEqual(betas["value"], betas["name"])
+
+        with self.assertRaises(ValueError):
+            lambdac.Machine("lazy")
+
+    def test_factorial(self):
+        ae = self.assertEqual
+        y = r"fact = Y (\f n. iszero n 1 (times n (f (pred n)))); fact 4"
+        z = r"fact = Z (\f n. iszero n (\v. 1) (\v. times n (f (pred n))) id); fact 4"
+        for strategy in ("name", "need"):
+            ae(lambdac.to_int(self.run_program(y, strategy)[1]), 24, strategy)
+        for strategy in lambdac.STRATEGIES:
+            ae(lambdac.to_int(self.run_program(z, strategy)[1]), 24, strategy)
+
+    def test_normalize(self):
+        ae = self.assertEqual
+        machine = lambdac.Machine()
+        ae(lambdac.show(machine.normalize(lambdac.parse(r"\x. (\y. y x) (\z. z)"))), r"\x. x")
+        ae(lambdac.show(machine.normalize(lambdac.parse(r"\x y. (\x. x y) x"))), r"\x y. x y")
+        # Free names stay, parameters capturing them are renamed
+        ae(lambdac.show(machine.normalize(lambdac.parse(r"(\y x. y x) x"))), r"\x'. x x'")
+        ae(lambdac.to_int(machine.normalize(lambdac.parse("(\\m n. n m) 2 10"))), 1024)
+        ae(lambdac.to_int(lambdac.church(5)), 5)
+        with self.assertRaises(ValueError):
+            lambdac.to_int(lambdac.parse(r"\x. x"))
+
+    def test_parse(self):
+        ae = self.assertEqual
+        show = lambda text: lambdac.show(lambdac.parse(text))
+
+        ae(show(r"λx y. x (y z) w"), r"\x y. x (y z) w")
+        ae(show("((a)) (b c)"), "a (b c)")
+        ae(show(r"\x. x # a comment"), r"\x. x")
+        ae(show("id a"), "id a")
+        ae(lambdac.show(lambdac.parse("id a", {"id": lambdac.parse(r"\x. x")})), r"(\x. x) a")
+        ae(lambdac.show(lambdac.program("k = \\x y. x; k a")), r"(\x y. x) a")
+
+        for text in ("", "()", "(a", "a)", r"\. x", "a . b", r"\x y", "a = b", "a;", "a $"):
+            with self.assertRaises(SyntaxError, msg=text):
+                lambdac.parse(text)
+        with self.assertRaises(SyntaxError):
+            lambdac.program("a = b")
+
+        # Nesting is not bounded by the Python stack
+        n = 100000
+        ae(show("(" * n + "a" + ")" * n), "a")
+        term = lambdac.parse(" ".join(f"\\x{i}." for i in range(5000)) + " x0")
+        ae(lambdac.show(term).split(". ")[-1], "x0")
+        ae(len(show("f" + " (g" * n + " x" + ")" * n)), 4 * n + 3)
+
+
+class TestSki(unittest.TestCase):
+    def test_doctests(self):
+        self.assertEqual(doctest.testmod(ski).failed, 0)
+
+    def test_reduce(self):
+        ae = self.assertEqual
+        reducer = ski.Reducer()
+        ae(ski.show(reducer.normalize(ski.term(r"S K K x"))), "x")
+        ae(reducer.church(ski.term(r"(\m n f. m (n f)) 3 4", numerals=True)), 12)
+        ae(ski.Reducer().church(ski.term(r"\f x. f (f x)")), 2)
+        ae(ski.Reducer().church(ski.term("(\\m n. n m) 2 10", numerals=True)), 1024)
+
+        # A shared subterm is reduced once, in place
+        f, x = ski.Atom("f"), ski.Atom("x")
+        shared = ski.App(ski.COMBINATORS["I"], x)
+        reducer = ski.Reducer()
+        ae(ski.show(reducer.normalize(ski.App(ski.App(f, shared), shared))), "f x x")
+        ae(reducer.steps, 1)
+        self.assertIsNone(shared.fun)
+        reducer = ski.Reducer()
+        # S I I (I x): S, both I and I x once, not twice
+        ae(ski.show(reducer.normalize(ski.term(r"(\y. y y) (I x)"))), "x x")
+        ae(reducer.steps, 4)
+
+        with self.assertRaisesRegex(ValueError, "not a Church numeral"):
+            ski.Reducer().church(ski.term(r"\f x. x f"))
+        with self.assertRaisesRegex(ValueError, "not a Church numeral"):
+            ski.Reducer().church(ski.term("y"))
+
+        # Terms without a normal form stop at the limit
+        reducer = ski.Reducer(limit=1000)
+        with self.assertRaises(RuntimeError):
+            reducer.normalize(ski.term(r"(\x. x x) (\x. x x)"))
+        ae(reducer.steps, 1000)
+        ae(ski.show(ski.Reducer(limit=2).normalize(ski.term("S K K x"))), "x")
+
+    def test_compile(self):
+        ae = self.assertEqual
+        compile = lambda text: ski.show(ski.graph(ski.compile(ski.parse(text))))
+
+        ae(compile(r"\x. x"), "I")
+        ae(compile(r"\x y. x"), "K")
+        ae(compile(r"\x. a"), "K a")
+        ae(compile(r"\x. f x"), "f")
+        ae(compile(r"\x. x x"), "S I I")
+        ae(compile(r"\f g x. f (g x)"), "B")
+        ae(compile(r"\f x y. f y x"), "C")
+        ae(compile(r"\x y. y x"), "C I")
+        ae(compile(r"\x. f (g x) y"), "C (B f g) y")
+        ae(compile(r"(\x. x) λy. y"), "I I")
+
+        for text in ("", "()", "(a", "a)", r"\. x", "a . b", r"\x y", "a $"):
+            with self.assertRaises(SyntaxError, msg=text):
+                ski.parse(text)
+        with self.assertRaises(ValueError):
+            ski.term("f 2")
+
+    def test_deep(self):
+        ae = self.assertEqual
+        n = 100000
+        ae(ski.parse("(" * n + "a" + ")" * n), "a")
+        nested = "f" + " (g" * n + " x" + ")" * n
+        ae(ski.show(ski.graph(ski.parse(nested))), nested)
+        # B g (B g ... (B g g))
+        ae(ski.show(ski.term(r"\x." + " (g" * n + " x" + ")" * n)),
+           "B g (" * (n - 2) + "B g g" + ")" * (n - 2))
+        ae(len(ski.show(ski.numeral(n))), 6 * n + 3)
+        ae(ski.Reducer().church(ski.numeral(n)), n)
+
+
+if __name__ == "__main__":
+    unittest.main()